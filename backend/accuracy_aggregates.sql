@@ -0,0 +1,90 @@
+-- Running aggregates behind the accuracy and progress endpoints, so reads are
+-- one-row lookups instead of scans of student_ai_accuracy and
+-- student_cost_estimates. Triggers keep them current on every write
+-- (including the upserts from store_accuracy), so all writers stay consistent.
+
+CREATE TABLE IF NOT EXISTS accuracy_aggregates (
+    scope TEXT NOT NULL CHECK (scope IN ('global', 'student', 'challenge')),
+    scope_id TEXT NOT NULL DEFAULT '',
+    count BIGINT NOT NULL DEFAULT 0,
+    total DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (scope, scope_id)
+);
+
+CREATE TABLE IF NOT EXISTS student_progress (
+    student_id UUID PRIMARY KEY,
+    completed BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION bump_accuracy_aggregates(
+    p_student TEXT, p_challenge TEXT, p_count INTEGER, p_total DOUBLE PRECISION
+) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO accuracy_aggregates AS a (scope, scope_id, count, total)
+    VALUES ('global', '', p_count, p_total),
+           ('student', p_student, p_count, p_total),
+           ('challenge', p_challenge, p_count, p_total)
+    ON CONFLICT (scope, scope_id) DO UPDATE
+    SET count = a.count + EXCLUDED.count,
+        total = a.total + EXCLUDED.total,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION student_ai_accuracy_aggregate() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.accuracy IS NOT NULL THEN
+        PERFORM bump_accuracy_aggregates(OLD.student_id::TEXT, OLD.challenge_id::TEXT, -1, -OLD.accuracy);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.accuracy IS NOT NULL THEN
+        PERFORM bump_accuracy_aggregates(NEW.student_id::TEXT, NEW.challenge_id::TEXT, 1, NEW.accuracy);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_student_ai_accuracy_aggregate ON student_ai_accuracy;
+CREATE TRIGGER trg_student_ai_accuracy_aggregate
+    AFTER INSERT OR UPDATE OF accuracy, student_id, challenge_id OR DELETE ON student_ai_accuracy
+    FOR EACH ROW EXECUTE FUNCTION student_ai_accuracy_aggregate();
+
+CREATE OR REPLACE FUNCTION student_cost_estimates_progress() RETURNS TRIGGER AS $$
+DECLARE
+    was_done BOOLEAN := TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'submitted';
+    is_done BOOLEAN := TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'submitted';
+BEGIN
+    IF was_done AND (NOT is_done OR OLD.student_id IS DISTINCT FROM NEW.student_id) THEN
+        UPDATE student_progress SET completed = completed - 1, updated_at = NOW()
+        WHERE student_id = OLD.student_id;
+    END IF;
+    IF is_done AND (NOT was_done OR OLD.student_id IS DISTINCT FROM NEW.student_id) THEN
+        INSERT INTO student_progress AS p (student_id, completed) VALUES (NEW.student_id, 1)
+        ON CONFLICT (student_id) DO UPDATE
+        SET completed = p.completed + 1, updated_at = NOW();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_student_cost_estimates_progress ON student_cost_estimates;
+CREATE TRIGGER trg_student_cost_estimates_progress
+    AFTER INSERT OR UPDATE OF status, student_id OR DELETE ON student_cost_estimates
+    FOR EACH ROW EXECUTE FUNCTION student_cost_estimates_progress();
+
+-- Backfill from the existing rows (run once, with writes paused)
+TRUNCATE accuracy_aggregates, student_progress;
+
+INSERT INTO accuracy_aggregates (scope, scope_id, count, total)
+SELECT 'global', '', COUNT(accuracy), COALESCE(SUM(accuracy), 0) FROM student_ai_accuracy
+UNION ALL
+SELECT 'student', student_id::TEXT, COUNT(accuracy), SUM(accuracy)
+FROM student_ai_accuracy WHERE accuracy IS NOT NULL GROUP BY student_id
+UNION ALL
+SELECT 'challenge', challenge_id::TEXT, COUNT(accuracy), SUM(accuracy)
+FROM student_ai_accuracy WHERE accuracy IS NOT NULL GROUP BY challenge_id;
+
+INSERT INTO student_progress (student_id, completed)
+SELECT student_id, COUNT(*) FROM student_cost_estimates
+WHERE status = 'submitted' GROUP BY student_id;
@@ -0,0 +1,134 @@
+"""
+Cold-start benchmark for the API.
+
+Runs `import main` in fresh interpreters and reports:
+  - import time per app module (main, routes.*, services.*, models.*) and
+    for the heaviest third-party packages, from `python -X importtime`
+  - app construction: import, lifespan startup and the first request
+
+Usage (from backend/):
+    python bench_startup.py                 # 5 runs, print report
+    python bench_startup.py --runs 10 --top 15
+    python bench_startup.py --budget-ms 1500   # exit 1 if boot is slower
+"""
+import argparse, json, os, re, subprocess, sys
+from collections import defaultdict
+from statistics import median
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_PREFIXES = ("main", "routes", "services", "models")
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+STARTUP_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+t2 = time.perf_counter()
+client.__enter__()
+t3 = time.perf_counter()
+client.get("/")
+t4 = time.perf_counter()
+client.__exit__(None, None, None)
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "lifespan_startup_ms": (t3 - t2) * 1000,
+    "first_request_ms": (t4 - t3) * 1000,
+}))
+"""
+
+
+def _run(args, **kwargs):
+    return subprocess.run([sys.executable, *args], cwd=HERE, capture_output=True, text=True, **kwargs)
+
+
+def import_times():
+    """{module: (self_ms, cumulative_ms, depth)} for one cold `import main`."""
+    proc = _run(["-X", "importtime", "-c", "import main"])
+    if proc.returncode != 0:
+        sys.exit(f"import main failed:\n{proc.stderr[-2000:]}")
+
+    out = {}
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m:
+            self_us, cum_us, indent, name = m.groups()
+            out[name] = (int(self_us) / 1000, int(cum_us) / 1000, len(indent) // 2)
+    return out
+
+
+def startup_times():
+    proc = _run(["-c", STARTUP_PROBE])
+    if proc.returncode != 0:
+        sys.exit(f"startup probe failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="third-party packages to list")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="fail when median import + lifespan startup exceeds this")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    cumulative = defaultdict(list)
+    self_time = defaultdict(list)
+    depth = {}
+    startup = defaultdict(list)
+
+    for _ in range(args.runs):
+        for name, (self_ms, cum_ms, d) in import_times().items():
+            cumulative[name].append(cum_ms)
+            self_time[name].append(self_ms)
+            depth[name] = d
+        for k, v in startup_times().items():
+            startup[k].append(v)
+
+    app_modules = sorted(
+        (n for n in cumulative if n.split(".")[0] in APP_PREFIXES),
+        key=lambda n: -median(cumulative[n]),
+    )
+    third_party = sorted(
+        (n for n in cumulative if "." not in n and n.split(".")[0] not in APP_PREFIXES
+         and n not in sys.builtin_module_names),
+        key=lambda n: -median(cumulative[n]),
+    )[:args.top]
+
+    report = {
+        "runs": args.runs,
+        "startup_ms": {k: round(median(v), 1) for k, v in startup.items()},
+        "app_modules_ms": {n: {"self": round(median(self_time[n]), 1),
+                               "cumulative": round(median(cumulative[n]), 1)} for n in app_modules},
+        "third_party_ms": {n: round(median(cumulative[n]), 1) for n in third_party},
+    }
+    boot_ms = report["startup_ms"]["import_ms"] + report["startup_ms"]["lifespan_startup_ms"]
+    report["boot_ms"] = round(boot_ms, 1)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Cold start (median of {args.runs} runs)")
+        for k, v in report["startup_ms"].items():
+            print(f"  {k:<22}{v:>10.1f} ms")
+        print(f"  {'boot (import+startup)':<22}{boot_ms:>10.1f} ms")
+
+        print("\nApp modules                          self ms   cumulative ms")
+        for n in app_modules:
+            row = report["app_modules_ms"][n]
+            print(f"  {n:<34}{row['self']:>8.1f}{row['cumulative']:>14.1f}")
+
+        print(f"\nHeaviest third-party imports (top {args.top})")
+        for n in third_party:
+            print(f"  {n:<34}{report['third_party_ms'][n]:>10.1f} ms")
+
+    if args.budget_ms is not None and boot_ms > args.budget_ms:
+        print(f"\n⚠️ Boot took {boot_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+-- Minimal stand-in for the Supabase tables save_student_estimate.sql uses,
+-- for exercising the function against a plain local Postgres:
+--
+--   createdb estimates_dev
+--   psql estimates_dev -f local_postgres_schema.sql -f save_student_estimate.sql
+--   psql estimates_dev -c "SELECT save_student_estimate(gen_random_uuid(), gen_random_uuid(),
+--       '[{\"cost_category\": \"MASONRY WORK\", \"material_name\": \"CHB 4in\",
+--          \"quantity\": 100, \"unit\": \"pcs\", \"unit_price\": 15}]'::jsonb)"
+--
+-- Foreign keys to auth.users and student_challenges are left out.
+CREATE TABLE IF NOT EXISTS student_cost_estimates (
+    "studentsCostEstimatesID" UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    student_id UUID NOT NULL,
+    challenge_id UUID NOT NULL,
+    total_amount DECIMAL(12,2),
+    submitted_at TIMESTAMP WITH TIME ZONE,
+    status TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS student_cost_estimate_items (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    "studentsCostEstimatesID" UUID NOT NULL REFERENCES student_cost_estimates("studentsCostEstimatesID") ON DELETE CASCADE,
+    challenge_id UUID,
+    cost_category VARCHAR(100),
+    material_name VARCHAR(255),
+    quantity DECIMAL(10,3),
+    unit VARCHAR(50),
+    unit_price DECIMAL(10,2),
+    amount DECIMAL(12,2),
+    item_number INTEGER,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS students_estimates_summary (
+    "studentsEstimatesSummaryID" UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    "studentsCostEstimatesID" UUID NOT NULL REFERENCES student_cost_estimates("studentsCostEstimatesID") ON DELETE CASCADE,
+    subtotal_amount DECIMAL(12,2),
+    contingency_percentage DECIMAL(6,4),
+    contingency_amount DECIMAL(12,2),
+    total_amount DECIMAL(12,2),
+    category_subtotals JSONB DEFAULT '[]'::JSONB,
+    challenge_id UUID
+);
@@ -3,40 +3,69 @@ import json
 import re
 import logging
 import uuid
+from contextlib import asynccontextmanager
+from typing import List
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+
+# Load .env once, before any route/service module reads its settings
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import create_client, Client
 
 from routes.challenges import router as challenges_router
-from routes.auth import auth_router
+from routes.auth import auth_router, require_teacher
 from routes import reading_materials
 from routes.class_routes import class_router
-from routes.verification import verification_router
 from pydantic import BaseModel
-from services.gemini_service import GeminiPriceSearch
-from services.supabase_service import SupabaseClient
 from routes.cost_estimation_route import router as cost_estimation_router
 from routes import ai_suggestion_route
 from routes import estimate_route
 from routes import materials
+from routes import job_routes
 from services.price_service import PriceService
+from services.container import container, provide, get_price_service, CONTAINER_WARM_ON_STARTUP
+from services.job_service import job_queue
+from services.price_warmer import price_warmer, PRICE_WARMER_ENABLED
+from services.draft_buffer import draft_buffer, DRAFT_BUFFER_ENABLED
+from services import db_executor
+
+
+supabase = provide("supabase")
+sb = provide("sb")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One Supabase client and one set of services for every route and worker,
+    # built on first use unless warm-up is requested
+    if CONTAINER_WARM_ON_STARTUP:
+        container.start()
+    app.state.container = container
+    # Background workers for queued AI jobs (estimation, accuracy)
+    job_queue.start()
+    # Keeps staple material prices fresh ahead of the first estimate
+    if PRICE_WARMER_ENABLED:
+        price_warmer.start()
+    # Writes coalesced draft saves behind; stop() flushes whatever is left
+    if DRAFT_BUFFER_ENABLED:
+        draft_buffer.start()
+    yield
+    draft_buffer.stop()
+    price_warmer.stop()
+    job_queue.stop()
+    await container.close()
+    db_executor.shutdown()
 
 
-load_dotenv()
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-sb = SupabaseClient()
-
 # FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(challenges_router, prefix="/api")
 app.include_router(estimate_route.router, prefix="/api") 
 app.include_router(auth_router)
 # Verification router temporarily disabled - will be re-enabled later
+# (import it here again when it is; not importing it keeps it off startup)
+# from routes.verification import verification_router
 # app.include_router(verification_router)
 app.include_router(reading_materials.router, prefix="/api")
 
@@ -44,6 +73,7 @@ app.include_router(class_router, prefix="/api")
 app.include_router(cost_estimation_router, prefix="/api")
 app.include_router(ai_suggestion_route.router, prefix="/api")
 app.include_router(materials.router)
+app.include_router(job_routes.router, prefix="/api")
 
 @app.get("/")
 def root():
@@ -73,6 +103,12 @@ def check_email_config():
         "configuration_complete": bool(resend_api_key) and resend_available,
     }
 
+@app.get("/health/http")
+def check_http_pool():
+    """Outbound HTTP pool usage and retry counters (Gemini, Brevo)"""
+    from services.http_client import http_client
+    return http_client.stats()
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -87,7 +123,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-gemini = GeminiPriceSearch()
+gemini = provide("gemini")
 
 
 class MaterialRequest(BaseModel):
@@ -95,6 +131,17 @@ class MaterialRequest(BaseModel):
     size:str
 
 
+class MaterialBatchItem(BaseModel):
+    material: str
+    size: str = ""
+    unit: str = "piece"
+
+
+class MaterialBatchRequest(BaseModel):
+    items: List[MaterialBatchItem]
+    site_hint: str = "Cebu, Philippines"
+
+
 # RegisterRequest model and register endpoint moved to routes/auth.py
 # Keeping this commented for reference - using auth_router instead
 # class RegisterRequest(BaseModel):
@@ -137,7 +184,7 @@ class MaterialRequest(BaseModel):
 
 
 @app.post("/search_price")
-async def search_price(request: MaterialRequest):
+async def search_price(request: MaterialRequest, service: PriceService = Depends(get_price_service)):
     material = request.material
     size = request.size or ""
     unit = "piece"
@@ -146,9 +193,7 @@ async def search_price(request: MaterialRequest):
         raise HTTPException(status_code=400, detail="Missing material")
 
     try:
-        service = PriceService()   # ← Now recognized
-
-        median_price, listings = service.get_unit_price(
+        median_price, listings = await service.aget_unit_price(
             material=material,
             unit=unit,
             size=size
@@ -163,6 +208,44 @@ async def search_price(request: MaterialRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/search_price/batch")
+async def search_price_batch(request: MaterialBatchRequest, service: PriceService = Depends(get_price_service)):
+    """Price many materials at once; results come back in request order."""
+    if not request.items:
+        return []
+
+    try:
+        results = await service.aget_unit_prices(
+            [(i.material, i.unit, i.size) for i in request.items],
+            site_hint=request.site_hint,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return [
+        {"material": i.material, "unit": i.unit, "size": i.size,
+         "median_price": price, "listings": listings}
+        for i, (price, listings) in zip(request.items, results)
+    ]
+
+@app.get("/search_price/stats")
+def search_price_stats():
+    return PriceService.stats()
+
+@app.get("/search_price/warmer")
+def search_price_warmer():
+    """Report of the last price-warming run (see services/price_warmer.py)"""
+    return {"enabled": PRICE_WARMER_ENABLED, "last_run": price_warmer.last_report()}
+
+@app.post("/search_price/warmer/run")
+def run_price_warmer(user_id: str = Depends(require_teacher)):
+    """Queue a warming pass ahead of the schedule (teachers only, spaced by PRICE_WARMER_MIN_SPACING_SECONDS)"""
+    wait = price_warmer.seconds_until_forceable()
+    if wait > 0:
+        raise HTTPException(status_code=429, detail=f"A price warmer run started recently; retry in {int(wait) + 1}s")
+    job_id = job_queue.enqueue("price_warmer", {"requested_by": user_id}, owner_id=user_id)
+    return {"success": True, "status": "queued", "job_id": job_id}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,9 @@
+-- Columns and index used by PriceService's read-through price cache.
+-- get_unit_price looks up fresh Gemini listings by material, unit and size
+-- before paying for another LLM call.
+ALTER TABLE materials_prices
+ADD COLUMN IF NOT EXISTS size TEXT,
+ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+CREATE INDEX IF NOT EXISTS idx_materials_prices_lookup
+    ON materials_prices (lower(material), unit, size, created_at DESC);
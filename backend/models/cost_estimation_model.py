@@ -4,6 +4,9 @@ from uuid import UUID
 from datetime import datetime
 
 class CostEstimateItemIn(BaseModel):
+    # Stable row id, generated by the client for new rows; rows without one
+    # are matched to unchanged saved rows by content
+    id: Optional[UUID] = None
     cost_category: str = Field(..., min_length=1)
     material_name: str = Field(..., min_length=1)
     quantity: float = Field(..., ge=0)
@@ -1,11 +1,11 @@
 from fastapi import APIRouter
 from models.ai_suggestion_model import SuggestionRequest
-from services.ai_suggestion_service import SuggestionService
+from services.container import provide
 
 router = APIRouter()
-service = SuggestionService()
+service = provide("suggestion_service")
 
 @router.post("/ai-suggestions")
-def ai_suggestions(req: SuggestionRequest):
-    suggestion = service.get_suggestion(req)
+async def ai_suggestions(req: SuggestionRequest):
+    suggestion = await service.aget_suggestion(req)
     return {"suggestion": suggestion}
@@ -1,11 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header
+from typing import Optional, Tuple
 from pydantic import BaseModel
-from supabase import create_client, Client
 import os
-from dotenv import load_dotenv
 from datetime import datetime
+from services.container import provide
+from services.db_executor import db_execute, run_blocking
 
-load_dotenv()
 
 auth_router = APIRouter(prefix="/auth")
 
@@ -15,7 +15,34 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError("Missing SUPABASE_URL or SUPABASE_KEY in environment")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = provide("supabase")
+
+
+async def current_user(authorization: Optional[str] = Header(None)) -> Tuple[str, Optional[str]]:
+    """
+    FastAPI dependency: checks the Supabase access token in
+    `Authorization: Bearer <token>` and returns (user id, role).
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    try:
+        res = await run_blocking(supabase.auth.get_user, token)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if not res or not res.user:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    user = await db_execute(supabase.table("users").select("role").eq("id", res.user.id).limit(1))
+    return res.user.id, user.data[0]["role"] if user.data else None
+
+
+async def require_teacher(user: Tuple[str, Optional[str]] = Depends(current_user)) -> str:
+    """FastAPI dependency for teacher/admin-only endpoints; returns the user id."""
+    user_id, role = user
+    if role not in ("teacher", "admin"):
+        raise HTTPException(status_code=403, detail="Teachers only")
+    return user_id
 
 
 # Pydantic models
@@ -50,7 +77,7 @@ async def register(request: RegisterRequest):
         # Safely check if user already exists in custom users table
         try:
             existing_user = (
-                supabase.table("users").select("id").eq("email", email).execute()
+                await db_execute(supabase.table("users").select("id").eq("email", email))
             )
             if existing_user.data:
                 raise HTTPException(status_code=400, detail="User already exists")
@@ -59,7 +86,8 @@ async def register(request: RegisterRequest):
             pass
 
         # Create user in Supabase Auth directly (verification disabled for now)
-        auth_response = supabase.auth.sign_up(
+        auth_response = await run_blocking(
+            supabase.auth.sign_up,
             {"email": request.email, "password": request.password}
         )
 
@@ -68,7 +96,7 @@ async def register(request: RegisterRequest):
 
         # Insert into custom users table
         try:
-            supabase.table("users").insert(
+            await db_execute(supabase.table("users").insert(
                 {
                     "id": auth_response.user.id,
                     "first_name": request.first_name,
@@ -77,7 +105,7 @@ async def register(request: RegisterRequest):
                     "role": request.role,
                     "email_verified": False,  # Will be set to True when verification is re-enabled
                 }
-            ).execute()
+            ))
         except Exception:
             # Don't fail the whole request if the users table isn't ready
             pass
@@ -101,13 +129,12 @@ async def register_with_verification(request: RegisterWithVerificationRequest):
         email = request.email.lower().strip()
 
         # Verify the verification code first
-        verification_result = (
+        verification_result = await db_execute(
             supabase.table("verification_codes")
             .select("*")
             .eq("email", email)
             .eq("code", request.verification_code)
             .eq("is_used", False)
-            .execute()
         )
 
         if not verification_result.data:
@@ -129,12 +156,13 @@ async def register_with_verification(request: RegisterWithVerificationRequest):
             raise HTTPException(status_code=400, detail="Invalid expiry timestamp")
 
         # Mark verification code as used
-        supabase.table("verification_codes").update({"is_used": True}).eq(
+        await db_execute(supabase.table("verification_codes").update({"is_used": True}).eq(
             "id", verification_record["id"]
-        ).execute()
+        ))
 
         # Create user in Supabase Auth
-        auth_response = supabase.auth.sign_up(
+        auth_response = await run_blocking(
+            supabase.auth.sign_up,
             {"email": request.email, "password": request.password}
         )
 
@@ -143,7 +171,7 @@ async def register_with_verification(request: RegisterWithVerificationRequest):
 
         # Insert into custom users table (optional, only if table exists)
         try:
-            supabase.table("users").insert(
+            await db_execute(supabase.table("users").insert(
                 {
                     "id": auth_response.user.id,
                     "first_name": request.first_name,
@@ -153,7 +181,7 @@ async def register_with_verification(request: RegisterWithVerificationRequest):
                     "email_verified": True,
                     "verified_at": datetime.utcnow().isoformat(),
                 }
-            ).execute()
+            ))
         except Exception:
             # Don't fail the whole request if the users table isn't ready
             pass
@@ -173,7 +201,8 @@ async def register_with_verification(request: RegisterWithVerificationRequest):
 @auth_router.post("/login")
 async def login_user(request: LoginRequest):
     try:
-        auth_response = supabase.auth.sign_in_with_password(
+        auth_response = await run_blocking(
+            supabase.auth.sign_in_with_password,
             {"email": request.email, "password": request.password}
         )
 
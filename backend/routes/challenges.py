@@ -1,11 +1,12 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from services.supabase_service import SupabaseClient
+from services.container import provide
+from services.db_executor import db_execute, run_blocking
 import os
 import shutil
 from uuid import uuid4
 
 router = APIRouter()
-supabase_service = SupabaseClient()
+supabase_service = provide("sb")
 
 @router.post("/challenges")
 async def create_challenge(
@@ -23,7 +24,8 @@ async def create_challenge(
         file_path = f"plans/{unique_filename}"
         file_bytes = await file.read()
 
-        public_url = supabase_service.upload_file_to_bucket(
+        public_url = await run_blocking(
+            supabase_service.upload_file_to_bucket,
             file_path=file_path,
             file_bytes=file_bytes,
             content_type=file.content_type or "application/octet-stream",
@@ -38,9 +40,10 @@ async def create_challenge(
             "due_date": due_date
         }
 
-        response = supabase_service.client.table("student_challenges")\
-            .insert(payload, returning="representation")\
-            .execute()
+        response = await db_execute(
+            supabase_service.client.table("student_challenges")
+            .insert(payload, returning="representation")
+        )
 
         challenge_id = None
         if response.data and isinstance(response.data, list) and response.data:
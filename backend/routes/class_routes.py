@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from supabase import create_client, Client
 import os
-from dotenv import load_dotenv
 from services.class_service import ClassService
+from services.container import provide
+from services.db_executor import db_execute
 from models.class_model import ClassCreate, ClassJoin
 
 class ClassCreateRequest(BaseModel):
@@ -15,13 +15,10 @@ class ClassJoinRequest(BaseModel):
     class_key: str
     user_id: str
 
-load_dotenv()
 
 class_router = APIRouter(prefix="/classes")
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = provide("supabase")
 
 @class_router.post("/create")
 async def create_class(request: ClassCreateRequest):
@@ -90,7 +87,7 @@ async def get_student_classes(student_id: str):
 async def get_class_by_key(class_key: str):
     """Get class information by class key"""
     try:
-        result = supabase.table("classes").select("*").eq("class_key", class_key).execute()
+        result = await db_execute(supabase.table("classes").select("*").eq("class_key", class_key))
         
         if result.data:
             return {"success": True, "class": result.data[0]}
@@ -105,9 +102,9 @@ async def get_class_for_student(class_id: str):
     """Get class details with challenges for a student"""
     try:
         # Get class info
-        class_res = supabase.table("classes")\
+        class_res = await db_execute(supabase.table("classes")\
             .select("id, class_name, description, class_key, teacher_id, created_at")\
-            .eq("id", class_id).single().execute()
+            .eq("id", class_id).single())
         
         if not class_res.data:
             raise HTTPException(status_code=404, detail="Class not found")
@@ -115,20 +112,19 @@ async def get_class_for_student(class_id: str):
         cls = class_res.data
         
         # Get teacher info
-        teacher_res = supabase.table("users")\
+        teacher_res = await db_execute(supabase.table("users")\
             .select("first_name, last_name, email")\
-            .eq("id", cls["teacher_id"]).single().execute()
+            .eq("id", cls["teacher_id"]).single())
         
         teacher_name = "Unknown"
         if teacher_res.data:
             teacher_name = f"{teacher_res.data['first_name']} {teacher_res.data['last_name']}"
         
         # Get all challenges for this teacher
-        challenge_res = supabase.table("student_challenges")\
+        challenge_res = await db_execute(supabase.table("student_challenges")\
             .select("challenge_id, challenge_name, challenge_instructions, challenge_objectives, due_date, file_url, created_at")\
             .eq("teacher_id", cls["teacher_id"])\
-            .order("created_at", desc=True)\
-            .execute()
+            .order("created_at", desc=True))
         
         challenges = challenge_res.data if challenge_res.data else []
         
@@ -149,9 +145,9 @@ async def get_class_requests(class_id: str):
     """Get pending student requests for a class"""
     try:
         # get pending enrollments
-        enrollments = supabase.table("class_enrollments")\
+        enrollments = await db_execute(supabase.table("class_enrollments")\
             .select("id, student_id, created_at")\
-            .eq("class_id", class_id).eq("status", "pending").execute()
+            .eq("class_id", class_id).eq("status", "pending"))
 
         if not enrollments.data:
             return {"success": True, "requests": []}
@@ -159,9 +155,9 @@ async def get_class_requests(class_id: str):
         requests = []
         for e in enrollments.data:
             # fetch student profile
-            user_res = supabase.table("users")\
+            user_res = await db_execute(supabase.table("users")\
                 .select("first_name, last_name")\
-                .eq("id", e["student_id"]).single().execute()
+                .eq("id", e["student_id"]).single())
 
             student_name = "Unknown"
             if user_res.data:
@@ -183,8 +179,8 @@ async def get_class_requests(class_id: str):
 async def approve_request(request_id: str):
     """Approve student request"""
     try:
-        result = supabase.table("class_enrollments")\
-            .update({"status": "accepted"}).eq("id", request_id).execute()
+        result = await db_execute(supabase.table("class_enrollments")\
+            .update({"status": "accepted"}).eq("id", request_id))
         return {"success": True, "message": "Request approved"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
@@ -193,7 +189,7 @@ async def approve_request(request_id: str):
 async def reject_request(request_id: str):
     """Reject student request"""
     try:
-        supabase.table("class_enrollments").delete().eq("id", request_id).execute()
+        await db_execute(supabase.table("class_enrollments").delete().eq("id", request_id))
         return {"success": True, "message": "Request rejected"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
@@ -203,10 +199,10 @@ async def get_student_all_challenges(student_id: str):
     """Get all challenges for a student with class information"""
     try:
         # Get all enrollments for the student
-        enrollments_res = supabase.table("class_enrollments")\
+        enrollments_res = await db_execute(supabase.table("class_enrollments")\
             .select("class_id, teacher_id")\
             .eq("student_id", student_id)\
-            .eq("status", "accepted").execute()
+            .eq("status", "accepted"))
         
         if not enrollments_res.data:
             return {"success": True, "challenges": []}
@@ -215,20 +211,19 @@ async def get_student_all_challenges(student_id: str):
         teacher_ids = list(set([e["teacher_id"] for e in enrollments_res.data]))
         
         # Get all challenges from these teachers
-        challenges_res = supabase.table("student_challenges")\
+        challenges_res = await db_execute(supabase.table("student_challenges")\
             .select("challenge_id, challenge_name, challenge_instructions, challenge_objectives, due_date, file_url, created_at, teacher_id")\
             .in_("teacher_id", teacher_ids)\
-            .order("created_at", desc=True)\
-            .execute()
+            .order("created_at", desc=True))
         
         challenges_with_class = []
         
         # For each challenge, get class information
         for challenge in challenges_res.data:
             # Get teacher's classes
-            classes_res = supabase.table("classes")\
+            classes_res = await db_execute(supabase.table("classes")\
                 .select("id, class_name")\
-                .eq("teacher_id", challenge["teacher_id"]).execute()
+                .eq("teacher_id", challenge["teacher_id"]))
             
             # Find which class(es) this challenge belongs to
             # Since challenges are tied to teachers, we'll get all classes from that teacher
@@ -236,9 +231,9 @@ async def get_student_all_challenges(student_id: str):
             primary_class = class_names[0] if class_names else "Unknown Class"
             
             # Get teacher info
-            teacher_res = supabase.table("users")\
+            teacher_res = await db_execute(supabase.table("users")\
                 .select("first_name, last_name")\
-                .eq("id", challenge["teacher_id"]).single().execute()
+                .eq("id", challenge["teacher_id"]).single())
             
             teacher_name = "Unknown Teacher"
             if teacher_res.data:
@@ -267,20 +262,18 @@ async def get_teacher_classes_with_students(teacher_id: str):
         print("🟦 FETCHING CLASSES FOR TEACHER:", teacher_id)
 
         # Get all classes created by teacher
-        classes_res = (
+        classes_res = await db_execute(
             supabase.table("classes")
             .select("id, class_name, description, class_key, teacher_id, created_at")
             .eq("teacher_id", teacher_id)
-            .execute()
         )
 
         # Get all challenges by teacher
-        challenges_res = (
+        challenges_res = await db_execute(
             supabase.table("student_challenges")
             .select("challenge_id, challenge_name, challenge_instructions, due_date, created_at")
             .eq("teacher_id", teacher_id)
             .order("created_at", desc=True)
-            .execute()
         )
         all_challenges = challenges_res.data or []
         print(f"🟩 Found {len(all_challenges)} challenges")
@@ -291,22 +284,20 @@ async def get_teacher_classes_with_students(teacher_id: str):
             class_id = cls["id"]
 
             # Fetch all accepted students in this class
-            enrollments_res = (
+            enrollments_res = await db_execute(
                 supabase.table("class_enrollments")
                 .select("student_id, status, created_at")
                 .eq("class_id", class_id)
                 .eq("status", "accepted")
-                .execute()
             )
 
             students = []
             for e in enrollments_res.data:
-                user_res = (
+                user_res = await db_execute(
                     supabase.table("users")
                     .select("first_name, last_name, email")
                     .eq("id", e["student_id"])
                     .single()
-                    .execute()
                 )
                 if user_res.data:
                     students.append({
@@ -319,12 +310,11 @@ async def get_teacher_classes_with_students(teacher_id: str):
             # Fetch each challenge’s student submissions
             challenges_with_submissions = []
             for ch in all_challenges:
-                submissions_res = (
+                submissions_res = await db_execute(
                     supabase.table("student_cost_estimates")
                     .select("student_id, total_amount, submitted_at, status")
                     .eq("challenge_id", ch["challenge_id"])
                     .eq("status", "submitted")
-                    .execute()
                 )
 
                 submitted_students = []
@@ -1,94 +1,118 @@
 from fastapi import APIRouter, HTTPException
 from uuid import UUID
+from datetime import datetime, timezone
 import os
-from supabase import create_client
-from services.gemini_service import GeminiPriceSearch
 
 from models.cost_estimation_model import CostEstimateCreate, CostEstimateOut
-from services.supabase_service import SupabaseClient
-from services.cost_estimation_service import CostEstimationService
+from services.container import provide
+from services.job_service import job_queue
+from services.db_executor import run_blocking
+from services.accuracy_service import accuracy_scorer, content_hash
+from services.draft_buffer import draft_buffer, DRAFT_BUFFER_ENABLED, DraftFlushInProgress
 
 router = APIRouter(prefix="/cost-estimates", tags=["Cost Estimates"])
-svc = CostEstimationService(SupabaseClient())
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+svc = provide("cost_estimation_service")
+supabase = provide("supabase")
 
 @router.post("", response_model=CostEstimateOut)
 def save_cost_estimate(body: CostEstimateCreate):
     try:
+        # Drafts are coalesced and written behind; a submit replaces any buffered draft
+        if DRAFT_BUFFER_ENABLED:
+            if not body.submit:
+                return draft_buffer.put(body)
+            draft_buffer.discard(body.student_id, body.challenge_id)
         return svc.save_estimation(body)
+    except DraftFlushInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/student/{student_id}/challenge/{challenge_id}")
 def get_cost_estimate(student_id: UUID, challenge_id: UUID):
     data = svc.get_estimation(student_id, challenge_id)
+    if DRAFT_BUFFER_ENABLED:
+        data = draft_buffer.overlay(student_id, challenge_id, data)
     if not data:
         raise HTTPException(status_code=404, detail="No estimate found")
     return data
 
-@router.get("/ai/student/{student_id}/completed")
-def get_student_completed(student_id: str):
-    res = (
-        supabase.table("student_cost_estimates")
-        .select("challenge_id")
-        .eq("student_id", student_id)
-        .eq("status", "submitted")
-        .execute()
-    )
+def _accuracy_aggregate(scope: str, scope_id: str = ""):
+    """
+    (count, total) from the accuracy_aggregates row the triggers maintain, or
+    None when the table is not there yet (see accuracy_aggregates.sql).
+    """
+    try:
+        res = (
+            supabase.table("accuracy_aggregates")
+            .select("count, total")
+            .eq("scope", scope)
+            .eq("scope_id", scope_id)
+            .limit(1)
+            .execute()
+        )
+    except Exception as e:
+        print("⚠️ accuracy_aggregates unavailable, scanning student_ai_accuracy:", e)
+        return None
+    row = res.data[0] if res.data else {}
+    return int(row.get("count") or 0), float(row.get("total") or 0)
 
-    completed = len(res.data or [])
-    return {"success": True, "completed": completed}
 
-@router.get("/ai/student/{student_id}/average-accuracy")
-def get_student_average_accuracy(student_id: str):
-    res = (
-        supabase.table("student_ai_accuracy")
-        .select("accuracy")
-        .eq("student_id", student_id)
-        .execute()
-    )
+def _scan_accuracy(**filters):
+    query = supabase.table("student_ai_accuracy").select("accuracy")
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    values = [float(r["accuracy"]) for r in (query.execute().data or []) if r.get("accuracy") is not None]
+    return len(values), sum(values)
 
-    rows = res.data or []
-    if not rows:
-        return {"success": True, "average_accuracy": 0}
 
-    avg = sum(r["accuracy"] for r in rows) / len(rows)
-    return {"success": True, "average_accuracy": round(avg, 2)}
+def _average_accuracy(scope: str, scope_id: str = "", **filters):
+    agg = _accuracy_aggregate(scope, scope_id)
+    count, total = agg if agg is not None else _scan_accuracy(**filters)
+    return {"success": True, "average_accuracy": round(total / count, 2) if count else 0, "count": count}
 
 
-@router.get("/ai/average-accuracy")
-def get_average_accuracy():
+@router.get("/ai/student/{student_id}/completed")
+def get_student_completed(student_id: str):
     try:
         res = (
-            supabase.table("student_ai_accuracy")
-            .select("accuracy")
+            supabase.table("student_progress")
+            .select("completed")
+            .eq("student_id", student_id)
+            .limit(1)
             .execute()
         )
+        completed = int(res.data[0]["completed"]) if res.data else 0
+    except Exception as e:
+        print("⚠️ student_progress unavailable, scanning student_cost_estimates:", e)
+        res = (
+            supabase.table("student_cost_estimates")
+            .select("challenge_id")
+            .eq("student_id", student_id)
+            .eq("status", "submitted")
+            .execute()
+        )
+        completed = len(res.data or [])
 
-        rows = res.data or []
-
-        if not rows:
-            return {"success": True, "average_accuracy": 0}
+    return {"success": True, "completed": completed}
 
-        # Convert to floats
-        accuracies = [
-            float(r["accuracy"]) for r in rows
-            if r.get("accuracy") is not None
-        ]
+@router.get("/ai/student/{student_id}/average-accuracy")
+def get_student_average_accuracy(student_id: str):
+    return _average_accuracy("student", student_id, student_id=student_id)
 
-        if not accuracies:
-            return {"success": True, "average_accuracy": 0}
 
-        avg = sum(accuracies) / len(accuracies)
+@router.get("/ai/challenge/{challenge_id}/average-accuracy")
+def get_challenge_average_accuracy(challenge_id: str):
+    try:
+        return _average_accuracy("challenge", challenge_id, challenge_id=challenge_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {
-            "success": True,
-            "average_accuracy": round(avg, 2)
-        }
 
+@router.get("/ai/average-accuracy")
+def get_average_accuracy():
+    try:
+        return _average_accuracy("global")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -201,11 +225,67 @@ def get_ai_estimates(challenge_id: UUID):
         print("🔥 BACKEND ERROR:", e)
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
     
+gemini = provide("gemini")
+agemini = provide("agemini")
+
+
+def compute_and_store_accuracy(student_id, challenge_id, student_items, ai_items):
+    input_hash = content_hash(student_items, ai_items)
+    stored = get_stored_accuracy(student_id, challenge_id, input_hash)
+    if stored is not None:
+        return stored
+
+    # Score locally; Gemini is only consulted as a tiebreaker when enabled
+    accuracy_result = accuracy_scorer.evaluate(student_items, ai_items, llm=gemini)
+    store_accuracy(student_id, challenge_id, accuracy_result, input_hash)
+    return accuracy_result
+
+
+def get_stored_accuracy(student_id, challenge_id, input_hash):
+    """The stored accuracy details when they were computed from the same inputs, else None."""
+    res = (
+        supabase.table("student_ai_accuracy")
+        .select("details, input_hash")
+        .eq("student_id", student_id)
+        .eq("challenge_id", challenge_id)
+        .limit(1)
+        .execute()
+    )
+    row = res.data[0] if res.data else None
+    if row and row.get("input_hash") == input_hash and row.get("details"):
+        return row["details"]
+    return None
+
+
+def store_accuracy(student_id, challenge_id, accuracy_result, input_hash=None):
+    # Fallback safety
+    final_accuracy = float(accuracy_result.get("final_accuracy", 0))
+
+    # One round trip: (student_id, challenge_id) is unique, see student_ai_accuracy.sql
+    supabase.table("student_ai_accuracy").upsert({
+        "student_id": student_id,
+        "challenge_id": challenge_id,
+        "accuracy": final_accuracy,
+        "details": accuracy_result,
+        "input_hash": input_hash,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }, on_conflict="student_id,challenge_id", returning="minimal").execute()
+
+
+def _accuracy_job(payload: dict, progress):
+    progress(10, "Comparing estimates")
+    accuracy_result = compute_and_store_accuracy(
+        payload["student_id"], payload["challenge_id"],
+        payload["student_items"], payload["ai_items"],
+    )
+    return {"success": True, "accuracy": accuracy_result}
+
+job_queue.register("ai_accuracy", _accuracy_job)
+
+
 @router.post("/ai/calculate-accuracy")
-def calculate_accuracy(payload: dict):
+async def calculate_accuracy(payload: dict, background: bool = False):
     try:
-        gemini = GeminiPriceSearch()
-
         # Extract fields
         student_items = payload.get("student_items", [])
         ai_items = payload.get("ai_items", [])
@@ -219,50 +299,31 @@ def calculate_accuracy(payload: dict):
         if not student_items or not ai_items:
             raise HTTPException(status_code=400, detail="Missing student_items or ai_items")
 
-        # Generate accuracy using Gemini
-        accuracy_result = gemini.calculate_accuracy(student_items, ai_items)
-
-        # Fallback safety
-        final_accuracy = float(accuracy_result.get("final_accuracy", 0))
-
-        # CHECK IF RECORD ALREADY EXISTS
-        existing = (
-            supabase.table("student_ai_accuracy")
-            .select("*")
-            .eq("student_id", student_id)
-            .eq("challenge_id", challenge_id)
-            .execute()
-        )
-
-        if existing.data:
-            # UPDATE existing accuracy instead of inserting duplicates
-            supabase.table("student_ai_accuracy").update({
-                "accuracy": final_accuracy,
-                "details": accuracy_result
-            }).eq("student_id", student_id).eq("challenge_id", challenge_id).execute()
-        else:
-            # INSERT new record
-            supabase.table("student_ai_accuracy").insert({
+        if background:
+            job_id = job_queue.enqueue("ai_accuracy", {
                 "student_id": student_id,
                 "challenge_id": challenge_id,
-                "accuracy": final_accuracy,
-                "details": accuracy_result
-            }).execute()
+                "student_items": student_items,
+                "ai_items": ai_items,
+            }, owner_id=student_id)
+            return {"success": True, "status": "queued", "job_id": job_id}
+
+        # Unchanged inputs return the stored result without rescoring
+        input_hash = content_hash(student_items, ai_items)
+        stored = await run_blocking(get_stored_accuracy, student_id, challenge_id, input_hash)
+        if stored is not None:
+            return {"success": True, "accuracy": stored, "cached": True}
+
+        # Local scoring takes milliseconds; the blocking Supabase writes go to the DB executor
+        accuracy_result = await accuracy_scorer.aevaluate(student_items, ai_items, llm=agemini)
+        await run_blocking(store_accuracy, student_id, challenge_id, accuracy_result, input_hash)
 
         # Return clean response
         return {
             "success": True,
-            "accuracy": accuracy_result
+            "accuracy": accuracy_result,
+            "cached": False
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
-
-
-    
-
-
-
-
-    
@@ -1,5 +1,9 @@
+import json, queue, threading
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from services.estimate_service import run_ai_estimation, save_teacher_estimates
+from services.job_service import job_queue
+from services.plan_cache import plan_cache
 import uuid
 from pydantic import BaseModel
 
@@ -8,26 +12,108 @@ router = APIRouter(prefix="/cost-estimates", tags=["Cost Estimates"])
 class EstimationRequest(BaseModel):
     plan_file_url: str
 
+
+def _estimation_job(payload: dict, progress):
+    return run_ai_estimation(
+        payload["challenge_id"],
+        payload["plan_file_url"],
+        progress=progress,
+        use_cache=not payload.get("refresh", False),
+    )
+
+job_queue.register("ai_estimation", _estimation_job)
+
+
 @router.post("/challenges/{challenge_id}/estimate")
-def run_estimation(challenge_id: str, request: EstimationRequest):
+def run_estimation(challenge_id: str, request: EstimationRequest, background: bool = False,
+                   refresh: bool = False):
+    if background:
+        job_id = job_queue.enqueue("ai_estimation", {
+            "challenge_id": challenge_id,
+            "plan_file_url": request.plan_file_url,
+            "refresh": refresh,
+        })
+        return {"status": "queued", "job_id": job_id}
+
     result = run_ai_estimation(
         challenge_id=challenge_id,
-        plan_file_url=request.plan_file_url
+        plan_file_url=request.plan_file_url,
+        use_cache=not refresh,
     )
     return {"status": "success", "data": result}
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/challenges/{challenge_id}/estimate/stream")
+def run_estimation_stream(challenge_id: str, request: EstimationRequest, refresh: bool = False):
+    """
+    Server-Sent Events variant of the estimate endpoint. Emits `progress`,
+    `elements`, `boq`, one `row` per priced item, then `summary` (the same
+    payload the blocking endpoint returns) or `error`.
+    """
+    events = queue.Queue()
+
+    def worker():
+        try:
+            result = run_ai_estimation(
+                challenge_id,
+                request.plan_file_url,
+                progress=lambda pct, message=None: events.put(
+                    _sse("progress", {"progress": pct, "message": message})
+                ),
+                on_event=lambda event, data: events.put(_sse(event, data)),
+                use_cache=not refresh,
+            )
+            events.put(_sse("summary", result))
+        except Exception as e:
+            events.put(_sse("error", {"detail": str(e)}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+    def stream():
+        while True:
+            chunk = events.get()
+            if chunk is None:
+                break
+            yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/estimate")
-def estimate(payload: dict):
+def estimate(payload: dict, background: bool = False, refresh: bool = False):
     challenge_id = payload.get("challenge_id")
     plan_file_url = payload.get("plan_file_url")
 
     if not challenge_id or not plan_file_url:
         return {"error": "challenge_id and plan_file_url are required"}
 
-    result = run_ai_estimation(challenge_id, plan_file_url)
+    if background:
+        job_id = job_queue.enqueue("ai_estimation", {
+            "challenge_id": challenge_id,
+            "plan_file_url": plan_file_url,
+            "refresh": refresh,
+        })
+        return {"status": "queued", "job_id": job_id}
+
+    result = run_ai_estimation(challenge_id, plan_file_url, use_cache=not refresh)
     return result 
 
 
+@router.delete("/challenges/{challenge_id}/estimate/cache")
+def invalidate_estimation_cache(challenge_id: str):
+    """Forget cached plan analyses so the next estimate re-runs Gemini."""
+    removed = plan_cache.invalidate(challenge_id=challenge_id)
+    return {"status": "success", "removed": removed}
+
+
 @router.post("/save")
 def save_estimates(payload: dict):
     challenge_id = payload.get("challenge_id")
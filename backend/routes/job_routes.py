@@ -0,0 +1,21 @@
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException
+from routes.auth import current_user
+from services.job_service import job_queue
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str, user: Tuple[str, Optional[str]] = Depends(current_user)):
+    """
+    Status, progress and (once finished) result of a background job, for the
+    user who queued it or a teacher.
+    """
+    user_id, role = user
+    job = job_queue.get(job_id)
+    owner_id = job.pop("owner_id") if job else None
+    # Someone else's job answers like a missing one, so ids cannot be probed
+    if not job or (role not in ("teacher", "admin") and owner_id != str(user_id)):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
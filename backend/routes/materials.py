@@ -1,17 +1,14 @@
 # routes/materials.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from supabase import create_client, Client
 import os
-from dotenv import load_dotenv
+from services.container import provide
+from services.db_executor import db_execute
 
-load_dotenv()
 
 router = APIRouter(prefix="/api/materials", tags=["Materials"])
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = provide("supabase")
 
 
 class MaterialAdd(BaseModel):
@@ -39,7 +36,7 @@ async def add_material(material: MaterialAdd):
 
         print("🟩 Inserting data:", data) 
 
-        response = supabase.table("materials_prices").insert(data).execute()
+        response = await db_execute(supabase.table("materials_prices").insert(data))
 
         print("🟩 Supabase response:", response)  
 
@@ -57,7 +54,7 @@ async def add_material(material: MaterialAdd):
 @router.get("/teacher/{teacher_id}")
 async def get_teacher_materials(teacher_id: str):
     try:
-        response = supabase.table("materials_prices").select("*").eq("teacher_id", teacher_id).execute()
+        response = await db_execute(supabase.table("materials_prices").select("*").eq("teacher_id", teacher_id))
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -66,7 +63,7 @@ async def get_teacher_materials(teacher_id: str):
 @router.put("/update/{material_id}")
 async def update_material(material_id: int, updated_data: dict):
     try:
-        response = supabase.table("materials_prices").update(updated_data).eq("material_id", material_id).execute()
+        response = await db_execute(supabase.table("materials_prices").update(updated_data).eq("material_id", material_id))
         return {"success": True, "message": "Material updated", "data": response.data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -75,11 +72,10 @@ async def update_material(material_id: int, updated_data: dict):
 async def get_all_materials():
     """Fetch only materials created by teachers (teacher_id not null)."""
     try:
-        response = (
+        response = await db_execute(
             supabase.table("materials_prices")
             .select("*")
-            .filter("teacher_id", "not.is", "null") 
-            .execute()
+            .filter("teacher_id", "not.is", "null")
         )
 
         materials = [m for m in response.data if m.get("teacher_id")]  
@@ -95,7 +91,7 @@ async def get_all_materials():
 @router.delete("/delete/{material_id}")
 async def delete_material(material_id: str):
     try:
-        supabase.table("materials_prices").delete().eq("material_id", material_id).execute()
+        await db_execute(supabase.table("materials_prices").delete().eq("material_id", material_id))
         return {"success": True, "message": "Material deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,21 +1,17 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from supabase import create_client, Client
 import os
-from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from services.email_service import EmailService
+from services.container import provide
+from services.db_executor import db_execute, run_blocking
 from models.verification_model import VerificationCodeRequest, VerificationCodeVerify
 
-load_dotenv()
 
 verification_router = APIRouter(prefix="/verification")
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = provide("supabase")
 
-email_service = EmailService()
+email_service = provide("email_service")
 
 @verification_router.post("/send-code")
 async def send_verification_code(request: VerificationCodeRequest):
@@ -30,7 +26,7 @@ async def send_verification_code(request: VerificationCodeRequest):
         expires_at = datetime.utcnow() + timedelta(minutes=10)
         
         # Delete any existing verification codes for this email
-        supabase.table("verification_codes").delete().eq("email", email).execute()
+        await db_execute(supabase.table("verification_codes").delete().eq("email", email))
         
         # Insert new verification code
         verification_data = {
@@ -41,17 +37,19 @@ async def send_verification_code(request: VerificationCodeRequest):
             "is_used": False
         }
         
-        result = supabase.table("verification_codes").insert(verification_data).execute()
+        result = await db_execute(supabase.table("verification_codes").insert(verification_data))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to save verification code")
         
         # Send email
-        email_sent, error_message = email_service.send_verification_email(email, verification_code)
+        email_sent, error_message = await run_blocking(
+            email_service.send_verification_email, email, verification_code
+        )
         
         if not email_sent:
             # If email failed to send, delete the verification code
-            supabase.table("verification_codes").delete().eq("email", email).execute()
+            await db_execute(supabase.table("verification_codes").delete().eq("email", email))
             # Log the detailed error message for debugging
             print(f"❌ Failed to send verification email to {email}: {error_message}")
             # Return more detailed error information
@@ -76,7 +74,7 @@ async def verify_code(request: VerificationCodeVerify):
         code = request.code.strip()
         
         # Get verification code from database
-        result = supabase.table("verification_codes").select("*").eq("email", email).eq("code", code).eq("is_used", False).execute()
+        result = await db_execute(supabase.table("verification_codes").select("*").eq("email", email).eq("code", code).eq("is_used", False))
         
         if not result.data:
             raise HTTPException(status_code=400, detail="Invalid verification code")
@@ -88,11 +86,11 @@ async def verify_code(request: VerificationCodeVerify):
         current_time = datetime.utcnow().replace(tzinfo=expires_at.tzinfo)
         if current_time > expires_at:
             # Mark expired code as used
-            supabase.table("verification_codes").update({"is_used": True}).eq("id", verification_record["id"]).execute()
+            await db_execute(supabase.table("verification_codes").update({"is_used": True}).eq("id", verification_record["id"]))
             raise HTTPException(status_code=400, detail="Verification code has expired")
         
         # Mark code as used
-        supabase.table("verification_codes").update({"is_used": True}).eq("id", verification_record["id"]).execute()
+        await db_execute(supabase.table("verification_codes").update({"is_used": True}).eq("id", verification_record["id"]))
         
         return {"message": "Email verified successfully", "email": email}
         
@@ -108,7 +106,7 @@ async def resend_verification_code(request: VerificationCodeRequest):
         email = request.email.lower().strip()
         
         # Check if there's an existing unused code
-        result = supabase.table("verification_codes").select("*").eq("email", email).eq("is_used", False).execute()
+        result = await db_execute(supabase.table("verification_codes").select("*").eq("email", email).eq("is_used", False))
         
         if result.data:
             existing_record = result.data[0]
@@ -130,7 +128,7 @@ async def resend_verification_code(request: VerificationCodeRequest):
         expires_at = datetime.utcnow() + timedelta(minutes=10)
         
         # Delete any existing verification codes for this email
-        supabase.table("verification_codes").delete().eq("email", email).execute()
+        await db_execute(supabase.table("verification_codes").delete().eq("email", email))
         
         # Insert new verification code
         verification_data = {
@@ -141,17 +139,19 @@ async def resend_verification_code(request: VerificationCodeRequest):
             "is_used": False
         }
         
-        result = supabase.table("verification_codes").insert(verification_data).execute()
+        result = await db_execute(supabase.table("verification_codes").insert(verification_data))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to save verification code")
         
         # Send email
-        email_sent, error_message = email_service.send_verification_email(email, verification_code)
+        email_sent, error_message = await run_blocking(
+            email_service.send_verification_email, email, verification_code
+        )
         
         if not email_sent:
             # If email failed to send, delete the verification code
-            supabase.table("verification_codes").delete().eq("email", email).execute()
+            await db_execute(supabase.table("verification_codes").delete().eq("email", email))
             # Log the detailed error message for debugging
             print(f"❌ Failed to resend verification email to {email}: {error_message}")
             raise HTTPException(
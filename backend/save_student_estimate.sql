@@ -0,0 +1,177 @@
+-- Atomic save of a student's cost estimate: header, items and summary in
+-- one transaction and one PostgREST round trip
+-- (supabase.rpc("save_student_estimate", ...)). Totals are computed here
+-- and returned, so the caller does not need to read anything back.
+--
+-- p_items: [{"id", "cost_category", "material_name", "quantity", "unit", "unit_price"}, ...]
+--   "id" is the client's stable row id (optional); see the item diff below.
+-- p_category_subtotals: [{"cost_category", "subtotal"}, ...]
+CREATE OR REPLACE FUNCTION save_student_estimate(
+    p_student_id UUID,
+    p_challenge_id UUID,
+    p_items JSONB,
+    p_contingency_percentage NUMERIC DEFAULT 0.10,
+    p_submit BOOLEAN DEFAULT FALSE,
+    p_category_subtotals JSONB DEFAULT '[]'::JSONB
+) RETURNS JSONB AS $$
+DECLARE
+    v_est_id UUID;
+    v_items JSONB;
+    v_subtotal NUMERIC;
+    v_contingency NUMERIC;
+    v_total NUMERIC;
+    v_status TEXT := CASE WHEN p_submit THEN 'submitted' ELSE 'draft' END;
+    v_submitted_at TIMESTAMP WITH TIME ZONE := CASE WHEN p_submit THEN NOW() END;
+BEGIN
+    -- Serialize saves of the same (student, challenge) so two first saves
+    -- cannot both insert a header
+    PERFORM pg_advisory_xact_lock(hashtext(p_student_id::TEXT || ':' || p_challenge_id::TEXT));
+
+    SELECT ROUND(COALESCE(SUM(
+        ROUND(COALESCE((i->>'quantity')::NUMERIC, 0) * COALESCE((i->>'unit_price')::NUMERIC, 0), 2)
+    ), 0), 2)
+    INTO v_subtotal
+    FROM jsonb_array_elements(COALESCE(p_items, '[]'::JSONB)) AS i;
+    v_contingency := ROUND(v_subtotal * p_contingency_percentage, 2);
+    v_total := v_subtotal + v_contingency;
+
+    SELECT "studentsCostEstimatesID" INTO v_est_id
+    FROM student_cost_estimates
+    WHERE student_id = p_student_id AND challenge_id = p_challenge_id
+    LIMIT 1;
+
+    IF v_est_id IS NULL THEN
+        INSERT INTO student_cost_estimates (student_id, challenge_id, total_amount, submitted_at, status)
+        VALUES (p_student_id, p_challenge_id, v_total, v_submitted_at, v_status)
+        RETURNING "studentsCostEstimatesID" INTO v_est_id;
+    ELSE
+        UPDATE student_cost_estimates
+        SET total_amount = v_total, submitted_at = v_submitted_at, status = v_status
+        WHERE "studentsCostEstimatesID" = v_est_id;
+    END IF;
+
+    -- Diff the items against the saved rows (see diff_estimate_items):
+    -- resolve each incoming row to an id, then delete, update and insert
+    -- only what changed.
+    WITH raw AS (
+        SELECT (i->>'id')::UUID AS raw_id, i, n,
+               ROW_NUMBER() OVER (PARTITION BY (i->>'id')::UUID ORDER BY n) AS seq
+        FROM jsonb_array_elements(COALESCE(p_items, '[]'::JSONB)) WITH ORDINALITY AS t(i, n)
+    ), incoming AS (
+        -- An id saved under another estimate is not reused, and only the
+        -- first row carrying an id keeps it; later repeats are id-less
+        SELECT CASE WHEN seq = 1 AND NOT EXISTS (
+                   SELECT 1 FROM student_cost_estimate_items o
+                   WHERE o.id = raw_id AND o."studentsCostEstimatesID" <> v_est_id
+               ) THEN raw_id END AS id,
+               i->>'cost_category' AS cost_category,
+               i->>'material_name' AS material_name,
+               (i->>'quantity')::NUMERIC AS quantity,
+               i->>'unit' AS unit,
+               (i->>'unit_price')::NUMERIC AS unit_price,
+               n
+        FROM raw
+    ), computed AS (
+        SELECT incoming.*,
+               ROUND(COALESCE(quantity, 0) * COALESCE(unit_price, 0), 2) AS amount,
+               CASE UPPER(TRIM(COALESCE(cost_category, '')))
+                   WHEN 'EARTHWORK' THEN 1
+                   WHEN 'FORMWORK & SCAFFOLDING' THEN 2
+                   WHEN 'MASONRY WORK' THEN 3
+                   WHEN 'CONCRETE WORK' THEN 4
+                   WHEN 'STEELWORK' THEN 5
+                   WHEN 'CARPENTRY WORK' THEN 6
+                   WHEN 'ROOFING WORK' THEN 7
+                   ELSE 0
+               END AS item_number
+        FROM incoming
+    ), spare AS (
+        -- Saved rows no incoming id claims, numbered per identical content
+        SELECT e.id, ROW_NUMBER() OVER (
+                   PARTITION BY e.cost_category, e.material_name, e.quantity, e.unit, e.unit_price
+                   ORDER BY e.created_at, e.id) AS k,
+               e.cost_category, e.material_name, e.quantity, e.unit, e.unit_price
+        FROM student_cost_estimate_items e
+        WHERE e."studentsCostEstimatesID" = v_est_id
+          AND e.id NOT IN (SELECT id FROM computed WHERE id IS NOT NULL)
+    ), idless AS (
+        SELECT c.n, ROW_NUMBER() OVER (
+                   PARTITION BY c.cost_category, c.material_name, c.quantity, c.unit, c.unit_price
+                   ORDER BY c.n) AS k,
+               c.cost_category, c.material_name, c.quantity, c.unit, c.unit_price
+        FROM computed c WHERE c.id IS NULL
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+               'id', COALESCE(c.id, s.id, gen_random_uuid()),
+               'cost_category', c.cost_category, 'material_name', c.material_name,
+               'quantity', c.quantity, 'unit', c.unit, 'unit_price', c.unit_price,
+               'amount', c.amount, 'item_number', c.item_number)), '[]'::JSONB)
+    INTO v_items
+    FROM computed c
+    LEFT JOIN idless l ON l.n = c.n
+    LEFT JOIN spare s
+      ON c.id IS NULL AND s.k = l.k
+     AND s.cost_category IS NOT DISTINCT FROM l.cost_category
+     AND s.material_name IS NOT DISTINCT FROM l.material_name
+     AND s.quantity IS NOT DISTINCT FROM l.quantity
+     AND s.unit IS NOT DISTINCT FROM l.unit
+     AND s.unit_price IS NOT DISTINCT FROM l.unit_price;
+
+    DELETE FROM student_cost_estimate_items e
+    WHERE e."studentsCostEstimatesID" = v_est_id
+      AND e.id NOT IN (SELECT (x->>'id')::UUID FROM jsonb_array_elements(v_items) AS x);
+
+    UPDATE student_cost_estimate_items e
+    SET challenge_id = p_challenge_id, cost_category = r.cost_category,
+        material_name = r.material_name, quantity = r.quantity, unit = r.unit,
+        unit_price = r.unit_price, amount = r.amount, item_number = r.item_number
+    FROM jsonb_to_recordset(v_items) AS r(
+        id UUID, cost_category TEXT, material_name TEXT, quantity NUMERIC,
+        unit TEXT, unit_price NUMERIC, amount NUMERIC, item_number INTEGER)
+    WHERE e.id = r.id AND e."studentsCostEstimatesID" = v_est_id
+      AND (e.challenge_id, e.cost_category, e.material_name, e.quantity, e.unit,
+           e.unit_price, e.amount, e.item_number)
+          IS DISTINCT FROM
+          (p_challenge_id, r.cost_category, r.material_name, r.quantity, r.unit,
+           r.unit_price, r.amount, r.item_number);
+
+    INSERT INTO student_cost_estimate_items (
+        id, "studentsCostEstimatesID", challenge_id, cost_category, material_name,
+        quantity, unit, unit_price, amount, item_number
+    )
+    SELECT r.id, v_est_id, p_challenge_id, r.cost_category, r.material_name,
+           r.quantity, r.unit, r.unit_price, r.amount, r.item_number
+    FROM jsonb_to_recordset(v_items) AS r(
+        id UUID, cost_category TEXT, material_name TEXT, quantity NUMERIC,
+        unit TEXT, unit_price NUMERIC, amount NUMERIC, item_number INTEGER)
+    WHERE NOT EXISTS (SELECT 1 FROM student_cost_estimate_items e WHERE e.id = r.id);
+
+    UPDATE students_estimates_summary
+    SET subtotal_amount = v_subtotal,
+        contingency_percentage = p_contingency_percentage,
+        contingency_amount = v_contingency,
+        total_amount = v_total,
+        category_subtotals = COALESCE(p_category_subtotals, '[]'::JSONB),
+        challenge_id = p_challenge_id
+    WHERE "studentsCostEstimatesID" = v_est_id;
+    IF NOT FOUND THEN
+        INSERT INTO students_estimates_summary (
+            "studentsCostEstimatesID", subtotal_amount, contingency_percentage,
+            contingency_amount, total_amount, category_subtotals, challenge_id
+        ) VALUES (
+            v_est_id, v_subtotal, p_contingency_percentage,
+            v_contingency, v_total, COALESCE(p_category_subtotals, '[]'::JSONB), p_challenge_id
+        );
+    END IF;
+
+    RETURN jsonb_build_object(
+        'studentsCostEstimatesID', v_est_id,
+        'subtotal_amount', v_subtotal,
+        'contingency_percentage', p_contingency_percentage,
+        'contingency_amount', v_contingency,
+        'total_amount', v_total,
+        'submitted_at', v_submitted_at,
+        'status', v_status
+    );
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,221 @@
+import os, json, hashlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from services.material_index import similarity_matrix, canonical_unit
+
+# Weight of each component in final_accuracy
+ACCURACY_WEIGHTS = {
+    "description": 0.25,
+    "quantity": 0.20,
+    "unit": 0.10,
+    "unit_price": 0.20,
+    "total_cost": 0.25,
+}
+ACCURACY_WEIGHTS.update(json.loads(os.getenv("ACCURACY_WEIGHTS", "{}")))
+# Pairs less alike than this are treated as a missing item plus an extra one
+ACCURACY_MATCH_THRESHOLD = float(os.getenv("ACCURACY_MATCH_THRESHOLD", "0.35"))
+# Similarity is multiplied by this when the two items are in different categories
+ACCURACY_CATEGORY_PENALTY = float(os.getenv("ACCURACY_CATEGORY_PENALTY", "0.8"))
+
+# Ask the LLM to settle description similarity when this share of the matched
+# pairs is ambiguous (similarity just above the threshold). Off by default.
+ACCURACY_LLM_TIEBREAK = os.getenv("ACCURACY_LLM_TIEBREAK", "false").lower() in ("1", "true", "yes")
+ACCURACY_TIEBREAK_BAND = float(os.getenv("ACCURACY_TIEBREAK_BAND", "0.2"))
+ACCURACY_TIEBREAK_MIN_SHARE = float(os.getenv("ACCURACY_TIEBREAK_MIN_SHARE", "0.25"))
+
+FIELDS = ("description_accuracy", "quantity_accuracy", "unit_accuracy",
+          "unit_price_accuracy", "total_cost_accuracy", "final_accuracy")
+
+
+def _num(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _normalize(item: Dict[str, Any]) -> Tuple[str, str, float, str, float, float]:
+    """(description, category, quantity, unit, unit_price, amount) for student or AI rows."""
+    desc = item.get("description") or item.get("material_name") or item.get("material") or ""
+    qty = _num(item.get("quantity"))
+    price = _num(item.get("unit_price"))
+    amount = item.get("amount")
+    if amount is None:
+        amount = item.get("total_cost")
+    amount = _num(amount) if amount is not None else qty * price
+    return (str(desc), (item.get("cost_category") or "").strip().upper(), qty,
+            canonical_unit(item.get("unit")), price, amount)
+
+
+def content_hash(student_items: List[Dict[str, Any]], ai_items: List[Dict[str, Any]]) -> str:
+    """
+    Hash of everything the score depends on: the normalized rows of both
+    sides (order-insensitive, like the assignment) and the scoring settings.
+    """
+    payload = {
+        "student": sorted(_normalize(x) for x in student_items or []),
+        "ai": sorted(_normalize(x) for x in ai_items or []),
+        "weights": ACCURACY_WEIGHTS,
+        "threshold": ACCURACY_MATCH_THRESHOLD,
+        "category_penalty": ACCURACY_CATEGORY_PENALTY,
+        "tiebreak": ACCURACY_LLM_TIEBREAK,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def closeness(a: Sequence[float], b: Sequence[float]) -> List[float]:
+    """Elementwise 1 - |a - b| / max(|a|, |b|), clamped to [0, 1]; two zeros are a match."""
+    return [
+        1.0 if x == y else max(0.0, 1.0 - abs(x - y) / max(abs(x), abs(y)))
+        for x, y in zip(a, b)
+    ]
+
+
+def assign(cost: List[List[float]]) -> List[Tuple[int, int]]:
+    """
+    Minimum-cost assignment (Hungarian algorithm, O(n^3)) for an n x m cost
+    matrix; returns (row, col) pairs, one per row or column, whichever is fewer.
+    """
+    n, m = len(cost), len(cost[0]) if cost else 0
+    if not n or not m:
+        return []
+    transposed = n > m
+    if transposed:
+        cost = [list(col) for col in zip(*cost)]
+        n, m = m, n
+
+    INF = float("inf")
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    p, way = [0] * (m + 1), [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0], j0 = i, 0
+        minv, used = [INF] * (m + 1), [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0, delta, j1 = p[j0], INF, 0
+            row = cost[i0 - 1]
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j], way[j] = cur, j0
+                    if minv[j] < delta:
+                        delta, j1 = minv[j], j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    pairs = [(p[j] - 1, j - 1) for j in range(1, m + 1) if p[j]]
+    return [(c, r) for r, c in pairs] if transposed else pairs
+
+
+class AccuracyScorer:
+    """
+    Deterministic scoring of a student's cost estimate against the AI one,
+    returning the same six fields the LLM evaluator did.
+
+    Student rows are aligned to AI rows by an optimal one-to-one assignment on
+    description similarity (discounted across categories). Matched pairs are
+    compared on quantity, unit, unit price and amount; unmatched rows on
+    either side lower every component through coverage.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None,
+                 threshold: float = ACCURACY_MATCH_THRESHOLD):
+        self.weights = weights or ACCURACY_WEIGHTS
+        self.threshold = threshold
+
+    def match(self, student: List[tuple], ai: List[tuple]) -> List[Tuple[int, int, float]]:
+        """(student index, AI index, similarity) for each accepted pair."""
+        penalty = ACCURACY_CATEGORY_PENALTY
+        sim = [
+            [x * penalty if s[1] and a[1] and s[1] != a[1] else x for x, a in zip(row, ai)]
+            for row, s in zip(similarity_matrix([s[0] for s in student], [a[0] for a in ai]), student)
+        ]
+        pairs = assign([[1.0 - x for x in row] for row in sim])
+        return [(i, j, sim[i][j]) for i, j in pairs if sim[i][j] >= self.threshold]
+
+    def score(self, student_items: List[Dict[str, Any]], ai_items: List[Dict[str, Any]],
+              description_override: Optional[float] = None) -> Dict[str, float]:
+        student = [_normalize(x) for x in student_items or []]
+        ai = [_normalize(x) for x in ai_items or []]
+        if not student or not ai:
+            return {f: 0.0 for f in FIELDS}
+
+        pairs = self.match(student, ai)
+        coverage = len(pairs) / max(len(student), len(ai))
+        s = [student[i] for i, _, _ in pairs]
+        a = [ai[j] for _, j, _ in pairs]
+
+        def mean(xs):
+            return sum(xs) / len(xs) if xs else 0.0
+
+        description = sum(x for _, _, x in pairs) / max(len(student), len(ai))
+        if description_override is not None:
+            description = (description + description_override) / 2
+        quantity = mean(closeness([x[2] for x in s], [x[2] for x in a])) * coverage
+        unit = mean([1.0 if x[3] == y[3] else 0.0 for x, y in zip(s, a)]) * coverage
+        unit_price = mean(closeness([x[4] for x in s], [x[4] for x in a])) * coverage
+        total_cost = closeness([sum(x[5] for x in student)], [sum(x[5] for x in ai)])[0]
+
+        parts = {"description": description, "quantity": quantity, "unit": unit,
+                 "unit_price": unit_price, "total_cost": total_cost}
+        final = sum(self.weights[k] * v for k, v in parts.items()) / sum(self.weights.values())
+
+        return {
+            "description_accuracy": round(description * 100, 2),
+            "quantity_accuracy": round(quantity * 100, 2),
+            "unit_accuracy": round(unit * 100, 2),
+            "unit_price_accuracy": round(unit_price * 100, 2),
+            "total_cost_accuracy": round(total_cost * 100, 2),
+            "final_accuracy": round(final * 100, 2),
+        }
+
+    def needs_tiebreak(self, student_items, ai_items) -> bool:
+        """True when enough matches sit just above the threshold to be worth an LLM opinion."""
+        student = [_normalize(x) for x in student_items or []]
+        ai = [_normalize(x) for x in ai_items or []]
+        pairs = self.match(student, ai)
+        if not pairs:
+            return bool(student and ai)
+        ambiguous = sum(1 for _, _, x in pairs if x < self.threshold + ACCURACY_TIEBREAK_BAND)
+        return ambiguous / len(pairs) >= ACCURACY_TIEBREAK_MIN_SHARE
+
+    def evaluate(self, student_items, ai_items, llm=None) -> Dict[str, float]:
+        """
+        Local score, optionally refined by `llm.calculate_accuracy` (a
+        GeminiPriceSearch) when ACCURACY_LLM_TIEBREAK is on and the
+        description matching is ambiguous.
+        """
+        if llm is not None and ACCURACY_LLM_TIEBREAK and self.needs_tiebreak(student_items, ai_items):
+            try:
+                verdict = llm.calculate_accuracy(student_items, ai_items)
+                return self.score(student_items, ai_items,
+                                  description_override=_num(verdict.get("description_accuracy")) / 100)
+            except Exception as e:
+                print("⚠️ Accuracy tiebreak failed, using local score:", e)
+        return self.score(student_items, ai_items)
+
+    async def aevaluate(self, student_items, ai_items, llm=None) -> Dict[str, float]:
+        """evaluate() with an AsyncGeminiPriceSearch tiebreaker."""
+        if llm is not None and ACCURACY_LLM_TIEBREAK and self.needs_tiebreak(student_items, ai_items):
+            try:
+                verdict = await llm.calculate_accuracy(student_items, ai_items)
+                return self.score(student_items, ai_items,
+                                  description_override=_num(verdict.get("description_accuracy")) / 100)
+            except Exception as e:
+                print("⚠️ Accuracy tiebreak failed, using local score:", e)
+        return self.score(student_items, ai_items)
+
+
+accuracy_scorer = AccuracyScorer()
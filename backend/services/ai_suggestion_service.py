@@ -1,12 +1,19 @@
 import json
-from services.gemini_service import GeminiPriceSearch
+from services.gemini_service import GeminiPriceSearch, AsyncGeminiPriceSearch
 from models.ai_suggestion_model import SuggestionRequest
 
 class SuggestionService:
-    def __init__(self):
-        self.gemini = GeminiPriceSearch()
+    def __init__(self, gemini=None, agemini=None):
+        self.gemini = gemini or GeminiPriceSearch()
+        self.agemini = agemini or AsyncGeminiPriceSearch()
 
     def get_suggestion(self, req: SuggestionRequest) -> str:
+        return self.gemini._call_gemini(self._prompt(req), cache=True)
+
+    async def aget_suggestion(self, req: SuggestionRequest) -> str:
+        return await self.agemini._call_gemini(self._prompt(req), cache=True)
+
+    def _prompt(self, req: SuggestionRequest) -> str:
         rows_text = "\n".join(
             f"{r.cost_category}: {r.description} "
             f"(qty {r.quantity} {r.unit or ''}, price {r.unit_price})"
@@ -50,4 +57,4 @@ Each suggestion MUST:
 """
 
 
-        return self.gemini._call_gemini(prompt)
+        return prompt
@@ -1,16 +1,13 @@
 import uuid
 import string
 import random
-from supabase import create_client, Client
 import os
-from dotenv import load_dotenv
 from datetime import datetime
+from services.container import provide
+from services.db_executor import db_execute
 
-load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = provide("supabase")
 
 class ClassService:
     @staticmethod
@@ -26,13 +23,13 @@ class ClassService:
             # Generate unique class key
             class_key = ClassService.generate_class_key()
             while True:
-                existing_class = supabase.table("classes").select("id").eq("class_key", class_key).execute()
+                existing_class = await db_execute(supabase.table("classes").select("id").eq("class_key", class_key))
                 if not existing_class.data:
                     break
                 class_key = ClassService.generate_class_key()
 
             # Check teacher role
-            user = supabase.table("users").select("role").eq("id", teacher_id).single().execute()
+            user = await db_execute(supabase.table("users").select("role").eq("id", teacher_id).single())
             if (not user.data) or (user.data["role"] != "teacher"):
                 return {"success": False, "message": "Only teachers can create classes"}
 
@@ -45,7 +42,7 @@ class ClassService:
                 "teacher_id": teacher_id,
                 "created_at": datetime.utcnow().isoformat()
             }
-            result = supabase.table("classes").insert(class_data).execute()
+            result = await db_execute(supabase.table("classes").insert(class_data))
 
             if result.data:
                 return {"success": True, "class": result.data[0], "message": "Class created successfully"}
@@ -59,7 +56,7 @@ class ClassService:
         """Join a class using class key"""
         try:
             # 1. Find class by key
-            class_result = supabase.table("classes").select("id, teacher_id").eq("class_key", class_key).execute()
+            class_result = await db_execute(supabase.table("classes").select("id, teacher_id").eq("class_key", class_key))
             if not class_result.data:
                 return {"success": False, "message": "Invalid class key"}
 
@@ -67,10 +64,10 @@ class ClassService:
             teacher_id = class_info["teacher_id"]
 
             # 2. Check if already enrolled
-            existing = supabase.table("class_enrollments")\
+            existing = await db_execute(supabase.table("class_enrollments")\
                 .select("id")\
                 .eq("class_id", class_info["id"])\
-                .eq("student_id", student_id).execute()
+                .eq("student_id", student_id))
 
             if existing.data and len(existing.data) > 0:
                 return {"success": False, "message": "You already requested/joined this class"}
@@ -84,7 +81,7 @@ class ClassService:
                 "status": "pending",
                 "created_at": datetime.utcnow().isoformat()
             }
-            result = supabase.table("class_enrollments").insert(enrollment_data).execute()
+            result = await db_execute(supabase.table("class_enrollments").insert(enrollment_data))
 
             if result.data:
                 return {"success": True, "message": "Request sent, waiting for teacher approval"}
@@ -99,20 +96,18 @@ class ClassService:
         """Get all classes created by a teacher (only count accepted students)"""
         try:
             # fetch teacher's classes
-            result = supabase.table("classes")\
+            result = await db_execute(supabase.table("classes")\
                 .select("id, class_name, description, class_key, teacher_id, created_at")\
-                .eq("teacher_id", teacher_id)\
-                .execute()
+                .eq("teacher_id", teacher_id))
 
             if result.data:
                 classes = []
                 for class_data in result.data:
                     # count only accepted students for this class
-                    count_res = supabase.table("class_enrollments")\
+                    count_res = await db_execute(supabase.table("class_enrollments")\
                         .select("id", count="exact")\
                         .eq("class_id", class_data["id"])\
-                        .eq("status", "accepted")\
-                        .execute()
+                        .eq("status", "accepted"))
 
                     student_count = count_res.count if hasattr(count_res, "count") else 0
 
@@ -137,25 +132,25 @@ class ClassService:
     async def get_student_classes(student_id: str):
         """Get all classes a student is enrolled in (pending or accepted)"""
         try:
-            enrollments = supabase.table("class_enrollments")\
+            enrollments = await db_execute(supabase.table("class_enrollments")\
                 .select("id, class_id, status, created_at")\
-                .eq("student_id", student_id).execute()
+                .eq("student_id", student_id))
 
             if not enrollments.data:
                 return {"success": True, "classes": []}
 
             classes = []
             for enrollment in enrollments.data:
-                class_res = supabase.table("classes")\
+                class_res = await db_execute(supabase.table("classes")\
                     .select("id, class_name, description, teacher_id")\
-                    .eq("id", enrollment["class_id"]).single().execute()
+                    .eq("id", enrollment["class_id"]).single())
 
                 if not class_res.data:
                     continue
 
-                teacher_res = supabase.table("users")\
+                teacher_res = await db_execute(supabase.table("users")\
                     .select("first_name, last_name")\
-                    .eq("id", class_res.data["teacher_id"]).single().execute()
+                    .eq("id", class_res.data["teacher_id"]).single())
 
                 teacher_name = "Unknown"
                 if teacher_res.data:
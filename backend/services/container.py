@@ -0,0 +1,139 @@
+import os, threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Build every client/service during app startup instead of on first use.
+# Off by default: importing supabase/httpx and creating clients adds to
+# cold-start time, and not every process (job worker, script) needs them all.
+CONTAINER_WARM_ON_STARTUP = os.getenv("CONTAINER_WARM_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+
+class Container:
+    """
+    Process-wide clients and services. Each one is built once and shared by
+    every route and service, instead of every module calling create_client
+    (and constructing its own Gemini/Price services) separately.
+
+    Entries are built on first access. The FastAPI lifespan calls close() on
+    shutdown, and start() (build everything up front) only when
+    CONTAINER_WARM_ON_STARTUP is set.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._instances = {}
+
+    def _get(self, name: str, factory):
+        inst = self._instances.get(name)
+        if inst is None:
+            with self._lock:
+                inst = self._instances.get(name)
+                if inst is None:
+                    inst = factory()
+                    self._instances[name] = inst
+        return inst
+
+    @property
+    def supabase(self) -> "Client":
+        from supabase import create_client
+        return self._get(
+            "supabase",
+            lambda: create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")),
+        )
+
+    @property
+    def sb(self):
+        from services.supabase_service import SupabaseClient
+        return self._get("sb", lambda: SupabaseClient(self.supabase))
+
+    @property
+    def supasvc(self):
+        from services.supabase_service import SupabaseService
+        return self._get("supasvc", lambda: SupabaseService(self.supabase))
+
+    @property
+    def gemini(self):
+        from services.gemini_service import GeminiPriceSearch
+        return self._get("gemini", GeminiPriceSearch)
+
+    @property
+    def agemini(self):
+        from services.gemini_service import AsyncGeminiPriceSearch
+        return self._get("agemini", AsyncGeminiPriceSearch)
+
+    @property
+    def price_service(self):
+        from services.price_service import PriceService
+        return self._get(
+            "price_service",
+            lambda: PriceService(gemini=self.gemini, agemini=self.agemini, sb=self.sb),
+        )
+
+    @property
+    def suggestion_service(self):
+        from services.ai_suggestion_service import SuggestionService
+        return self._get(
+            "suggestion_service",
+            lambda: SuggestionService(gemini=self.gemini, agemini=self.agemini),
+        )
+
+    @property
+    def cost_estimation_service(self):
+        from services.cost_estimation_service import CostEstimationService
+        return self._get("cost_estimation_service", lambda: CostEstimationService(self.sb))
+
+    @property
+    def email_service(self):
+        from services.email_service import EmailService
+        return self._get("email_service", EmailService)
+
+    @property
+    def job_queue(self):
+        from services.job_service import JobQueue
+        return self._get("job_queue", JobQueue)
+
+    def start(self):
+        """Build every entry now rather than on first use."""
+        for name in ("supabase", "sb", "supasvc", "gemini", "agemini", "price_service",
+                     "suggestion_service", "cost_estimation_service"):
+            getattr(self, name)
+
+    async def close(self):
+        from services.http_client import async_http_client
+        await async_http_client.aclose()
+        with self._lock:
+            self._instances.clear()
+
+
+class _Provided:
+    """Module-level stand-in for a container entry, resolved on each attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(getattr(container, self._name), attr)
+
+    def __repr__(self):
+        return f"<provided {self._name}>"
+
+
+def provide(name: str):
+    """
+    Module-level handle to a shared container entry, e.g.
+
+        supabase = provide("supabase")
+
+    so existing `supabase.table(...)` call sites keep working unchanged.
+    """
+    return _Provided(name)
+
+
+container = Container()
+
+
+def get_price_service():
+    """FastAPI dependency for the shared PriceService."""
+    return container.price_service
@@ -1,10 +1,15 @@
+import os
 from datetime import datetime
 from models.cost_estimation_model import CostEstimateCreate, CostEstimateItemIn, CostEstimateOut
 from services.supabase_service import SupabaseClient
 
+# Save through the save_student_estimate RPC (one transaction, one round trip)
+COST_ESTIMATE_SAVE_RPC = os.getenv("COST_ESTIMATE_SAVE_RPC", "true").lower() in ("1", "true", "yes")
+
 class CostEstimationService:
     def __init__(self, sb: SupabaseClient):
         self.db = sb
+        self.use_rpc = COST_ESTIMATE_SAVE_RPC
 
     def _totals(self, items: list[CostEstimateItemIn], pct: float):
         subtotal = round(sum((i.quantity or 0) * (i.unit_price or 0) for i in items), 2)
@@ -13,6 +18,23 @@ class CostEstimationService:
         return subtotal, contingency_amount, total
 
     def save_estimation(self, payload: CostEstimateCreate) -> CostEstimateOut:
+        try:
+            return self._save(payload)
+        finally:
+            # Even a failed save may have written part of the estimate
+            self.db.invalidate_estimate(str(payload.student_id), str(payload.challenge_id))
+
+    def _save(self, payload: CostEstimateCreate) -> CostEstimateOut:
+        if self.use_rpc:
+            try:
+                return self._save_rpc(payload)
+            except Exception as e:
+                # PGRST202: the function has not been created yet
+                if getattr(e, "code", None) != "PGRST202":
+                    raise
+                print("⚠️ save_student_estimate RPC missing, using per-table saves:", e)
+                self.use_rpc = False
+
         subtotal, contingency_amount, total = self._totals(payload.items, payload.contingency_percentage)
 
         status = "submitted" if payload.submit else "draft"
@@ -59,6 +81,33 @@ class CostEstimationService:
 
 
 
+    def _save_rpc(self, payload: CostEstimateCreate) -> CostEstimateOut:
+        res = self.db.save_estimate_atomic(
+            student_id=str(payload.student_id),
+            challenge_id=str(payload.challenge_id),
+            items=payload.items,
+            pct=payload.contingency_percentage,
+            submit=payload.submit,
+            category_subtotals=[s.dict() for s in payload.category_subtotals] if payload.category_subtotals else [],
+        )
+        subtotal = float(res["subtotal_amount"])
+        contingency_amount = float(res["contingency_amount"])
+        total = float(res["total_amount"])
+        return CostEstimateOut(
+            studentsCostEstimatesID=res["studentsCostEstimatesID"],
+            subtotal_amount=subtotal,
+            contingency_percentage=payload.contingency_percentage,
+            contingency_amount=contingency_amount,
+            total_amount=total,
+            submitted_at=res.get("submitted_at"),
+            total_material_cost_tc=subtotal,
+            contingencies_percent_int=round(payload.contingency_percentage * 100),
+            contingencies_amount=contingency_amount,
+            grand_total_cost=total,
+            category_subtotals=payload.category_subtotals or [],
+            status=res["status"],
+        )
+
     def get_estimation(self, student_id, challenge_id):
         return self.db.get_estimate_with_items(str(student_id), str(challenge_id))
 
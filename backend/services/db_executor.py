@@ -0,0 +1,30 @@
+import os, asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Threads reserved for blocking Supabase/PostgREST (and other sync client) calls
+# made from async handlers. Sized separately from the default asyncio pool so a
+# burst of slow queries can't starve other to_thread users, and vice versa.
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call on the DB executor without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+
+async def db_execute(query):
+    """
+    Await a supabase-py query builder: build the query as usual, but pass it
+    here instead of calling `.execute()` on the event loop.
+
+        res = await db_execute(supabase.table("classes").select("*").eq("id", class_id))
+    """
+    return await run_blocking(query.execute)
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
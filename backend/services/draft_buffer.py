@@ -0,0 +1,290 @@
+import os, time, uuid, sqlite3, threading, traceback
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.cost_estimation_model import CostEstimateCreate, CostEstimateOut
+from services.container import container
+from services.job_service import JOBS_DB_PATH
+from services.supabase_service import _estimate_item_row, item_sort_key
+
+DRAFT_BUFFER_ENABLED = os.getenv("DRAFT_BUFFER_ENABLED", "true").lower() in ("1", "true", "yes")
+# A draft is written once it has been quiet this long...
+DRAFT_DEBOUNCE_SECONDS = float(os.getenv("DRAFT_DEBOUNCE_SECONDS", "10"))
+# ...or once it has been buffered this long, even while edits keep coming
+DRAFT_MAX_DELAY_SECONDS = float(os.getenv("DRAFT_MAX_DELAY_SECONDS", "60"))
+DRAFT_POLL_SECONDS = float(os.getenv("DRAFT_POLL_SECONDS", "2"))
+# How long a flusher may hold a draft before another process may take it over
+DRAFT_FLUSH_LEASE_SECONDS = float(os.getenv("DRAFT_FLUSH_LEASE_SECONDS", "30"))
+# How long a submit waits for another process's flush of the same draft
+DRAFT_DISCARD_WAIT_SECONDS = float(os.getenv("DRAFT_DISCARD_WAIT_SECONDS", "5"))
+# Drafts are serialized per (student, challenge) through this many shared locks
+DRAFT_LOCK_STRIPES = int(os.getenv("DRAFT_LOCK_STRIPES", "64"))
+
+Key = Tuple[str, str]
+
+
+class DraftFlushInProgress(Exception):
+    """Another process is still writing this draft; the submit should be retried."""
+
+
+class DraftBuffer:
+    """
+    Write-behind buffer for draft saves of student cost estimates.
+
+    The latest draft per (student, challenge) is kept in the jobs SQLite
+    database and written to Supabase once edits pause for
+    DRAFT_DEBOUNCE_SECONDS (or at most DRAFT_MAX_DELAY_SECONDS after the
+    first buffered edit), on submit, and on shutdown. Buffered drafts survive
+    a restart and are flushed by the next run.
+
+    The first draft of an estimate is written straight through, so every
+    buffered draft already has a header id to answer with.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, service=None):
+        self.db_path = db_path
+        self._service = service
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._locks = [threading.Lock() for _ in range(max(1, DRAFT_LOCK_STRIPES))]
+        # Marks this process's flush leases, so discard() can tell them apart
+        self._owner = uuid.uuid4().hex
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    @property
+    def service(self):
+        return self._service or container.cost_estimation_service
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            if not self._ready:
+                with self._init_lock:
+                    if not self._ready:
+                        self._init_db(conn)
+                        self._ready = True
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS estimate_drafts (
+                student_id TEXT NOT NULL,
+                challenge_id TEXT NOT NULL,
+                est_id TEXT NOT NULL,
+                payload TEXT,
+                first_buffered_at REAL,
+                updated_at REAL,
+                flushing_until REAL NOT NULL DEFAULT 0,
+                flushing_by TEXT,
+                PRIMARY KEY (student_id, challenge_id)
+            )
+        """)
+        cols = {r["name"] for r in conn.execute("PRAGMA table_info(estimate_drafts)")}
+        if "flushing_by" not in cols:
+            conn.execute("ALTER TABLE estimate_drafts ADD COLUMN flushing_by TEXT")
+
+    def _lock(self, key: Key) -> threading.Lock:
+        """The lock serializing put/flush/discard of `key` (shared with other keys, never nested)."""
+        return self._locks[hash(key) % len(self._locks)]
+
+    @staticmethod
+    def _key(payload: CostEstimateCreate) -> Key:
+        return str(payload.student_id), str(payload.challenge_id)
+
+    def put(self, payload: CostEstimateCreate) -> CostEstimateOut:
+        """Buffer a draft save and answer as if it had been written."""
+        key = self._key(payload)
+        with self._lock(key):
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT est_id FROM estimate_drafts WHERE student_id = ? AND challenge_id = ?", key
+                ).fetchone()
+                if row:
+                    now = time.time()
+                    conn.execute(
+                        "UPDATE estimate_drafts SET payload = ?, updated_at = ?, "
+                        "first_buffered_at = COALESCE(first_buffered_at, ?) "
+                        "WHERE student_id = ? AND challenge_id = ?",
+                        (payload.model_dump_json(), now, now) + key,
+                    )
+                    return self._draft_out(row["est_id"], payload)
+
+            # First draft we see for this estimate: write through to get its id
+            out = self.service.save_estimation(payload)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO estimate_drafts (student_id, challenge_id, est_id) VALUES (?, ?, ?) "
+                    "ON CONFLICT(student_id, challenge_id) DO UPDATE SET est_id = excluded.est_id",
+                    key + (str(out.studentsCostEstimatesID),),
+                )
+            return out
+
+    def _draft_out(self, est_id: str, payload: CostEstimateCreate) -> CostEstimateOut:
+        subtotal, contingency_amount, total = self.service._totals(payload.items, payload.contingency_percentage)
+        return CostEstimateOut(
+            studentsCostEstimatesID=est_id,
+            subtotal_amount=subtotal,
+            contingency_percentage=payload.contingency_percentage,
+            contingency_amount=contingency_amount,
+            total_amount=total,
+            submitted_at=None,
+            total_material_cost_tc=subtotal,
+            contingencies_percent_int=round(payload.contingency_percentage * 100),
+            contingencies_amount=contingency_amount,
+            grand_total_cost=total,
+            category_subtotals=payload.category_subtotals or [],
+            status="draft",
+        )
+
+    def pending(self, student_id: str, challenge_id: str) -> Optional[CostEstimateCreate]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload FROM estimate_drafts WHERE student_id = ? AND challenge_id = ?",
+                (str(student_id), str(challenge_id)),
+            ).fetchone()
+        if row and row["payload"]:
+            return CostEstimateCreate.model_validate_json(row["payload"])
+        return None
+
+    def overlay(self, student_id: str, challenge_id: str, est: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """`est` (a get_estimate_with_items result) as it will look once the buffered draft is written."""
+        draft = self.pending(student_id, challenge_id)
+        if not draft or not est:
+            return est
+        subtotal, contingency_amount, total = self.service._totals(draft.items, draft.contingency_percentage)
+        est = dict(est)
+        est["status"] = "draft"
+        est["submitted_at"] = None
+        est["total_amount"] = total
+        # Same row shape and order as get_estimate_with_items returns
+        saved = {str(i.get("id")): i for i in est.get("items") or []}
+        items = []
+        for i in draft.items:
+            row = _estimate_item_row(est.get("studentsCostEstimatesID"), i)
+            row.setdefault("id", None)
+            row["created_at"] = saved.get(row["id"], {}).get("created_at")
+            items.append(row)
+        est["items"] = sorted(items, key=item_sort_key)
+        est["summary"] = dict(est.get("summary") or {}, **{
+            "subtotal_amount": subtotal,
+            "contingency_percentage": draft.contingency_percentage,
+            "contingency_amount": contingency_amount,
+            "total_amount": total,
+            "category_subtotals": [s.model_dump() for s in draft.category_subtotals],
+        })
+        return est
+
+    def discard(self, student_id: str, challenge_id: str):
+        """
+        Drop the buffered draft ahead of a submit, which supersedes it.
+
+        Holding the key lock means no flush from this process is writing the
+        draft (flush() saves under the same lock and re-reads the row first).
+        A flush leased by another process is waited for, briefly; if it is
+        still running, DraftFlushInProgress is raised rather than letting the
+        stale draft land after the submit.
+        """
+        key = (str(student_id), str(challenge_id))
+        with self._lock(key):
+            deadline = time.time() + DRAFT_DISCARD_WAIT_SECONDS
+            while True:
+                with self._connect() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    row = conn.execute(
+                        "SELECT flushing_until, flushing_by FROM estimate_drafts "
+                        "WHERE student_id = ? AND challenge_id = ?", key
+                    ).fetchone()
+                    if not row or row["flushing_until"] <= time.time() or row["flushing_by"] == self._owner:
+                        conn.execute("DELETE FROM estimate_drafts WHERE student_id = ? AND challenge_id = ?", key)
+                        conn.execute("COMMIT")
+                        return
+                    conn.execute("COMMIT")
+                if time.time() >= deadline:
+                    raise DraftFlushInProgress(f"Draft {key} is being saved by another worker; retry the submit")
+                time.sleep(0.2)
+
+    def _claim_due(self, force: bool) -> List[Key]:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT student_id, challenge_id FROM estimate_drafts "
+                "WHERE payload IS NOT NULL AND flushing_until <= ? "
+                "AND (? OR updated_at <= ? OR first_buffered_at <= ?)",
+                (now, int(force), now - DRAFT_DEBOUNCE_SECONDS, now - DRAFT_MAX_DELAY_SECONDS),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE estimate_drafts SET flushing_until = ?, flushing_by = ? "
+                "WHERE student_id = ? AND challenge_id = ?",
+                [(now + DRAFT_FLUSH_LEASE_SECONDS, self._owner, r["student_id"], r["challenge_id"]) for r in rows],
+            )
+            conn.execute("COMMIT")
+        return [(r["student_id"], r["challenge_id"]) for r in rows]
+
+    def flush(self, force: bool = False) -> int:
+        """Write due drafts (all of them when `force`); returns how many were written."""
+        written = 0
+        for key in self._claim_due(force):
+            with self._lock(key):
+                # Re-read under the lock: a submit may have discarded the draft,
+                # or a newer one may have replaced it, since it was claimed
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT payload, updated_at FROM estimate_drafts "
+                        "WHERE student_id = ? AND challenge_id = ? AND flushing_by = ? AND payload IS NOT NULL",
+                        key + (self._owner,),
+                    ).fetchone()
+                if not row:
+                    continue
+                try:
+                    self.service.save_estimation(CostEstimateCreate.model_validate_json(row["payload"]))
+                    written += 1
+                    flushed = True
+                except Exception as e:
+                    print("⚠️ Draft flush failed, will retry:", key, e)
+                    flushed = False
+                with self._connect() as conn:
+                    # Only clear the payload if no newer draft arrived meanwhile
+                    conn.execute(
+                        "UPDATE estimate_drafts SET flushing_until = 0, flushing_by = NULL, "
+                        "payload = CASE WHEN ? AND updated_at = ? THEN NULL ELSE payload END, "
+                        "first_buffered_at = CASE WHEN ? AND updated_at = ? THEN NULL ELSE first_buffered_at END "
+                        "WHERE student_id = ? AND challenge_id = ?",
+                        (int(flushed), row["updated_at"], int(flushed), row["updated_at"]) + key,
+                    )
+        return written
+
+    def _loop(self):
+        while not self._stop.wait(DRAFT_POLL_SECONDS):
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="draft-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+        try:
+            n = self.flush(force=True)
+            if n:
+                print(f"💾 Flushed {n} buffered drafts on shutdown")
+        except Exception:
+            traceback.print_exc()
+
+
+draft_buffer = DraftBuffer()
@@ -2,10 +2,10 @@ import os
 import random
 import string
 import logging
-import requests
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from typing import Optional, Tuple
+from services.http_client import http_client, HTTP_CONNECT_TIMEOUT
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -13,6 +13,8 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+BREVO_READ_TIMEOUT = float(os.getenv("BREVO_READ_TIMEOUT", "15"))
+
 class EmailService:
     def __init__(self):
         # Brevo Configuration
@@ -79,7 +81,14 @@ class EmailService:
                 "textContent": text_body
             }
             
-            response = requests.post(self.brevo_api_url, json=payload, headers=headers)
+            # Only retry rate limiting: a 5xx may already have sent the email
+            response = http_client.post(
+                self.brevo_api_url,
+                json=payload,
+                headers=headers,
+                timeout=(HTTP_CONNECT_TIMEOUT, BREVO_READ_TIMEOUT),
+                retry_statuses=(429,),
+            )
             
             if response.status_code == 201:
                 response_data = response.json()
@@ -1,24 +1,159 @@
-import uuid, os, time
+import uuid, os, time, threading
 from datetime import datetime
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
-from supabase import create_client
-from dotenv import load_dotenv
 from fastapi import HTTPException
 
-from services.gemini_service import GeminiPriceSearch
-from services.supabase_service import SupabaseService
-from services.price_service import PriceService
+from services.container import provide
+from services.plan_cache import plan_cache
+from services.json_stream import IncompleteJsonArray
+from services.material_index import UNIT_MAP
+from services.price_service import PRICE_BATCH_SIZE
+
+
+supabase = provide("supabase")
+gemini = provide("gemini")
+supasvc = provide("supasvc")
+price_service = provide("price_service")
+
+# Max number of batch pricing prompts in flight during one estimation run
+PRICING_CONCURRENCY = int(os.getenv("ESTIMATE_PRICING_CONCURRENCY", "3"))
+# Estimation only needs a unit price per row, so ask for low/median/high
+# ranges instead of full listings unless this is turned off. Ranges are
+# stored in materials_prices like listings, so they still fill the cache.
+PRICING_STATS_ONLY = os.getenv("ESTIMATE_PRICING_STATS_ONLY", "true").lower() in ("1", "true", "yes")
+# Stream the BoQ from Gemini and start pricing rows before generation finishes
+STREAM_BOQ = os.getenv("ESTIMATE_STREAM_BOQ", "true").lower() in ("1", "true", "yes")
+
+SKIP_KEYWORDS = ("steel beam", "steel column", "i-beam", "h-beam")
+
+# Downloads and hashes plans for plan_cache keys off the request path
+_plan_key_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="plan-cache-key")
+
+
+def _pricing_key(row):
+    """(description, unit, size) identity used to price duplicate rows once."""
+    desc = (row.get("description") or "").strip()
+    size = row.get("size")
+    if not size or not str(size).strip():
+        size = "N/A"
+    return (desc, row.get("unit") or "", str(size).strip())
+
+
+def _skip_pricing(desc: str) -> bool:
+    d = desc.lower()
+    return any(k in d for k in SKIP_KEYWORDS) or d.startswith("water")
+
+
+class _RowPricer:
+    """
+    Prices BoQ rows as they are added. Distinct (description, unit, size) keys
+    are queued and handed to PriceService.get_unit_prices PRICE_BATCH_SIZE at
+    a time, so pricing starts on the first rows while later ones are still
+    being generated. Failed lookups price at 0.0. `on_priced(row)` is called,
+    from a pricing thread, once a row has its final price.
+    """
+
+    def __init__(self, site_location, on_priced=None, max_workers=None):
+        self.site_location = site_location
+        self.on_priced = on_priced or (lambda row: None)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers or PRICING_CONCURRENCY))
+        self._lock = threading.Lock()
+        self._rows = defaultdict(list)
+        self._prices = {}
+        self._pending = []
+        self._futures = []
+
+    def add(self, row):
+        key = _pricing_key(row)
+        _apply_price(row, 0.0)
+        if _skip_pricing(key[0]):
+            self.on_priced(row)
+            return
+
+        with self._lock:
+            self._rows[key].append(row)
+            price = self._prices.get(key)
+            if price is None and len(self._rows[key]) == 1:
+                self._pending.append(key)
+            flush = len(self._pending) >= PRICE_BATCH_SIZE
+
+        if price is not None:
+            _apply_price(row, price)
+            self.on_priced(row)
+        if flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            chunk, self._pending = self._pending, []
+        if chunk:
+            self._futures.append(self._pool.submit(self._price, chunk))
+
+    def _price(self, keys):
+        try:
+            price_service.get_unit_prices(
+                keys, site_hint=self.site_location, max_workers=1,
+                on_priced=lambda i, unit_price, _listings: self._set(keys[i], unit_price),
+                stats_only=PRICING_STATS_ONLY,
+            )
+        except Exception as e:
+            print("⚠️ Pricing failed:", e)
+        for key in keys:
+            if key not in self._prices:
+                self._set(key, 0.0)
+
+    def _set(self, key, unit_price):
+        with self._lock:
+            self._prices[key] = unit_price or 0.0
+            rows = list(self._rows[key])
+        for row in rows:
+            _apply_price(row, self._prices[key])
+            self.on_priced(row)
+
+    def finish(self):
+        """Price whatever is still queued and wait for every batch."""
+        self.flush()
+        try:
+            for fut in self._futures:
+                fut.result()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def cancel(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _rows_until_cut_off(rows):
+    """`rows`, then a final None if the BoQ stream was cut off before its end."""
+    try:
+        yield from rows
+    except IncompleteJsonArray as e:
+        print("⚠️ BoQ stream incomplete, not caching it:", e)
+        yield None
+
+
+def _apply_price(row, unit_price):
+    qty = float(row.get("quantity") or 0)
+    row["unit_price"] = unit_price if unit_price else 0.0
+    row["amount"] = round(qty * unit_price, 2) if unit_price else 0.0
+
+
+def run_ai_estimation(challenge_id: str, plan_file_url: str, progress=None, on_event=None,
+                      use_cache: bool = True):
+    """
+    Full AI estimation for a challenge plan. `progress(pct, message)`, when
+    given, is called as each stage finishes (used by background jobs).
+    `on_event(event, data)` receives partial results as they become available:
+    "elements", "boq", and one "row" per priced BoQ row. Rows are priced while
+    the BoQ is still streaming in, so "row" events can arrive before "boq".
+    Plan analysis (elements + BoQ) is reused from plan_cache unless `use_cache`
+    is False, in which case it is recomputed and the cache entry refreshed.
+    """
+    report = progress or (lambda pct, message=None: None)
+    emit = on_event or (lambda event, data: None)
 
-load_dotenv()
-
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
-gemini = GeminiPriceSearch()
-supasvc = SupabaseService()
-price_service = PriceService()
-
-
-def run_ai_estimation(challenge_id: str, plan_file_url: str):
     # 0) Fetch challenge context
     challenge = supasvc.get_challenge(challenge_id)
     if not challenge:
@@ -29,14 +164,25 @@ def run_ai_estimation(challenge_id: str, plan_file_url: str):
     challenge_ins  = challenge.get("challenge_instructions") or ""
     site_location  = challenge.get("site_location") or "Cebu, Philippines"
 
-    elements_result = gemini.analyze_plan_extract_elements(plan_file_url)
+    report(5, "Analyzing plan")
+    # The key is needed up front only to read the cache; on a refresh it is
+    # just where the new analysis is stored, so the plan is hashed meanwhile
+    cache_key = _plan_key_pool.submit(plan_cache.key_for, challenge_id, plan_file_url,
+                                      challenge_name, challenge_obj, challenge_ins)
+    cached = plan_cache.get(cache_key.result()) if use_cache else None
 
-    if isinstance(elements_result, list):
-        elements = elements_result
-        confidence = 0.50
+    if cached:
+        elements = cached["elements"]
+        confidence = cached["confidence"]
     else:
-        elements = elements_result.get("elements", [])
-        confidence = elements_result.get("confidence", 0.50)
+        elements_result = gemini.analyze_plan_extract_elements(plan_file_url, cache=use_cache)
+
+        if isinstance(elements_result, list):
+            elements = elements_result
+            confidence = 0.50
+        else:
+            elements = elements_result.get("elements", [])
+            confidence = elements_result.get("confidence", 0.50)
 
     # 1) Create ai_analysis
     analysis_id = str(uuid.uuid4())
@@ -49,94 +195,85 @@ def run_ai_estimation(challenge_id: str, plan_file_url: str):
     }).execute()
 
     # 2) Extract elements from the plan
-    for e in elements:
-        supabase.table("structural_elements").insert({
+    supasvc.bulk_insert("structural_elements", [
+        {
             "element_id": str(uuid.uuid4()),
             "analysis_id": analysis_id,
-             "challenge_id": str(challenge_id),
+            "challenge_id": str(challenge_id),
             **e,
             "created_at": datetime.utcnow().isoformat()
-        }).execute()
-
-    # 3) Generate categorized BoQ rows (without prices)
-    estimates = gemini.generate_cost_estimates(
-        elements=elements,
-        challenge_id=challenge_id,
-        challenge_name=challenge_name,
-        challenge_objective=challenge_obj,
-        challenge_instructions=challenge_ins,
-        plan_file_urls=[plan_file_url],
-    )
-
-    
+        }
+        for e in elements
+    ], key="element_id")
+
+    report(30, f"Extracted {len(elements)} elements")
+    emit("elements", {"analysis_id": analysis_id, "confidence": confidence, "elements": elements})
+
+    # 3) Generate categorized BoQ rows (without prices) and 4) price each
+    #    item; unique rows are batched into a few Gemini prompts, and with
+    #    STREAM_BOQ the first batches are priced while Gemini is still
+    #    generating the rest of the BoQ.
+    if cached:
+        rows = cached["estimates"]
+    else:
+        boq_args = dict(
+            elements=elements,
+            challenge_id=challenge_id,
+            challenge_name=challenge_name,
+            challenge_objective=challenge_obj,
+            challenge_instructions=challenge_ins,
+            plan_file_urls=[plan_file_url],
+            cache=use_cache,
+        )
+        rows = gemini.stream_cost_estimates(**boq_args) if STREAM_BOQ else gemini.generate_cost_estimates(**boq_args)
+
+    pricer = _RowPricer(site_location, on_priced=lambda row: emit("row", row))
+    generated = []
+    estimates = []
     per_cat_index = defaultdict(int)
-    for row in estimates:
-        cat = row.get("cost_category") or "UNCATEGORIZED"
-        per_cat_index[cat] += 1
-        row["item_number"] = per_cat_index[cat]
+    complete = True
+    try:
+        for row in _rows_until_cut_off(rows):
+            if row is None:
+                complete = False
+                break
+            generated.append(dict(row))
+
+            cat = row.get("cost_category") or "UNCATEGORIZED"
+            per_cat_index[cat] += 1
+            row["item_number"] = per_cat_index[cat]
+
+            unit_raw = (row.get("unit") or "").strip().lower()
+            row["unit"] = UNIT_MAP.get(unit_raw, unit_raw)
+
+            estimates.append(row)
+            pricer.add(row)
+    except Exception:
+        pricer.cancel()
+        raise
+
+    # A cut-off BoQ is still priced and saved, but never cached as the plan's analysis
+    if generated and complete and not cached:
+        plan_cache.put(cache_key.result(), challenge_id, confidence, elements, generated)
+
+    emit("boq", {"estimates": estimates})
+    report(55, f"Pricing {len(estimates)} items")
+    pricer.finish()
+    report(90, "Saving results")
 
-    # 4) Price each item
     category_subtotals = defaultdict(float)
     enriched = []
+    estimate_rows = []
     for row in estimates:
         desc = row.get("description") or ""
-        unit_raw = (row.get("unit") or "").strip().lower()
-        unit_map = {
-            "sheets": "sheet",
-            "sheet(s)": "sheet",
-            "bags": "bag",
-            "bag(s)": "bag",
-            "kgs": "kg",
-            "kg(s)": "kg",
-            "pcs.": "pcs",
-            "pieces": "pcs",
-            "piece": "pcs",
-            "meters": "m",
-            "metre": "m",
-            "metres": "m",
-            "sqm": "m²",
-            "sq.m": "m²",
-            "sq m": "m²",
-            "sq. m": "m²",
-            "cubic meter": "m³",
-            "cubic meters": "m³",
-            "bd ft": "board ft",     
-            "board feet": "board ft", 
-            "tubes": "tube",
-        }
-        unit = unit_map.get(unit_raw, unit_raw)
-        row["unit"] = unit
+        unit = row["unit"]
         qty  = float(row.get("quantity") or 0)
         cat  = row.get("cost_category") or "UNCATEGORIZED"
-        size = row.get("size")
-
-        if not size or not str(size).strip():
-            size = "N/A"
 
-        
-        desc = row.get("description") or ""
-
-        skip_keywords = ("steel beam", "steel column", "i-beam", "h-beam")
-        if any(k in desc.lower() for k in skip_keywords):
-            unit_price = 0.0
-            _listings = []
-        elif desc.lower().startswith("water"):
-            unit_price = 0.0
-            _listings = []
-        else:
-            unit_price, _listings = price_service.get_unit_price(
-    desc, unit, size=size, site_hint=site_location, challenge_id=challenge_id
-)
-
-        amount = round(qty * unit_price, 2) if unit_price else 0.0
-
-        row["unit_price"] = unit_price if unit_price else 0.0
-        row["amount"] = amount
-
-        category_subtotals[cat] += amount
+        category_subtotals[cat] += row["amount"]
         enriched.append(row)
 
-        supabase.table("ai_cost_estimates").insert({
+        estimate_rows.append({
             "estimate_id": str(uuid.uuid4()),
             "analysis_id": analysis_id,
             "challenge_id": str(challenge_id),
@@ -148,7 +285,9 @@ def run_ai_estimation(challenge_id: str, plan_file_url: str):
             "amount": row["amount"],
             "cost_category": cat,
             "created_at": datetime.utcnow().isoformat()
-        }).execute()
+        })
+
+    supasvc.bulk_insert("ai_cost_estimates", estimate_rows, key="estimate_id")
 
     for estimate in estimates:
         category = estimate.get("cost_category", "").upper()
@@ -218,13 +357,6 @@ def run_ai_estimation(challenge_id: str, plan_file_url: str):
         }
     }
 
-import uuid
-from datetime import datetime
-from .supabase_service import SupabaseService
-
-supasvc = SupabaseService()
-supabase = supasvc.client
-
 def save_teacher_estimates(challenge_id: str, analysis_id: str, items: list[dict], summary: dict):
     # 1. Collect ids to keep
     keep_ids = [str(i["estimate_id"]) for i in items if i.get("estimate_id")]
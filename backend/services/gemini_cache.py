@@ -0,0 +1,125 @@
+import os, time, sqlite3, hashlib, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "1000"))
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Set to a file path to keep responses across restarts; unset = memory only
+GEMINI_CACHE_DB_PATH = os.getenv("GEMINI_CACHE_DB_PATH")
+
+
+class GeminiResponseCache:
+    """
+    Two-tier memo of Gemini responses keyed on a hash of model + prompt:
+    a bounded in-memory LRU with TTL, backed by an optional SQLite file.
+    """
+
+    def __init__(self, max_entries: int = GEMINI_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = GEMINI_CACHE_TTL_SECONDS,
+                 db_path: Optional[str] = GEMINI_CACHE_DB_PATH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if self.db_path:
+            self._init_db()
+
+    @staticmethod
+    def key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS gemini_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._memory[key]
+
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT response, created_at FROM gemini_responses WHERE cache_key = ?",
+                        (key,),
+                    ).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    self._remember(key, row[0], row[1])
+                    with self._lock:
+                        self.hits += 1
+                    return row[0]
+            except Exception as e:
+                print("⚠️ Gemini disk cache read failed:", e)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, response: str, created_at: float):
+        with self._lock:
+            self._memory[key] = (response, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def set(self, key: str, response: str):
+        now = time.time()
+        self._remember(key, response, now)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO gemini_responses (cache_key, response, created_at) "
+                        "VALUES (?, ?, ?)",
+                        (key, response, now),
+                    )
+                    conn.execute(
+                        "DELETE FROM gemini_responses WHERE created_at < ?", (now - self.ttl_seconds,)
+                    )
+            except Exception as e:
+                print("⚠️ Gemini disk cache write failed:", e)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM gemini_responses")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk": bool(self.db_path),
+            }
+
+
+gemini_cache = GeminiResponseCache()
@@ -1,5 +1,12 @@
-import os, json, requests
-from typing import List, Dict, Any
+import os, json
+from typing import List, Dict, Any, Iterator, Optional
+
+from services.gemini_cache import gemini_cache
+from services.http_client import http_client, async_http_client, HTTP_CONNECT_TIMEOUT
+from services.json_stream import JsonArrayStream, IncompleteJsonArray
+
+# Generation can legitimately take a while; connecting should not
+GEMINI_READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "120"))
 
 class GeminiPriceSearch:
     def __init__(self):
@@ -8,17 +15,93 @@ class GeminiPriceSearch:
             "https://generativelanguage.googleapis.com/v1beta/models/"
             "gemini-2.5-flash-lite:generateContent"
         )
+        self.stream_url = self.url.replace(":generateContent", ":streamGenerateContent")
+
+    def _call_gemini(self, prompt: str, cache: bool = False) -> str:
+        """
+        Send a prompt to Gemini and return the response text. With `cache=True`
+        an identical earlier prompt is answered from gemini_cache.
+        """
+        if cache:
+            key = gemini_cache.key(self.url, prompt)
+            cached = gemini_cache.get(key)
+            if cached is not None:
+                return cached
+
+        text = self._request(prompt)
+        if cache and text:
+            gemini_cache.set(key, text)
+        return text
+
+    def _request(self, prompt: str) -> str:
+        resp = http_client.post(
+            f"{self.url}?key={self.api_key}",
+            json=self._payload(prompt),
+            headers={"Content-Type": "application/json"},
+            timeout=(HTTP_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT),
+        )
+        return self._extract_text(resp.status_code, resp.text, resp.json() if resp.status_code == 200 else None)
+
+    def _stream_text(self, prompt: str) -> Iterator[str]:
+        """Yield the response text piece by piece as Gemini generates it (SSE)."""
+        resp = http_client.post(
+            f"{self.stream_url}?alt=sse&key={self.api_key}",
+            json=self._payload(prompt),
+            headers={"Content-Type": "application/json"},
+            timeout=(HTTP_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT),
+            stream=True,
+        )
+        with resp:
+            if resp.status_code != 200:
+                self._extract_text(resp.status_code, resp.text, None)
 
-    def _call_gemini(self, prompt: str) -> str:
-        headers = {"Content-Type": "application/json"}
-        payload = {"contents": [{"parts": [{"text": prompt}]}]}
-        resp = requests.post(f"{self.url}?key={self.api_key}", json=payload, headers=headers)
-
-        if resp.status_code != 200:
-            print("⚠️ Gemini API error:", resp.text)
-            raise Exception(f"Gemini API error: {resp.text}")
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                try:
+                    data = json.loads(line[5:].strip())
+                    parts = data["candidates"][0]["content"]["parts"]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    continue
+                for part in parts:
+                    if part.get("text"):
+                        yield part["text"]
+
+    def _stream_array(self, prompt: str, cache: bool = False) -> Iterator[Dict]:
+        """
+        Stream a prompt whose answer is a JSON array, yielding each element as
+        soon as it is complete. A cached answer is replayed the same way, and a
+        completed stream is cached like a `_call_gemini` response.
+
+        Raises IncompleteJsonArray, after yielding every complete element, if
+        the array was never closed (a truncated or cut-off response).
+        """
+        parser = JsonArrayStream()
+        key = gemini_cache.key(self.url, prompt) if cache else None
+        cached = gemini_cache.get(key) if cache else None
+        if cached is not None:
+            yield from parser.feed(cached)
+        else:
+            text = []
+            for piece in self._stream_text(prompt):
+                text.append(piece)
+                yield from parser.feed(piece)
+            if cache and text and parser.done:
+                gemini_cache.set(key, "".join(text))
+
+        if parser.errors:
+            print(f"⚠️ Skipped {parser.errors} malformed element(s) in streamed Gemini response")
+        if not parser.done:
+            raise IncompleteJsonArray("Gemini response ended before the JSON array was closed")
+
+    def _payload(self, prompt: str) -> Dict[str, Any]:
+        return {"contents": [{"parts": [{"text": prompt}]}]}
+
+    def _extract_text(self, status_code: int, body: str, data) -> str:
+        if status_code != 200:
+            print("⚠️ Gemini API error:", body)
+            raise Exception(f"Gemini API error: {body}")
 
-        data = resp.json()
         try:
             return data["candidates"][0]["content"]["parts"][0]["text"]
         except (KeyError, IndexError, TypeError):
@@ -43,13 +126,16 @@ class GeminiPriceSearch:
             print("Raw content received (first 500 chars):", cleaned[:500])
             return {"error": "Invalid JSON format", "raw": cleaned}
         
-    def calculate_accuracy(self, student_items, ai_items):
+    def calculate_accuracy(self, student_items, ai_items, cache: bool = True):
                 """
                 Uses Gemini to evaluate similarity between the student's cost estimate
                 and the AI-generated cost estimate.
                 Returns structured accuracy percentages.
                 """
+                response = self._call_gemini(self._accuracy_prompt(student_items, ai_items), cache=cache)
+                return self._parse_accuracy(response)
 
+    def _accuracy_prompt(self, student_items, ai_items) -> str:
                 prompt = f"""
             You are an accuracy evaluator for construction cost estimates.
 
@@ -85,9 +171,9 @@ class GeminiPriceSearch:
 
             Return only valid JSON.
             """
+                return prompt
 
-                response = self._call_gemini(prompt)
-
+    def _parse_accuracy(self, response: str):
                 # Extract JSON object safely
                 import re, json
                 match = re.search(r"\{.*\}", response, re.DOTALL)
@@ -127,8 +213,12 @@ class GeminiPriceSearch:
 
 
 
-    def analyze_plan_extract_elements(self, plan_file_url: str) -> List[Dict]:
-        prompt = f"""
+    def analyze_plan_extract_elements(self, plan_file_url: str, cache: bool = True) -> List[Dict]:
+        raw = self._call_gemini(self._plan_elements_prompt(plan_file_url), cache=cache)
+        return self._safe_json_parse(raw)
+
+    def _plan_elements_prompt(self, plan_file_url: str) -> str:
+        return f"""
 You are an assistant that analyzes architectural floor plan or elevation drawings.
 
 Input: {plan_file_url}
@@ -143,8 +233,6 @@ Task:
 
 Output strictly as a JSON array only.
 """
-        raw = self._call_gemini(prompt)
-        return self._safe_json_parse(raw)
 
     def generate_cost_estimates(
         self,
@@ -156,8 +244,32 @@ Output strictly as a JSON array only.
         challenge_instructions: str,
         plan_file_urls: List[str],
         site_location: str = "Cebu, Philippines",
+        cache: bool = True,
     ) -> List[Dict]:
-        prompt = f"""
+        prompt = self._cost_estimates_prompt(
+            elements=elements,
+            challenge_id=challenge_id,
+            challenge_name=challenge_name,
+            challenge_objective=challenge_objective,
+            challenge_instructions=challenge_instructions,
+            plan_file_urls=plan_file_urls,
+            site_location=site_location,
+        )
+        raw = self._call_gemini(prompt, cache=cache)
+        return self._parse_cost_estimates(raw)
+
+    def _cost_estimates_prompt(
+        self,
+        *,
+        elements: List[Dict],
+        challenge_id: str,
+        challenge_name: str,
+        challenge_objective: str,
+        challenge_instructions: str,
+        plan_file_urls: List[str],
+        site_location: str = "Cebu, Philippines",
+    ) -> str:
+        return f"""
 Please act as a senior structural cost estimator.
 
 ### Project details
@@ -210,25 +322,78 @@ Please act as a senior structural cost estimator.
 
 Return ONLY the JSON array. Thank you.
 """
-        raw = self._call_gemini(prompt)
+
+    def stream_cost_estimates(self, *, cache: bool = True, **kwargs) -> Iterator[Dict]:
+        """
+        Same rows as generate_cost_estimates (same keyword arguments), yielded
+        one at a time while Gemini is still generating the rest. Raises
+        IncompleteJsonArray at the end if the response was cut off.
+        """
+        for row in self._stream_array(self._cost_estimates_prompt(**kwargs), cache=cache):
+            row = self._clean_estimate_row(row)
+            if row is not None:
+                yield row
+
+    def _parse_cost_estimates(self, raw: str) -> List[Dict]:
         data = self._safe_json_parse(raw)
+        rows = (self._clean_estimate_row(row) for row in (data if isinstance(data, list) else []))
+        return [row for row in rows if row is not None]
 
+    def _clean_estimate_row(self, row) -> Optional[Dict]:
         # Light schema guard
         ok = {
             "EARTHWORK","FORMWORK & SCAFFOLDING","MASONRY WORK",
             "CONCRETE WORK","STEELWORK","CARPENTRY WORK","ROOFING WORK"
         }
-        out = []
-        for row in data if isinstance(data, list) else []:
-            if row.get("cost_category") not in ok:
-                continue
-
-            try:
-                row["quantity"] = float(row.get("quantity", 0) or 0)
-            except Exception:
-                row["quantity"] = 0.0
-            row["unit_price"] = None
-            row["amount"] = None
-            row.setdefault("assumptions", None)
-            out.append(row)
-        return out
\ No newline at end of file
+        if not isinstance(row, dict) or row.get("cost_category") not in ok:
+            return None
+
+        try:
+            row["quantity"] = float(row.get("quantity", 0) or 0)
+        except Exception:
+            row["quantity"] = 0.0
+        row["unit_price"] = None
+        row["amount"] = None
+        row.setdefault("assumptions", None)
+        return row
+
+
+class AsyncGeminiPriceSearch(GeminiPriceSearch):
+    """
+    asyncio flavour of GeminiPriceSearch for `async def` routes: the same
+    prompts, parsing and response cache, but every Gemini round trip is
+    awaited on the shared httpx client instead of blocking the event loop.
+    """
+
+    async def _call_gemini(self, prompt: str, cache: bool = False) -> str:
+        if cache:
+            key = gemini_cache.key(self.url, prompt)
+            cached = gemini_cache.get(key)
+            if cached is not None:
+                return cached
+
+        text = await self._request(prompt)
+        if cache and text:
+            gemini_cache.set(key, text)
+        return text
+
+    async def _request(self, prompt: str) -> str:
+        resp = await async_http_client.post(
+            f"{self.url}?key={self.api_key}",
+            json=self._payload(prompt),
+            headers={"Content-Type": "application/json"},
+            timeout=(HTTP_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT),
+        )
+        return self._extract_text(resp.status_code, resp.text, resp.json() if resp.status_code == 200 else None)
+
+    async def calculate_accuracy(self, student_items, ai_items, cache: bool = True):
+        response = await self._call_gemini(self._accuracy_prompt(student_items, ai_items), cache=cache)
+        return self._parse_accuracy(response)
+
+    async def analyze_plan_extract_elements(self, plan_file_url: str, cache: bool = True) -> List[Dict]:
+        raw = await self._call_gemini(self._plan_elements_prompt(plan_file_url), cache=cache)
+        return self._safe_json_parse(raw)
+
+    async def generate_cost_estimates(self, *, cache: bool = True, **kwargs) -> List[Dict]:
+        raw = await self._call_gemini(self._cost_estimates_prompt(**kwargs), cache=cache)
+        return self._parse_cost_estimates(raw)
@@ -0,0 +1,197 @@
+import os, time, random, asyncio, threading, requests
+from typing import Dict, Iterable, Optional, Tuple, TYPE_CHECKING
+from requests.adapters import HTTPAdapter
+
+if TYPE_CHECKING:
+    import httpx
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "10"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _backoff(attempt: int, resp=None) -> float:
+    """Full-jitter exponential delay, or the upstream's Retry-After (capped)."""
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+class HttpClient:
+    """
+    Shared keep-alive session for outbound API calls (Gemini, Brevo).
+
+    Every request gets a (connect, read) deadline, and 429/5xx responses or
+    failures to connect are retried with full-jitter exponential backoff,
+    honouring Retry-After when the upstream sends one.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE):
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "errors": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def post(
+        self,
+        url: str,
+        *,
+        timeout: Optional[Tuple[float, float]] = None,
+        retries: int = HTTP_MAX_RETRIES,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        **kwargs,
+    ) -> requests.Response:
+        return self.request("POST", url, timeout=timeout, retries=retries,
+                            retry_statuses=retry_statuses, **kwargs)
+
+    def get(
+        self,
+        url: str,
+        *,
+        timeout: Optional[Tuple[float, float]] = None,
+        retries: int = HTTP_MAX_RETRIES,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        **kwargs,
+    ) -> requests.Response:
+        return self.request("GET", url, timeout=timeout, retries=retries,
+                            retry_statuses=retry_statuses, **kwargs)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        timeout: Optional[Tuple[float, float]] = None,
+        retries: int = HTTP_MAX_RETRIES,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        **kwargs,
+    ) -> requests.Response:
+        timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        retry_statuses = set(retry_statuses)
+
+        for attempt in range(retries + 1):
+            self._count("requests")
+            try:
+                resp = self.session.request(method, url, timeout=timeout, **kwargs)
+            except requests.ConnectionError as e:
+                # Includes ConnectTimeout; a ReadTimeout is not retried since the
+                # upstream may still be working on (or have acted on) the request.
+                if attempt == retries:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                print(f"⚠️ {method} {url.split('?')[0]} failed ({e.__class__.__name__}), retrying")
+                time.sleep(_backoff(attempt))
+                continue
+
+            if resp.status_code in retry_statuses and attempt < retries:
+                self._count("retries")
+                print(f"⚠️ {method} {url.split('?')[0]} returned {resp.status_code}, retrying")
+                resp.close()
+                time.sleep(_backoff(attempt, resp))
+                continue
+
+            if resp.status_code >= 400:
+                self._count("errors")
+            return resp
+
+    def stats(self) -> Dict[str, object]:
+        pools = []
+        for key, pool in list(self.adapter.poolmanager.pools._container.items()):
+            pools.append({
+                "host": f"{key.key_scheme}://{key.key_host}",
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "free_slots": pool.pool.qsize() if pool.pool else 0,
+                "maxsize": pool.pool.maxsize if pool.pool else 0,
+            })
+        with self._lock:
+            return {**self._stats, "pools": pools}
+
+
+class AsyncHttpClient:
+    """
+    asyncio counterpart of HttpClient built on a shared httpx.AsyncClient,
+    with the same deadlines, retry policy and counters. The underlying client
+    is created on first use inside the running event loop (httpx itself is
+    only imported then, keeping it off the startup path).
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE):
+        self.pool_size = pool_size
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._stats = {"requests": 0, "retries": 0, "errors": 0}
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        import httpx
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+        return self._client
+
+    async def post(
+        self,
+        url: str,
+        *,
+        timeout: Optional[Tuple[float, float]] = None,
+        retries: int = HTTP_MAX_RETRIES,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        **kwargs,
+    ) -> "httpx.Response":
+        import httpx
+        connect, read = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        timeout = httpx.Timeout(read, connect=connect)
+        retry_statuses = set(retry_statuses)
+
+        for attempt in range(retries + 1):
+            self._stats["requests"] += 1
+            try:
+                resp = await self.client.post(url, timeout=timeout, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if attempt == retries:
+                    self._stats["errors"] += 1
+                    raise
+                self._stats["retries"] += 1
+                print(f"⚠️ POST {url.split('?')[0]} failed ({e.__class__.__name__}), retrying")
+                await asyncio.sleep(_backoff(attempt))
+                continue
+
+            if resp.status_code in retry_statuses and attempt < retries:
+                self._stats["retries"] += 1
+                print(f"⚠️ POST {url.split('?')[0]} returned {resp.status_code}, retrying")
+                await asyncio.sleep(_backoff(attempt, resp))
+                continue
+
+            if resp.status_code >= 400:
+                self._stats["errors"] += 1
+            return resp
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, object]:
+        return dict(self._stats)
+
+
+http_client = HttpClient()
+async_http_client = AsyncHttpClient()
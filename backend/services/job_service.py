@@ -0,0 +1,232 @@
+import os, json, uuid, time, sqlite3, threading, traceback
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from services.container import provide
+
+# Shared by the job queue, draft buffer and price warmer. A relative path is
+# taken relative to the backend directory, not the process working directory.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOBS_DB_PATH = os.path.join(BACKEND_DIR, os.getenv("JOBS_DB_PATH", "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# A running job whose lease is not renewed within this many seconds is
+# considered abandoned (worker process died) and is picked up again. A
+# heartbeat renews the lease every third of this while the job runs.
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Abandoned jobs are retried until they have been started this many times
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+
+Handler = Callable[[Dict[str, Any], Callable[..., None]], Any]
+
+# Job kinds registered at import by the modules that own them; kept outside
+# the queue so a queue rebuilt by the container still knows every kind
+JOB_HANDLERS: Dict[str, Handler] = {}
+
+
+class JobQueue:
+    """
+    SQLite-backed queue for long-running AI work.
+
+    Jobs survive restarts and are shared by every uvicorn worker pointing at
+    the same database file; claiming a job happens inside an IMMEDIATE
+    transaction so two workers never run the same job. The database is
+    created on first use, not on construction.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, workers: int = JOB_WORKERS,
+                 handlers: Optional[Dict[str, Handler]] = None):
+        self.db_path = db_path
+        self.workers = workers
+        self.handlers = JOB_HANDLERS if handlers is None else handlers
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            if not self._ready:
+                with self._init_lock:
+                    if not self._ready:
+                        self._init_db(conn)
+                        self._ready = True
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                message TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_until REAL,
+                owner_id TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        # Databases created before jobs had owners
+        cols = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+        if "owner_id" not in cols:
+            conn.execute("ALTER TABLE jobs ADD COLUMN owner_id TEXT")
+
+    def register(self, kind: str, handler: Handler):
+        """Register `handler(payload, progress)` to run jobs of the given kind."""
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], owner_id: Optional[str] = None) -> str:
+        """Queue a job; `owner_id` is the user allowed to read it besides teachers."""
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+
+        job_id = str(uuid.uuid4())
+        now = datetime.utcnow().isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, payload, status, owner_id, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, default=str),
+                 str(owner_id) if owner_id else None, now, now),
+            )
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row["job_id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": row["progress"],
+            "message": row["message"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "owner_id": row["owner_id"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def _claim(self):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Give up on jobs that keep taking their worker down with them
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', lease_until = NULL, updated_at = ?, "
+                "error = 'Abandoned after ' || attempts || ' attempts' "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (datetime.utcnow().isoformat(), now, JOB_MAX_ATTEMPTS),
+            )
+            row = conn.execute(
+                "SELECT job_id, kind, payload FROM jobs "
+                "WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                    "lease_until = ?, updated_at = ? WHERE job_id = ?",
+                    (now + JOB_LEASE_SECONDS, datetime.utcnow().isoformat(), row["job_id"]),
+                )
+            conn.execute("COMMIT")
+            return row
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {cols} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def _run(self, row):
+        job_id = row["job_id"]
+
+        def progress(pct: int, message: Optional[str] = None):
+            self._update(job_id, progress=max(0, min(100, int(pct))), message=message)
+
+        # Keep the lease alive while the handler runs, however long a single
+        # step (e.g. one Gemini call) takes, so no other worker re-runs it
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(JOB_LEASE_SECONDS / 3):
+                try:
+                    with self._connect() as conn:
+                        conn.execute(
+                            "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND status = 'running'",
+                            (time.time() + JOB_LEASE_SECONDS, job_id),
+                        )
+                except Exception as e:
+                    print("⚠️ Job lease renewal failed:", job_id, e)
+
+        beat = threading.Thread(target=heartbeat, name=f"job-heartbeat-{job_id[:8]}", daemon=True)
+        beat.start()
+
+        handler = self.handlers.get(row["kind"])
+        try:
+            if not handler:
+                raise ValueError(f"No handler registered for job kind: {row['kind']}")
+            result = handler(json.loads(row["payload"]), progress)
+            self._update(
+                job_id, status="succeeded", progress=100, message="done",
+                result=json.dumps(result, default=str), lease_until=None,
+            )
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status="failed", error=str(e), lease_until=None)
+        finally:
+            done.set()
+            beat.join()
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                row = self._claim()
+            except Exception as e:
+                print("⚠️ Job queue claim failed:", e)
+                row = None
+
+            if row:
+                self._run(row)
+                continue
+
+            self._wake.wait(JOB_POLL_SECONDS)
+            self._wake.clear()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(max(1, self.workers)):
+            t = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+
+# Built by the container on first use (see services/container.py)
+job_queue = provide("job_queue")
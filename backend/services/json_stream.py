@@ -0,0 +1,85 @@
+import json
+from typing import Any, List
+
+
+class IncompleteJsonArray(ValueError):
+    """The stream ended before the array's closing ']' (e.g. a truncated response)."""
+
+
+class JsonArrayStream:
+    """
+    Incremental parser for a JSON array of objects arriving in pieces (e.g. a
+    streamed LLM response). `feed(chunk)` returns every top-level object that
+    became complete with that chunk, so callers can act on the first rows
+    while the rest are still being generated.
+
+    Anything before the opening '[' (markdown fences, prose) is skipped, and
+    objects that fail to parse are dropped rather than stopping the stream.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0           # next character of _buf to scan
+        self._started = False   # seen the opening '['
+        self._done = False      # seen the closing ']'
+        self._depth = 0         # nesting depth inside the current element
+        self._obj_start = -1
+        self._in_string = False
+        self._escape = False
+        self.errors = 0
+
+    def feed(self, chunk: str) -> List[Any]:
+        if self._done or not chunk:
+            return []
+        self._buf += chunk
+        out = []
+
+        buf, i = self._buf, self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0 and ch == "]":
+                    self._done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    text = buf[self._obj_start:i + 1]
+                    try:
+                        out.append(json.loads(text))
+                    except json.JSONDecodeError:
+                        self.errors += 1
+                    self._obj_start = -1
+            i += 1
+
+        # Drop what has been consumed, keeping any partial element
+        keep = self._obj_start if self._obj_start >= 0 else i
+        self._buf = buf[keep:]
+        self._pos = i - keep
+        if self._obj_start >= 0:
+            self._obj_start = 0
+        return out
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
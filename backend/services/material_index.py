@@ -0,0 +1,316 @@
+import os, re, time, heapq, threading
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
+
+# Resolved matches below this confidence are ignored (the caller asks Gemini)
+MATERIAL_MATCH_THRESHOLD = float(os.getenv("MATERIAL_MATCH_THRESHOLD", "0.72"))
+# How often the catalog is reloaded from materials_prices
+MATERIAL_INDEX_REFRESH_SECONDS = int(os.getenv("MATERIAL_INDEX_REFRESH_SECONDS", "600"))
+# Candidate names (by shared trigrams) scored in full per query, with all their sizes and units
+MATERIAL_INDEX_CANDIDATES = int(os.getenv("MATERIAL_INDEX_CANDIDATES", "40"))
+
+UNIT_MAP = {
+    "sheets": "sheet",
+    "sheet(s)": "sheet",
+    "bags": "bag",
+    "bag(s)": "bag",
+    "kgs": "kg",
+    "kg(s)": "kg",
+    "pcs.": "pcs",
+    "pieces": "pcs",
+    "piece": "pcs",
+    "meters": "m",
+    "metre": "m",
+    "metres": "m",
+    "sqm": "m²",
+    "sq.m": "m²",
+    "sq m": "m²",
+    "sq. m": "m²",
+    "cubic meter": "m³",
+    "cubic meters": "m³",
+    "bd ft": "board ft",
+    "board feet": "board ft",
+    "tubes": "tube",
+}
+
+# Phrases folded to one token before tokenizing (longest first)
+SYNONYMS = [
+    ("concrete hollow blocks", "chb"),
+    ("concrete hollow block", "chb"),
+    ("hollow blocks", "chb"),
+    ("hollow block", "chb"),
+    ("reinforcing steel bars", "rebar"),
+    ("reinforcing steel bar", "rebar"),
+    ("reinforcing bars", "rebar"),
+    ("reinforcing bar", "rebar"),
+    ("deformed bars", "rebar"),
+    ("deformed bar", "rebar"),
+    ("portland cement", "cement"),
+    ("galvanized iron", "gi"),
+    ("g.i.", "gi"),
+    ("pre-painted", "prepainted"),
+    ("pre painted", "prepainted"),
+    ("c-purlins", "cpurlin"),
+    ("c-purlin", "cpurlin"),
+    ("c purlin", "cpurlin"),
+    ("tie wire", "tiewire"),
+    ("tek screws", "tekscrew"),
+    ("tek screw", "tekscrew"),
+]
+
+# Filler words that say nothing about which material it is
+STOPWORDS = {"of", "and", "for", "with", "the", "a", "an", "per", "type", "grade", "pc", "pcs", "x",
+             "deformed", "reinforcing"}
+
+_SIZE_PATTERNS = [
+    # 2-1/2", 1/2 in, 6", 6 inch, 6in, 6″  -> 6in
+    (re.compile(r"(\d+(?:[-\s]\d+/\d+|\.\d+|/\d+)?)\s*(?:\"|''|″|inches|inch|in\b)"),
+     lambda m: m.group(1).replace(" ", "-") + "in"),
+    # 150mm / 0.4 mm -> 150mm; block-sized mm values also get their inch form
+    (re.compile(r"(\d+(?:\.\d+)?)\s*mm\b"), lambda m: _mm(m.group(1))),
+    # 8 ft / 8' -> 8ft
+    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:ft|feet|foot|')(?![a-z])"), lambda m: m.group(1) + "ft"),
+    # 40 kg -> 40kg (bag weights)
+    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:kgs?|kilos?)\b"), lambda m: m.group(1) + "kg"),
+    # 6 m -> 6m (lengths such as rebar 6m)
+    (re.compile(r"(\d+(?:\.\d+)?)\s*(?:m|meters?|metres?)\b"), lambda m: m.group(1) + "m"),
+    # 2 x 4 -> 2x4
+    (re.compile(r"(\d+(?:\.\d+)?)\s*[x×]\s*(?=\d)"), lambda m: m.group(1) + "x"),
+]
+_SIZE_TOKEN = re.compile(r"^(\d[\d./-]*(in|mm|ft|m|kg)?|\d+(\.\d+)?x[\dx.]+)$")
+_BARE_FRACTION = re.compile(r"^\d+(-\d+)?/\d+$")
+
+
+def _mm(value: str) -> str:
+    mm = float(value)
+    token = f"{value}mm"
+    # 100/150/200mm blocks are sold as 4"/6"/8"
+    if mm >= 75 and mm % 25 == 0:
+        token += f" {round(mm / 25.4)}in"
+    return token
+
+
+def canonical_unit(unit: Optional[str]) -> str:
+    u = (unit or "").strip().lower()
+    return UNIT_MAP.get(u, u)
+
+
+def canonicalize(text: str) -> Tuple[List[str], Set[str]]:
+    """
+    Split a material description into (name tokens, size tokens), folding
+    synonyms, plurals and the many ways sizes are written:
+
+        'Concrete Hollow Blocks 6" (150mm)' -> (['chb'], {'6in', '150mm'})
+    """
+    s = (text or "").lower()
+    for phrase, token in SYNONYMS:
+        s = s.replace(phrase, f" {token} ")
+    for pattern, repl in _SIZE_PATTERNS:
+        s = pattern.sub(repl, s)
+
+    words = re.findall(r"[a-z0-9][a-z0-9./-]*", s)
+    names, sizes = [], set()
+    for w in words:
+        w = w.strip("./-")
+        if not w or w in STOPWORDS:
+            continue
+        if _SIZE_TOKEN.match(w):
+            # Fractions without a unit are inches in PH hardware listings
+            sizes.add(w + "in" if _BARE_FRACTION.match(w) else w)
+            continue
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        names.append(w)
+    return names, sizes
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Entry:
+    __slots__ = ("material", "unit", "size", "names", "sizes", "grams")
+
+    def __init__(self, material: str, unit: str, size: str):
+        self.material = material
+        self.unit = unit
+        self.size = size
+        names, sizes = canonicalize(material)
+        if size and size != "N/A":
+            sizes |= canonicalize(size)[1] or {size.lower()}
+        self.names = set(names)
+        self.sizes = sizes
+        self.grams = _trigrams(" ".join(sorted(self.names)))
+
+
+def _name_similarity(qnames: Set[str], qgrams: Set[str], e: _Entry) -> float:
+    """Token Jaccard + trigram Dice of the canonical names."""
+    if not qnames or not e.names:
+        return 0.0
+    tokens = len(qnames & e.names) / len(qnames | e.names)
+    grams = 2 * len(qgrams & e.grams) / (len(qgrams) + len(e.grams))
+    return 0.5 * tokens + 0.5 * grams
+
+
+def _size_factor(qsizes: Set[str], sizes: Set[str]) -> float:
+    """1 when the query confirms every size of the entry, down to 0.5 when it confirms none."""
+    if qsizes and sizes:
+        return 0.5 + 0.5 * len(qsizes & sizes) / len(sizes)
+    return 0.85 if qsizes or sizes else 1.0
+
+
+def _name_score(qnames: Set[str], qgrams: Set[str], qsizes: Set[str], e: _Entry) -> float:
+    """_name_similarity discounted for size mismatches."""
+    return _name_similarity(qnames, qgrams, e) * _size_factor(qsizes, e.sizes)
+
+
+def similarity_matrix(rows: List[str], cols: List[str]) -> List[List[float]]:
+    """
+    How alike each (row, col) pair of material descriptions is, in [0, 1],
+    scored like index matches; each description is canonicalized once.
+    """
+    er = [_Entry(r or "", "", "N/A") for r in rows]
+    ec = [_Entry(c or "", "", "N/A") for c in cols]
+    return [[_name_score(a.names, a.grams, a.sizes, b) for b in ec] for a in er]
+
+
+class _Catalog:
+    """Entries plus a trigram index over their distinct canonical names."""
+
+    __slots__ = ("entries", "names", "postings")
+
+    def __init__(self):
+        self.entries: Dict[Tuple[str, str, str], _Entry] = {}
+        self.names: Dict[str, List[_Entry]] = {}
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+
+    def insert(self, material: Optional[str], unit: Optional[str], size: Optional[str]):
+        if not material:
+            return
+        key = (material.strip().lower(), canonical_unit(unit), (size or "N/A").strip().lower())
+        if key in self.entries:
+            return
+        entry = _Entry(material.strip(), unit or "", size or "N/A")
+        self.entries[key] = entry
+        name = " ".join(sorted(entry.names))
+        group = self.names.get(name)
+        if group is None:
+            group = self.names[name] = []
+            for g in entry.grams:
+                self.postings[g].add(name)
+        group.append(entry)
+
+
+class MaterialIndex:
+    """
+    In-memory token + trigram index over the materials_prices catalog, for
+    resolving free-text BoQ descriptions ("CHB 6\" (150mm)") to the material
+    strings prices are stored under ("Concrete Hollow Blocks 6in").
+
+    Scoring blends token overlap and trigram similarity of the canonical
+    names, then discounts mismatched sizes and units. The catalog is loaded
+    through `loader()` on a background thread, first on use and then every
+    MATERIAL_INDEX_REFRESH_SECONDS, and swapped in whole once built; lookups
+    never wait for it and see the previous catalog meanwhile.
+    """
+
+    def __init__(self, loader=None, refresh_seconds: int = MATERIAL_INDEX_REFRESH_SECONDS):
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._catalog = _Catalog()
+        self._loaded_at = 0.0
+        self._reloading = False
+
+    def __len__(self):
+        return len(self._catalog.entries)
+
+    def add(self, material: str, unit: str, size: Optional[str] = None):
+        with self._lock:
+            self._catalog.insert(material, unit, size)
+
+    def rebuild(self, rows: List[dict]):
+        """Replace the catalog with `rows` ({material, unit, size} dicts)."""
+        catalog = _Catalog()
+        for r in rows:
+            catalog.insert(r.get("material"), r.get("unit"), r.get("size"))
+        with self._lock:
+            self._catalog = catalog
+        self._loaded_at = time.time()
+
+    def _ensure_fresh(self):
+        if self.loader is None or time.time() - self._loaded_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name="material-index-reload", daemon=True).start()
+
+    def _reload(self):
+        try:
+            self.rebuild(self.loader())
+        except Exception as e:
+            print("⚠️ Material index reload failed:", e)
+            self._loaded_at = time.time()  # retry next period
+        finally:
+            self._reloading = False
+
+    def match(self, description: str, unit: Optional[str] = None, size: Optional[str] = None,
+              threshold: float = MATERIAL_MATCH_THRESHOLD) -> Optional[Dict[str, object]]:
+        """
+        Best catalog entry for `description`, as {material, unit, size, score},
+        or None when nothing scores at least `threshold`.
+        """
+        best = self.search(description, unit, size, limit=1)
+        if best and best[0]["score"] >= threshold:
+            return best[0]
+        return None
+
+    def search(self, description: str, unit: Optional[str] = None, size: Optional[str] = None,
+               limit: int = 5) -> List[Dict[str, object]]:
+        self._ensure_fresh()
+
+        names, sizes = canonicalize(description)
+        if size and size != "N/A":
+            sizes |= canonicalize(size)[1] or {size.lower()}
+        qnames = set(names)
+        if not qnames:
+            return []
+        qgrams = _trigrams(" ".join(sorted(qnames)))
+        qunit = canonical_unit(unit) if unit else None
+
+        with self._lock:
+            catalog = self._catalog
+            shared = Counter(chain.from_iterable(catalog.postings.get(g, ()) for g in qgrams))
+            groups = [list(catalog.names[name])
+                      for name, _n in shared.most_common(MATERIAL_INDEX_CANDIDATES)]
+
+        # Entries sharing a canonical name differ only in size and unit, which
+        # can only lower the name's score: visit names best first and stop
+        # once none can beat the `limit` best entries found so far
+        ranked = sorted(((_name_similarity(qnames, qgrams, group[0]), n, group)
+                         for n, group in enumerate(groups)), key=lambda x: (-x[0], x[1]))
+        best: List[Tuple[float, int, _Entry]] = []
+        seq = 0
+        for name_score, _n, group in ranked:
+            if len(best) >= limit and name_score <= best[0][0]:
+                break
+            for e in group:
+                score = name_score * _size_factor(sizes, e.sizes)
+                if qunit and canonical_unit(e.unit) != qunit:
+                    score *= 0.7
+                seq -= 1  # earlier entries win ties
+                if len(best) < limit:
+                    heapq.heappush(best, (score, seq, e))
+                elif (score, seq) > best[0][:2]:
+                    heapq.heapreplace(best, (score, seq, e))
+
+        return [{"material": e.material, "unit": e.unit, "size": e.size, "score": round(score, 4)}
+                for score, _seq, e in sorted(best, reverse=True, key=lambda x: x[:2])]
+
+    def stats(self) -> Dict[str, object]:
+        return {"entries": len(self._catalog.entries), "names": len(self._catalog.names),
+                "loaded_at": self._loaded_at}
@@ -0,0 +1,140 @@
+import os, json, time, sqlite3, hashlib
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from services.http_client import http_client, HTTP_CONNECT_TIMEOUT
+
+PLAN_CACHE_DB_PATH = os.getenv("PLAN_CACHE_DB_PATH", "plan_cache.db")
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "500"))
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+PLAN_DOWNLOAD_TIMEOUT = float(os.getenv("PLAN_DOWNLOAD_TIMEOUT", "30"))
+
+
+class PlanAnalysisCache:
+    """
+    Content-addressed cache of plan analysis results (extracted elements and
+    the unpriced BoQ), so re-estimating an unchanged plan skips both Gemini calls.
+
+    Entries are keyed on a hash of the challenge id, the plan file bytes and
+    the challenge name, objectives and instructions, so each entry belongs to
+    one challenge and invalidate(challenge_id) finds all of them.
+    Least-recently-used entries are evicted past PLAN_CACHE_MAX_ENTRIES, and
+    entries expire after PLAN_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, db_path: str = PLAN_CACHE_DB_PATH,
+                 max_entries: int = PLAN_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = PLAN_CACHE_TTL_SECONDS):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS plan_analysis_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    challenge_id TEXT,
+                    confidence REAL,
+                    elements TEXT NOT NULL,
+                    estimates TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_plan_cache_challenge ON plan_analysis_cache(challenge_id)"
+            )
+
+    def key_for(self, challenge_id: str, plan_file_url: str, challenge_name: str,
+                challenge_objectives: str, challenge_instructions: str) -> str:
+        """
+        Hash of the challenge id, plan content and challenge text. Falls back
+        to hashing the URL when the file cannot be downloaded (uploaded plans
+        get unique names).
+        """
+        h = hashlib.sha256(str(challenge_id).encode("utf-8") + b"\x00")
+        try:
+            with http_client.get(plan_file_url, stream=True,
+                                 timeout=(HTTP_CONNECT_TIMEOUT, PLAN_DOWNLOAD_TIMEOUT)) as resp:
+                resp.raise_for_status()
+                for chunk in resp.iter_content(chunk_size=64 * 1024):
+                    h.update(chunk)
+        except Exception as e:
+            print("⚠️ Could not fetch plan for cache key, hashing URL instead:", e)
+            h = hashlib.sha256(str(challenge_id).encode("utf-8") + b"\x00")
+            h.update(plan_file_url.encode("utf-8"))
+
+        for part in (challenge_name, challenge_objectives, challenge_instructions):
+            h.update(b"\x00")
+            h.update((part or "").strip().encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM plan_analysis_cache WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if not row:
+                return None
+            if now - row["created_at"] > self.ttl_seconds:
+                conn.execute("DELETE FROM plan_analysis_cache WHERE cache_key = ?", (cache_key,))
+                return None
+            conn.execute(
+                "UPDATE plan_analysis_cache SET last_used_at = ? WHERE cache_key = ?",
+                (now, cache_key),
+            )
+        return {
+            "confidence": row["confidence"],
+            "elements": json.loads(row["elements"]),
+            "estimates": json.loads(row["estimates"]),
+        }
+
+    def put(self, cache_key: str, challenge_id: str, confidence: float,
+            elements: List[Dict], estimates: List[Dict]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO plan_analysis_cache "
+                "(cache_key, challenge_id, confidence, elements, estimates, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, str(challenge_id), confidence,
+                 json.dumps(elements, default=str), json.dumps(estimates, default=str), now, now),
+            )
+            # Evict expired entries, then least-recently-used beyond the size bound
+            conn.execute(
+                "DELETE FROM plan_analysis_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            conn.execute(
+                "DELETE FROM plan_analysis_cache WHERE cache_key IN ("
+                "SELECT cache_key FROM plan_analysis_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def invalidate(self, challenge_id: Optional[str] = None, cache_key: Optional[str] = None) -> int:
+        """Drop cached analyses for a challenge, a single key, or everything."""
+        with self._connect() as conn:
+            if cache_key:
+                cur = conn.execute("DELETE FROM plan_analysis_cache WHERE cache_key = ?", (cache_key,))
+            elif challenge_id:
+                cur = conn.execute(
+                    "DELETE FROM plan_analysis_cache WHERE challenge_id = ?", (str(challenge_id),)
+                )
+            else:
+                cur = conn.execute("DELETE FROM plan_analysis_cache")
+            return cur.rowcount
+
+
+plan_cache = PlanAnalysisCache()
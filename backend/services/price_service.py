@@ -1,10 +1,13 @@
-import json, re, uuid
+import os, json, re, uuid, copy, asyncio, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from statistics import median
-from typing import Dict, Any, List, Tuple
-from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
 
-from services.gemini_service import GeminiPriceSearch
+from services.gemini_service import GeminiPriceSearch, AsyncGeminiPriceSearch
 from services.supabase_service import SupabaseClient  
+from services.db_executor import run_blocking
+from services.material_index import MaterialIndex, canonical_unit
 
 
 def _to_number(price_str):
@@ -18,14 +21,198 @@ def _to_number(price_str):
         return 0.0
 
 
-class PriceService:
+# How long stored listings count as fresh, per material class (hours). First
+# matching keyword wins; PRICE_CACHE_TTLS (JSON) overrides or extends these.
+PRICE_CACHE_TTL_HOURS = {
+    "rebar": 72,
+    "steel": 72,
+    "cement": 168,
+    "sand": 168,
+    "gravel": 168,
+    "chb": 336,
+    "hollow block": 336,
+    "lumber": 168,
+    "plywood": 168,
+    "gi sheet": 168,
+    "purlin": 168,
+}
+PRICE_CACHE_TTL_HOURS.update(json.loads(os.getenv("PRICE_CACHE_TTLS", "{}")))
+PRICE_CACHE_DEFAULT_TTL_HOURS = float(os.getenv("PRICE_CACHE_DEFAULT_TTL_HOURS", "72"))
+# Fewer fresh listings than this is treated as a miss
+PRICE_CACHE_MIN_LISTINGS = int(os.getenv("PRICE_CACHE_MIN_LISTINGS", "3"))
+
+# Batch pricing: materials per Gemini prompt, listings asked for per material
+# (fewer than the single-material prompt to keep responses a sane size), and
+# how many batch prompts may be in flight at once.
+PRICE_BATCH_SIZE = int(os.getenv("PRICE_BATCH_SIZE", "10"))
+PRICE_BATCH_LISTINGS = int(os.getenv("PRICE_BATCH_LISTINGS", "8"))
+PRICE_BATCH_CONCURRENCY = int(os.getenv("PRICE_BATCH_CONCURRENCY", "3"))
+
+PriceItem = Tuple[str, str, str]  # (material, unit, size)
+
+# Stats-only pricing asks Gemini for low/median/high and a few vendors
+# instead of full listings, which is all the estimation path needs. A range
+# is stored as three listings, enough for the default PRICE_CACHE_MIN_LISTINGS.
+PRICE_STATS_VENDORS = int(os.getenv("PRICE_STATS_VENDORS", "3"))
+
+
+def cache_ttl_hours(material: str) -> float:
+    name = (material or "").lower()
+    for keyword, hours in PRICE_CACHE_TTL_HOURS.items():
+        if keyword in name:
+            return float(hours)
+    return PRICE_CACHE_DEFAULT_TTL_HOURS
+
+
+def _norm(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first caller
+    runs the function, everyone arriving while it is in flight waits for and
+    shares its result (or exception).
+    """
+
     def __init__(self):
-        self.gemini = GeminiPriceSearch()
-        self.sb = SupabaseClient()
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, _Call] = {}
+        self._async_calls: Dict[Any, "asyncio.Future"] = {}
+        self.lookups = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        call, leader = self.begin(key)
+        if not leader:
+            return self.wait(call)
+
+        try:
+            result = fn()
+        except Exception as e:
+            self.end(key, call, error=e)
+            raise
+        self.end(key, call, result)
+        return result
+
+    def begin(self, key) -> Tuple[_Call, bool]:
+        """
+        Join the call in flight for `key`, or start one: (call, is_leader).
+        For work done in batches; a leader must end() its call, every other
+        caller wait()s on it.
+        """
+        with self._lock:
+            self.lookups += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+        return call, leader
+
+    def end(self, key, call: _Call, result=None, error: Optional[Exception] = None):
+        call.result, call.error = result, error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+    @staticmethod
+    def wait(call: _Call):
+        call.done.wait()
+        if call.error:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    async def ado(self, key, fn):
+        """Coroutine version of `do`: `fn` returns an awaitable."""
+        with self._lock:
+            self.lookups += 1
+            fut = self._async_calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = asyncio.get_running_loop().create_future()
+                self._async_calls[key] = fut
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return copy.deepcopy(await asyncio.shield(fut))
+
+        try:
+            result = await fn()
+            fut.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when no one else was waiting
+            raise
+        finally:
+            with self._lock:
+                self._async_calls.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "upstream_calls": self.upstream_calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls) + len(self._async_calls),
+            }
+
+
+# Shared by every PriceService instance so coalescing works across requests
+_inflight = SingleFlight()
+_cache_lock = threading.Lock()
+_cache_stats = {"cache_hits": 0, "cache_misses": 0, "fuzzy_matches": 0,
+                "stats_calls": 0, "batch_calls": 0, "batch_fallbacks": 0}
+
+
+def _flight_key(material: str, unit: str, size: str, site_hint: str, stats_only: bool):
+    return (_norm(material), _norm(unit), _norm(size), _norm(site_hint), stats_only)
+
+
+def _count(name: str, n: int = 1):
+    with _cache_lock:
+        _cache_stats[name] += n
+
+
+class PriceService:
+    def __init__(self, gemini=None, agemini=None, sb=None, index=None):
+        self.gemini = gemini or GeminiPriceSearch()
+        self.agemini = agemini or AsyncGeminiPriceSearch()
+        self.sb = sb or SupabaseClient()
+        self.index = index or MaterialIndex(loader=self._load_catalog)
+
+    def _load_catalog(self) -> List[Dict[str, Any]]:
+        longest = max([PRICE_CACHE_DEFAULT_TTL_HOURS, *map(float, PRICE_CACHE_TTL_HOURS.values())])
+        return self.sb.get_material_catalog((datetime.utcnow() - timedelta(hours=longest)).isoformat())
 
     def fetch_listings(self, material: str, unit: str, size: str, site_hint: str = "Cebu, Philippines") -> List[Dict[str, Any]]:
+        raw = self.gemini._call_gemini(self._listings_prompt(material, unit, size, site_hint), cache=True)
+        return self._parse_listings(raw)
 
-        prompt = (
+    async def afetch_listings(self, material: str, unit: str, size: str, site_hint: str = "Cebu, Philippines") -> List[Dict[str, Any]]:
+        raw = await self.agemini._call_gemini(self._listings_prompt(material, unit, size, site_hint), cache=True)
+        return self._parse_listings(raw)
+
+    def _listings_prompt(self, material: str, unit: str, size: str, site_hint: str) -> str:
+        return (
     f"You are a cost estimation assistant trained on Philippine construction materials.\n"
     f"Generate 15–20 realistic listings for:\n"
     f"- Material: {material}\n"
@@ -59,9 +246,7 @@ class PriceService:
     f"]\n"
 )
 
-
-        raw = self.gemini._call_gemini(prompt)
-
+    def _parse_listings(self, raw: str) -> List[Dict[str, Any]]:
         match = re.search(r"\[.*\]", raw, re.DOTALL)
         clean = match.group(0) if match else raw.strip()
 
@@ -74,13 +259,181 @@ class PriceService:
         except Exception:
             return []
 
+    def _stats_prompt(self, material: str, unit: str, size: str, site_hint: str) -> str:
+        return (
+    f"You are a cost estimation assistant trained on Philippine construction materials.\n"
+    f"Give the current retail price range for:\n"
+    f"- Material: {material}\n"
+    f"- Size: {size or 'N/A'}\n"
+    f"- Unit: {unit}\n"
+    f"- Location focus: {site_hint}\n\n"
+    + self._stats_rules() +
+    f"Return ONLY a raw JSON object, no markdown:\n"
+    f"{{\"low\": \"₱250\", \"median\": \"₱300\", \"high\": \"₱380\", \"vendors\": [\"Wilcon Depot\", \"CitiHardware\"]}}\n"
+)
+
+    def _stats_rules(self) -> str:
+        return (
+    f"Rules:\n"
+    f"1. low, median and high are per-unit prices across realistic listings from {PRICE_STATS_VENDORS} or more vendors based in Cebu, PH.\n"
+    f"2. ALL prices must be in REALISTIC PH Peso values with a peso sign, like: ₱120, ₱350, ₱1,250\n"
+    f"3. vendors: up to {PRICE_STATS_VENDORS} real vendor names (e.g. Wilcon, CitiHardware, Citi Builders).\n\n"
+)
+
+    def _parse_stats(self, data) -> Optional[Dict[str, Any]]:
+        """Normalize one {low, median, high, vendors} object; None when it has no usable price."""
+        if not isinstance(data, dict):
+            return None
+        low, mid, high = (_to_number(data.get(k)) for k in ("low", "median", "high"))
+        if not mid and low and high:
+            mid = (low + high) / 2
+        if not mid:
+            return None
+        vendors = data.get("vendors") if isinstance(data.get("vendors"), list) else []
+        return {
+            "low": low or mid,
+            "median": mid,
+            "high": high or mid,
+            "vendors": [str(v) for v in vendors if v][:PRICE_STATS_VENDORS],
+        }
+
+    def _stats_listings(self, item: PriceItem, stats: Dict[str, Any], site_hint: str) -> List[Dict[str, Any]]:
+        """
+        A price range stored as three listings (low, median, high), so the
+        next lookup finds it in materials_prices and prices it at the median.
+        """
+        material, unit, size = item
+        vendors = stats["vendors"] or [None]
+        return [
+            {
+                "material": material,
+                "brand": None,
+                "size": size or "N/A",
+                "unit": unit,
+                "price": f"₱{price:,.2f}".replace(".00", ""),
+                "vendor": vendors[n % len(vendors)],
+                "location": site_hint,
+            }
+            for n, price in enumerate((stats["low"], stats["median"], stats["high"]))
+        ]
+
+    def _json_object(self, raw: str) -> Dict[str, Any]:
+        match = re.search(r"\{.*\}", raw or "", re.DOTALL)
+        try:
+            data = json.loads(match.group(0)) if match else {}
+        except Exception:
+            data = {}
+        return data if isinstance(data, dict) else {}
+
+    def fetch_price_stats(self, material: str, unit: str, size: str, site_hint: str = "Cebu, Philippines") -> Optional[Dict[str, Any]]:
+        raw = self.gemini._call_gemini(self._stats_prompt(material, unit, size, site_hint), cache=True)
+        return self._parse_stats(self._json_object(raw))
+
+    async def afetch_price_stats(self, material: str, unit: str, size: str, site_hint: str = "Cebu, Philippines") -> Optional[Dict[str, Any]]:
+        raw = await self.agemini._call_gemini(self._stats_prompt(material, unit, size, site_hint), cache=True)
+        return self._parse_stats(self._json_object(raw))
+
+    def _batch_lines(self, items: List[PriceItem]) -> str:
+        return "\n".join(
+            f'{i}. material: "{m}" | unit: "{u}" | size: "{s or "N/A"}"'
+            for i, (m, u, s) in enumerate(items, 1)
+        )
+
+    def _stats_batch_prompt(self, items: List[PriceItem], site_hint: str) -> str:
+        return (
+    f"You are a cost estimation assistant trained on Philippine construction materials.\n"
+    f"Give the current retail price range for EACH of these materials:\n"
+    f"{self._batch_lines(items)}\n"
+    f"- Location focus: {site_hint}\n\n"
+    + self._stats_rules() +
+    f"Return ONLY a raw JSON object mapping each material's number (as a string) to its price range, no markdown:\n"
+    f"{{\"1\": {{\"low\": \"₱250\", \"median\": \"₱300\", \"high\": \"₱380\", \"vendors\": [\"Wilcon Depot\"]}}, \"2\": {{...}}}}\n"
+)
+
+    def fetch_price_stats_batch(self, items: List[PriceItem], site_hint: str = "Cebu, Philippines") -> List[Optional[Dict[str, Any]]]:
+        """Price ranges per item, aligned with `items`; None where the response has none."""
+        _count("batch_calls")
+        data = self._json_object(self.gemini._call_gemini(self._stats_batch_prompt(items, site_hint), cache=True))
+        return [self._parse_stats(data.get(str(i))) for i in range(1, len(items) + 1)]
+
+    def _batch_prompt(self, items: List[PriceItem], site_hint: str) -> str:
+        lines = self._batch_lines(items)
+        return (
+    f"You are a cost estimation assistant trained on Philippine construction materials.\n"
+    f"Generate {PRICE_BATCH_LISTINGS} realistic listings for EACH of these materials:\n"
+    f"{lines}\n"
+    f"- Location focus: {site_hint}\n\n"
+
+    f"Rules:\n"
+    f"1. Use the material name, unit and size exactly as given for every listing of that material. If size is 'N/A', keep 'N/A'.\n"
+    f"2. Do NOT invent your own sizes. Never put brand names or generic labels under size.\n"
+    f"3. Vendor must NOT be empty (Provide Vendor like: Wilcon, CitiHardware, Lazada, Shopee, Citi Builders). These are just examples provide realistic vendors based in Cebu, PH.\n"
+    f"4. All items must be realistic and updated Cebu, Philippines-market accurate.\n"
+    f"5. ALL prices must be in REALISTIC PH Peso values.\n"
+    f"6. Price must NEVER be a decimal like 5.5, 4.95, 6.0 — THESE ARE INVALID. Price must always include a peso sign. Use only formats like: ₱120, ₱350, ₱1,250\n"
+    f"7. Provide different price ranges.\n\n"
+
+    f"Return ONLY a raw JSON object mapping each material's number (as a string) to its array of listings, "
+    f"each listing with fields [\"material\", \"brand\", \"size\", \"unit\", \"price\", \"vendor\", \"location\"]:\n"
+    f"{{\n"
+    f"  \"1\": [{{\"material\": \"...\", \"brand\": \"BrandName\", \"size\": \"...\", \"unit\": \"...\", "
+    f"\"price\": \"₱300\", \"vendor\": \"Wilcon Depot\", \"location\": \"Cebu City\"}}],\n"
+    f"  \"2\": [...]\n"
+    f"}}\n"
+)
+
+    def _parse_batch(self, raw: str, items: List[PriceItem]) -> List[Optional[List[Dict[str, Any]]]]:
+        """Listings per item, aligned with `items`; None where the response has none."""
+        data = self._json_object(raw)
+
+        out = []
+        for i, (material, unit, size) in enumerate(items, 1):
+            listings = data.get(str(i))
+            if not isinstance(listings, list) or not listings:
+                out.append(None)
+                continue
+            clean = []
+            for listing in listings:
+                if not isinstance(listing, dict):
+                    continue
+                # Keep the requested identity so later cache reads find these rows
+                listing["material"] = material
+                listing["unit"] = unit
+                listing["size"] = size if size and size != "N/A" else (listing.get("size") or "N/A")
+                clean.append(listing)
+            out.append(clean or None)
+        return out
+
+    def fetch_listings_batch(self, items: List[PriceItem], site_hint: str = "Cebu, Philippines",
+                             cache: bool = True) -> List[Optional[List[Dict[str, Any]]]]:
+        """Listings for several items in one prompt; `cache=False` always asks Gemini afresh."""
+        _count("batch_calls")
+        raw = self.gemini._call_gemini(self._batch_prompt(items, site_hint), cache=cache)
+        return self._parse_batch(raw, items)
+
+    async def afetch_listings_batch(self, items: List[PriceItem], site_hint: str = "Cebu, Philippines",
+                                    cache: bool = True) -> List[Optional[List[Dict[str, Any]]]]:
+        _count("batch_calls")
+        raw = await self.agemini._call_gemini(self._batch_prompt(items, site_hint), cache=cache)
+        return self._parse_batch(raw, items)
+
     def persist_listings(self, listings: List[Dict[str, Any]]) -> None:
+        self._index_listings(listings)
+        try:
+            self.sb.save_material_prices(listings)
+            return
+        except Exception as e:
+            print("⚠️ Bulk listing insert failed, saving one by one:", e)
         for item in listings:
             try:
                 self.sb.save_material_price(item)
             except Exception:
                 pass
 
+    def _index_listings(self, listings: List[Dict[str, Any]]) -> None:
+        for item in listings:
+            self.index.add(item.get("material"), item.get("unit"), item.get("size"))
+
     def pick_unit_price(self, listings: List[Dict[str, Any]]) -> float:
         prices = [_to_number(x.get("price")) for x in listings if x.get("price")]
         return median(prices) if prices else 0.0
@@ -92,10 +445,294 @@ class PriceService:
         size: str,
         site_hint: str = "Cebu, Philippines",
         challenge_id=None,
+        stats_only: bool = False,
     ) -> Tuple[float, List[Dict[str, Any]]]:
+        """
+        Median unit price and the listings behind it. With `stats_only`, a
+        cache miss asks Gemini for a compact low/median/high range instead of
+        full listings; the range is stored as three listings (see
+        _stats_listings) so later lookups are cache hits.
+        """
+        key = _flight_key(material, unit, size, site_hint, stats_only)
+        return _inflight.do(key, lambda: self._lookup(material, unit, size, site_hint, stats_only))
+
+    async def aget_unit_price(
+        self,
+        material: str,
+        unit: str,
+        size: str,
+        site_hint: str = "Cebu, Philippines",
+        challenge_id=None,
+        stats_only: bool = False,
+    ) -> Tuple[float, List[Dict[str, Any]]]:
+        """get_unit_price for async routes; nothing here blocks the event loop."""
+        key = _flight_key(material, unit, size, site_hint, stats_only)
+        return await _inflight.ado(key, lambda: self._alookup(material, unit, size, site_hint, stats_only))
+
+    def cached_listings(self, material: str, unit: str, size: str) -> List[Dict[str, Any]]:
+        """
+        Fresh listings already stored in materials_prices, shaped like Gemini's.
+        When the name has too few exact matches, the material index resolves it
+        to the closest stored material ("CHB 6\" (150mm)" -> "Concrete Hollow
+        Blocks 6in") and that material's listings are used instead.
+        """
+        return self.cached_listings_many([(material, unit, size)])[0]
+
+    def cached_listings_many(self, items: List[PriceItem]) -> List[List[Dict[str, Any]]]:
+        """cached_listings for many items, aligned with `items`, in at most two queries."""
+        out = self._stored_listings_many(items)
+
+        resolved = {}
+        for i, (material, unit, size) in enumerate(items):
+            if len(out[i]) >= PRICE_CACHE_MIN_LISTINGS:
+                continue
+            match = self.index.match(material, unit, size)
+            if not match or (match["material"].lower() == material.strip().lower()
+                             and canonical_unit(match["unit"]) == canonical_unit(unit)):
+                continue
+            resolved[i] = (match["material"], match["unit"], match["size"])
+
+        if resolved:
+            for i, matched in zip(resolved, self._stored_listings_many(list(resolved.values()))):
+                if len(matched) >= len(out[i]):
+                    _count("fuzzy_matches")
+                    out[i] = matched
+        return out
+
+    def _stored_listings_many(self, items: List[PriceItem]) -> List[List[Dict[str, Any]]]:
+        now = datetime.utcnow()
+        since = [(now - timedelta(hours=cache_ttl_hours(material))).isoformat() for material, _u, _s in items]
+        try:
+            rows = self.sb.get_recent_material_prices_many(items, min(since)) if items else []
+        except Exception as e:
+            print("⚠️ Price cache lookup failed:", e)
+            return [[] for _ in items]
+
+        out = []
+        for (material, unit, size), fresh_since in zip(items, since):
+            listings = []
+            for r in rows:
+                if ((r.get("material") or "").lower() != material.strip().lower() or r.get("unit") != unit
+                        or (size and size != "N/A" and r.get("size") != size)
+                        or (r.get("created_at") or "") < fresh_since):
+                    continue
+                price = _to_number(r.get("price"))
+                if not price:
+                    continue
+                listings.append({
+                    "material": r.get("material"),
+                    "brand": r.get("brand"),
+                    "size": r.get("size") or size,
+                    "unit": r.get("unit"),
+                    "price": f"₱{price:,.2f}".replace(".00", ""),
+                    "vendor": r.get("vendor"),
+                    "location": r.get("location"),
+                })
+            out.append(listings)
+        return out
+
+    def _lookup(self, material: str, unit: str, size: str, site_hint: str,
+                stats_only: bool = False) -> Tuple[float, List[Dict[str, Any]]]:
+        listings = self.cached_listings(material, unit, size)
+        hit = len(listings) >= PRICE_CACHE_MIN_LISTINGS
+        _count("cache_hits" if hit else "cache_misses")
+        if hit:
+            return self.pick_unit_price(listings), listings
+        return self._fetch_uncached(material, unit, size, site_hint, stats_only)
+
+    def _fetch_uncached(self, material: str, unit: str, size: str, site_hint: str,
+                        stats_only: bool = False) -> Tuple[float, List[Dict[str, Any]]]:
+        """The Gemini half of _lookup: price one item afresh and store what was found."""
+        if stats_only:
+            _count("stats_calls")
+            stats = self.fetch_price_stats(material, unit, size, site_hint)
+            if not stats:
+                return 0.0, []
+            listings = self._stats_listings((material, unit, size), stats, site_hint)
+            self.persist_listings(listings)
+            return self.pick_unit_price(listings), listings
 
         listings = self.fetch_listings(material, unit, size, site_hint)
 
         self.persist_listings(listings)
 
         return self.pick_unit_price(listings), listings
+
+    async def _alookup(self, material: str, unit: str, size: str, site_hint: str,
+                       stats_only: bool = False) -> Tuple[float, List[Dict[str, Any]]]:
+        listings = await run_blocking(self.cached_listings, material, unit, size)
+        hit = len(listings) >= PRICE_CACHE_MIN_LISTINGS
+        _count("cache_hits" if hit else "cache_misses")
+        if hit:
+            return self.pick_unit_price(listings), listings
+
+        if stats_only:
+            _count("stats_calls")
+            stats = await self.afetch_price_stats(material, unit, size, site_hint)
+            if not stats:
+                return 0.0, []
+            listings = self._stats_listings((material, unit, size), stats, site_hint)
+            await run_blocking(self.persist_listings, listings)
+            return self.pick_unit_price(listings), listings
+
+        listings = await self.afetch_listings(material, unit, size, site_hint)
+
+        await run_blocking(self.persist_listings, listings)
+
+        return self.pick_unit_price(listings), listings
+
+    def get_unit_prices(
+        self,
+        items: List[PriceItem],
+        site_hint: str = "Cebu, Philippines",
+        max_workers: Optional[int] = None,
+        on_priced=None,
+        stats_only: bool = False,
+    ) -> List[Tuple[float, List[Dict[str, Any]]]]:
+        """
+        Price many (material, unit, size) items with as few Gemini calls as
+        possible: fresh stored listings are read in one query, the rest are
+        priced PRICE_BATCH_SIZE at a time in a single prompt each. Items a
+        batch response leaves out are priced one by one; failures price at 0.
+        Misses share get_unit_price's single-flight, so an item another
+        lookup is already pricing is waited for rather than asked again.
+        `stats_only` has the same meaning as for get_unit_price.
+
+        Returns (unit_price, listings) per item, aligned with `items`.
+        `on_priced(index, unit_price, listings)` is called from the calling
+        thread as each item is resolved.
+        """
+        results: List[Optional[Tuple[float, List[Dict[str, Any]]]]] = [None] * len(items)
+        # Items this call is pricing for everyone (single-flight leader) and
+        # items another lookup is already pricing
+        leading: Dict[int, Tuple[Any, Any]] = {}
+        following: Dict[int, Any] = {}
+
+        def finish(i, listings, price=None):
+            results[i] = (self.pick_unit_price(listings) if price is None else price, listings)
+            if i in leading:
+                key, call = leading.pop(i)
+                _inflight.end(key, call, results[i])
+            if on_priced:
+                on_priced(i, *results[i])
+
+        misses = []
+        for i, listings in enumerate(self.cached_listings_many(items)):
+            if len(listings) >= PRICE_CACHE_MIN_LISTINGS:
+                _count("cache_hits")
+                finish(i, listings)
+                continue
+            _count("cache_misses")
+            key = _flight_key(*items[i], site_hint, stats_only)
+            call, leader = _inflight.begin(key)
+            if leader:
+                leading[i] = (key, call)
+                misses.append(i)
+            else:
+                following[i] = call
+
+        try:
+            chunks = [misses[j:j + PRICE_BATCH_SIZE] for j in range(0, len(misses), PRICE_BATCH_SIZE)]
+            if chunks:
+                self._price_chunks(items, chunks, site_hint, max_workers, stats_only, finish)
+        finally:
+            # Never leave a follower waiting on an item this call failed to price
+            for key, call in list(leading.values()):
+                _inflight.end(key, call, (0.0, []))
+            leading.clear()
+
+        for i, call in following.items():
+            try:
+                price, listings = _inflight.wait(call)
+            except Exception as e:
+                print(f"⚠️ Pricing failed for {items[i][0]!r}:", e)
+                price, listings = 0.0, []
+            finish(i, listings, price)
+        return results
+
+    def _price_chunks(self, items, chunks, site_hint, max_workers, stats_only, finish):
+        """Price each chunk of item indexes in one prompt; items a response leaves out one by one."""
+        fetch = self.fetch_price_stats_batch if stats_only else self.fetch_listings_batch
+        workers = max(1, min(max_workers or PRICE_BATCH_CONCURRENCY, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(fetch, [items[i] for i in chunk], site_hint): chunk
+                for chunk in chunks
+            }
+            for fut in as_completed(futures):
+                chunk = futures[fut]
+                try:
+                    batch = fut.result()
+                except Exception as e:
+                    print(f"⚠️ Batch pricing failed for {len(chunk)} items:", e)
+                    batch = [None] * len(chunk)
+
+                found = [(i, got) for i, got in zip(chunk, batch) if got]
+                if stats_only:
+                    found = [(i, self._stats_listings(items[i], stats, site_hint)) for i, stats in found]
+                self.persist_listings([l for _, listings in found for l in listings])
+                for i, listings in found:
+                    finish(i, listings)
+
+                for i, got in zip(chunk, batch):
+                    if got:
+                        continue
+                    _count("batch_fallbacks")
+                    material, unit, size = items[i]
+                    try:
+                        # Not get_unit_price: this call already holds the item's flight
+                        price, listings = self._fetch_uncached(material, unit, size, site_hint, stats_only)
+                    except Exception as e:
+                        print(f"⚠️ Pricing failed for {material!r}:", e)
+                        price, listings = 0.0, []
+                    finish(i, listings, price)
+
+    async def aget_unit_prices(
+        self,
+        items: List[PriceItem],
+        site_hint: str = "Cebu, Philippines",
+    ) -> List[Tuple[float, List[Dict[str, Any]]]]:
+        """get_unit_prices for async routes; batches run concurrently on the event loop."""
+        cached = await run_blocking(self.cached_listings_many, items)
+
+        results: List[Optional[Tuple[float, List[Dict[str, Any]]]]] = [None] * len(items)
+        misses = []
+        for i, listings in enumerate(cached):
+            if len(listings) >= PRICE_CACHE_MIN_LISTINGS:
+                _count("cache_hits")
+                results[i] = (self.pick_unit_price(listings), listings)
+            else:
+                _count("cache_misses")
+                misses.append(i)
+
+        chunks = [misses[j:j + PRICE_BATCH_SIZE] for j in range(0, len(misses), PRICE_BATCH_SIZE)]
+        sem = asyncio.Semaphore(PRICE_BATCH_CONCURRENCY)
+
+        async def run_chunk(chunk):
+            async with sem:
+                try:
+                    batch = await self.afetch_listings_batch([items[i] for i in chunk], site_hint)
+                except Exception as e:
+                    print(f"⚠️ Batch pricing failed for {len(chunk)} items:", e)
+                    batch = [None] * len(chunk)
+
+            found = [l for listings in batch if listings for l in listings]
+            await run_blocking(self.persist_listings, found)
+            for i, listings in zip(chunk, batch):
+                if not listings:
+                    _count("batch_fallbacks")
+                    try:
+                        _price, listings = await self.aget_unit_price(*items[i], site_hint)
+                    except Exception as e:
+                        print(f"⚠️ Pricing failed for {items[i][0]!r}:", e)
+                        listings = []
+                results[i] = (self.pick_unit_price(listings), listings)
+
+        await asyncio.gather(*(run_chunk(c) for c in chunks))
+        return results
+
+    @staticmethod
+    def stats() -> Dict[str, int]:
+        """Counters shared by every instance (index size: see `index.stats()`)."""
+        with _cache_lock:
+            return {**_inflight.stats(), **_cache_stats}
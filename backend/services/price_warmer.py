@@ -0,0 +1,246 @@
+import os, json, time, sqlite3, threading, traceback
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from services.container import container
+from services.job_service import JOBS_DB_PATH, job_queue
+from services.material_index import canonical_unit
+from services.price_service import (
+    PRICE_BATCH_SIZE, PRICE_CACHE_MIN_LISTINGS, PriceItem, cache_ttl_hours,
+)
+
+PRICE_WARMER_ENABLED = os.getenv("PRICE_WARMER_ENABLED", "false").lower() in ("1", "true", "yes")
+PRICE_WARMER_INTERVAL_SECONDS = int(os.getenv("PRICE_WARMER_INTERVAL_SECONDS", "3600"))
+# Rate budget: Gemini calls per run, and minimum spacing between them
+PRICE_WARMER_MAX_CALLS = int(os.getenv("PRICE_WARMER_MAX_CALLS", "10"))
+PRICE_WARMER_CALL_SPACING_SECONDS = float(os.getenv("PRICE_WARMER_CALL_SPACING_SECONDS", "2"))
+# Refresh an item once less than this fraction of its cache TTL is left
+PRICE_WARMER_LEAD_FRACTION = float(os.getenv("PRICE_WARMER_LEAD_FRACTION", "0.2"))
+# How many of the most-listed materials in materials_prices to add to the list
+PRICE_WARMER_TOP_N = int(os.getenv("PRICE_WARMER_TOP_N", "20"))
+PRICE_WARMER_LOOKBACK_DAYS = int(os.getenv("PRICE_WARMER_LOOKBACK_DAYS", "30"))
+# Forced runs (POST /search_price/warmer/run) still wait this long after the last run
+PRICE_WARMER_MIN_SPACING_SECONDS = int(os.getenv("PRICE_WARMER_MIN_SPACING_SECONDS", "600"))
+
+# Staples every estimate needs; PRICE_WARMER_MATERIALS (JSON list of
+# {"material", "unit", "size"}) replaces this list.
+DEFAULT_WARM_MATERIALS = [
+    {"material": "Portland Cement", "unit": "bag", "size": "40kg"},
+    {"material": "Sand", "unit": "m³", "size": "N/A"},
+    {"material": "Gravel", "unit": "m³", "size": "3/4\""},
+    {"material": "Concrete Hollow Blocks", "unit": "pcs", "size": "4\""},
+    {"material": "Concrete Hollow Blocks", "unit": "pcs", "size": "6\""},
+    {"material": "Deformed Bar", "unit": "pcs", "size": "10mm x 6m"},
+    {"material": "Deformed Bar", "unit": "pcs", "size": "12mm x 6m"},
+    {"material": "Deformed Bar", "unit": "pcs", "size": "16mm x 6m"},
+    {"material": "Tie Wire", "unit": "kg", "size": "#16"},
+    {"material": "Pre-painted GI Sheet", "unit": "sheet", "size": "0.4mm x 8ft"},
+    {"material": "Marine Plywood", "unit": "sheet", "size": "1/2\""},
+    {"material": "Coco Lumber", "unit": "pcs", "size": "2x4x8ft"},
+]
+WARM_MATERIALS = json.loads(os.getenv("PRICE_WARMER_MATERIALS", "null")) or DEFAULT_WARM_MATERIALS
+
+
+class PriceWarmer:
+    """
+    Keeps prices for high-frequency materials fresh ahead of demand, so the
+    first estimate of the day finds them in materials_prices instead of
+    waiting on Gemini.
+
+    Each run picks the configured staples plus the materials most often listed
+    in materials_prices, refreshes the ones whose stored listings are about to
+    expire (batched, within PRICE_WARMER_MAX_CALLS Gemini calls), and records
+    a report. Runs are coordinated through the jobs database so only one
+    process per interval does the work.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, price_service=None):
+        self.db_path = db_path
+        self._price_service = price_service
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    @property
+    def price_service(self):
+        return self._price_service or container.price_service
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            if not self._ready:
+                with self._init_lock:
+                    if not self._ready:
+                        self._init_db(conn)
+                        self._ready = True
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS price_warmer_runs (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                started_at REAL NOT NULL,
+                report TEXT
+            )
+        """)
+
+    def _claim_run(self, force: bool = False) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT started_at FROM price_warmer_runs WHERE id = 1").fetchone()
+            wait = PRICE_WARMER_MIN_SPACING_SECONDS if force else PRICE_WARMER_INTERVAL_SECONDS
+            due = not row or now - row["started_at"] >= wait
+            if due:
+                conn.execute(
+                    "INSERT INTO price_warmer_runs (id, started_at) VALUES (1, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET started_at = excluded.started_at",
+                    (now,),
+                )
+            conn.execute("COMMIT")
+            return due
+
+    def seconds_until_forceable(self) -> float:
+        """How long until a forced run is allowed (0 when it is)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT started_at FROM price_warmer_runs WHERE id = 1").fetchone()
+        if not row:
+            return 0.0
+        return max(0.0, row["started_at"] + PRICE_WARMER_MIN_SPACING_SECONDS - time.time())
+
+    def last_report(self) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT report FROM price_warmer_runs WHERE id = 1").fetchone()
+        return json.loads(row["report"]) if row and row["report"] else None
+
+    def _save_report(self, report: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.execute("UPDATE price_warmer_runs SET report = ? WHERE id = 1",
+                         (json.dumps(report, default=str),))
+
+    def candidates(self) -> List[PriceItem]:
+        """Configured staples first, then the most-listed materials, without duplicates."""
+        items: List[PriceItem] = [
+            (m["material"], m.get("unit") or "pcs", m.get("size") or "N/A") for m in WARM_MATERIALS
+        ]
+        try:
+            since = (datetime.utcnow() - timedelta(days=PRICE_WARMER_LOOKBACK_DAYS)).isoformat()
+            rows = self.price_service.sb.get_material_catalog(since)
+            counts = Counter(
+                (r["material"], r.get("unit") or "", r.get("size") or "N/A")
+                for r in rows if r.get("material")
+            )
+            items += [key for key, _n in counts.most_common(PRICE_WARMER_TOP_N)]
+        except Exception as e:
+            print("⚠️ Price warmer could not read lookup counts:", e)
+
+        seen, out = set(), []
+        for material, unit, size in items:
+            key = (material.strip().lower(), canonical_unit(unit), size.strip().lower())
+            if key not in seen:
+                seen.add(key)
+                out.append((material, unit, size))
+        return out
+
+    def is_due(self, item: PriceItem) -> bool:
+        material, unit, size = item
+        ttl = cache_ttl_hours(material)
+        since = (datetime.utcnow() - timedelta(hours=ttl * (1 - PRICE_WARMER_LEAD_FRACTION))).isoformat()
+        rows = self.price_service.sb.get_recent_material_prices(material, unit, size, since)
+        return len(rows) < PRICE_CACHE_MIN_LISTINGS
+
+    def run_once(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """One warming pass; returns its report, or None when another run is current."""
+        if not self._claim_run(force):
+            return None
+
+        started = time.time()
+        report: Dict[str, Any] = {
+            "started_at": datetime.utcnow().isoformat(),
+            "candidates": 0, "gemini_calls": 0,
+            "refreshed": [], "fresh": [], "missed": [], "deferred": [], "errors": [],
+        }
+        svc = self.price_service
+
+        items = self.candidates()
+        report["candidates"] = len(items)
+        due = []
+        for item in items:
+            try:
+                (due if self.is_due(item) else report["fresh"]).append(item)
+            except Exception as e:
+                report["errors"].append({"item": item, "error": str(e)})
+
+        chunks = [due[i:i + PRICE_BATCH_SIZE] for i in range(0, len(due), PRICE_BATCH_SIZE)]
+        for n, chunk in enumerate(chunks):
+            if n >= PRICE_WARMER_MAX_CALLS or self._stop.is_set():
+                report["deferred"] += [i for c in chunks[n:] for i in c]
+                break
+            if n and self._stop.wait(PRICE_WARMER_CALL_SPACING_SECONDS):
+                report["deferred"] += [i for c in chunks[n:] for i in c]
+                break
+
+            report["gemini_calls"] += 1
+            try:
+                # Never from the Gemini memo: a replayed answer would be persisted as fresh
+                batch = svc.fetch_listings_batch(chunk, cache=False)
+            except Exception as e:
+                report["errors"].append({"items": chunk, "error": str(e)})
+                continue
+
+            found = [l for listings in batch if listings for l in listings]
+            svc.persist_listings(found)
+            for item, listings in zip(chunk, batch):
+                if listings:
+                    report["refreshed"].append({"item": item, "listings": len(listings),
+                                                "median_price": svc.pick_unit_price(listings)})
+                else:
+                    report["missed"].append(item)
+
+        report["duration_seconds"] = round(time.time() - started, 2)
+        report["finished_at"] = datetime.utcnow().isoformat()
+        self._save_report(report)
+        print(f"🔥 Price warmer: {len(report['refreshed'])} refreshed, {len(report['fresh'])} fresh, "
+              f"{len(report['deferred'])} deferred in {report['gemini_calls']} Gemini calls")
+        return report
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                traceback.print_exc()
+            # Wake up often enough to notice when another process's run is older than the interval
+            self._stop.wait(min(PRICE_WARMER_INTERVAL_SECONDS, 300))
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="price-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+
+price_warmer = PriceWarmer()
+
+
+def _warm_job(payload: dict, progress):
+    progress(5, "Warming material prices")
+    report = price_warmer.run_once(force=True)
+    return report or {"skipped": "A price warmer run started too recently"}
+
+job_queue.register("price_warmer", _warm_job)
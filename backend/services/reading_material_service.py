@@ -1,8 +1,8 @@
-from services.supabase_service import SupabaseClient
+from services.container import provide
 from models.reading_material import ReadingMaterialCreate, ReadingMaterialUpdate
 from datetime import datetime, timedelta, timezone
 
-supabase = SupabaseClient().client
+supabase = provide("supabase")
 PHT = timezone(timedelta(hours=8))
 
 class ReadingMaterialService:
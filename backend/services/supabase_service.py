@@ -1,13 +1,16 @@
-import os, uuid, re
+import os, uuid, re, time, copy
 from datetime import datetime
-from supabase import create_client, Client
+from services.container import container
 from models.estimate_model import EstimateItem, EstimateSummary
 from dotenv import load_dotenv
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 from models.cost_estimation_model import CostEstimateItemIn
 
 load_dotenv()
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 CAT_TO_NUM = {
     "EARTHWORK": 1,
     "FORMWORK & SCAFFOLDING": 2,
@@ -18,12 +21,105 @@ CAT_TO_NUM = {
     "ROOFING WORK": 7,
 }
 
+# Rows per PostgREST bulk request and attempts per chunk in bulk_insert
+BULK_CHUNK_SIZE = int(os.getenv("SUPABASE_BULK_CHUNK_SIZE", "500"))
+BULK_RETRIES = int(os.getenv("SUPABASE_BULK_RETRIES", "3"))
+# How long a fetched student estimate is served from memory
+ESTIMATE_CACHE_TTL_SECONDS = float(os.getenv("ESTIMATE_CACHE_TTL_SECONDS", "30"))
+
+# Columns of student_cost_estimate_items a save writes (besides id and the estimate id)
+ITEM_FIELDS = ("challenge_id", "cost_category", "material_name", "quantity",
+               "unit", "unit_price", "amount", "item_number")
+
+
+def _estimate_item_row(est_id: str, i: CostEstimateItemIn) -> dict:
+    cat = (i.cost_category or "").upper().strip()
+    row = {
+        "studentsCostEstimatesID": est_id,
+        "challenge_id": str(i.challenge_id) if i.challenge_id else None,
+        "cost_category": i.cost_category,
+        "material_name": i.material_name,
+        "quantity": i.quantity,
+        "unit": i.unit,
+        "unit_price": i.unit_price,
+        "amount": round((i.quantity or 0) * (i.unit_price or 0), 2),
+        "item_number": CAT_TO_NUM.get(cat, None) or 0,
+    }
+    if i.id:
+        row["id"] = str(i.id)
+    return row
+
+
+def item_sort_key(row: dict) -> tuple:
+    """Order of get_estimate_with_items: item_number, then material_name, nulls last like Postgres."""
+    return (row.get("item_number") is None, row.get("item_number") or 0,
+            row.get("material_name") is None, row.get("material_name") or "")
+
+
+def _item_content(row: dict) -> tuple:
+    def num(v):
+        return round(float(v or 0), 3)
+    return (str(row.get("challenge_id") or ""), row.get("cost_category") or "", row.get("material_name") or "",
+            num(row.get("quantity")), row.get("unit") or "", num(row.get("unit_price")),
+            num(row.get("amount")), int(row.get("item_number") or 0))
+
+
+def diff_estimate_items(existing: List[dict], rows: List[dict], taken_ids=()):
+    """
+    Split a save into (inserts, updates, delete_ids) against the saved rows.
+
+    Rows carrying a known id update that row only if its content changed;
+    rows with a new id are inserted under it. Ids in `taken_ids` (saved under
+    another estimate) and repeats of an id are dropped, as in
+    save_student_estimate.sql. Rows without an id (older clients) reuse a
+    saved row with identical content when one is left over, so resaving an
+    unchanged list writes nothing.
+    """
+    taken, seen, cleaned = {str(t) for t in taken_ids}, set(), []
+    for row in rows:
+        rid = str(row["id"]) if row.get("id") else None
+        if rid in taken or rid in seen:
+            row = {k: v for k, v in row.items() if k != "id"}
+        elif rid:
+            seen.add(rid)
+        cleaned.append(row)
+    rows = cleaned
+
+    by_id = {str(r["id"]): r for r in existing}
+    claimed = {str(r["id"]) for r in rows if r.get("id") and str(r["id"]) in by_id}
+    spare = {}
+    for r in existing:
+        if str(r["id"]) not in claimed:
+            spare.setdefault(_item_content(r), []).append(str(r["id"]))
+
+    inserts, updates, keep = [], [], set()
+    for row in rows:
+        rid = str(row["id"]) if row.get("id") else None
+        if rid is None:
+            ids = spare.get(_item_content(row))
+            if ids:
+                keep.add(ids.pop(0))
+                continue
+            inserts.append(row)
+        elif rid in by_id:
+            keep.add(rid)
+            if _item_content(row) != _item_content(by_id[rid]):
+                updates.append(row)
+        else:
+            inserts.append(row)
+
+    delete_ids = [rid for rid in by_id if rid not in keep]
+    return inserts, updates, delete_ids
+
+
 class SupabaseClient:
-    def __init__(self):
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_KEY")
-        self.client = create_client(url, key)
+    def __init__(self, client: Optional["Client"] = None):
+        self.client = client or container.supabase
         self.bucket_name = "student_challenge_files"
+        # (student_id, challenge_id) -> (fetched_at, estimate)
+        self._estimate_cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        # Cleared once PostgREST reports the estimate embedding is not available
+        self.use_embedded_fetch = True
 
     def upsert_cost_estimate(self, student_id: str, challenge_id: str, total_amount: float, submitted_at: Optional[str], status: str):
    
@@ -57,30 +153,71 @@ class SupabaseClient:
     
 
     def replace_estimate_items(self, est_id: str, items: List[CostEstimateItemIn]):
-        self.client.table("student_cost_estimate_items") \
-            .delete().eq("studentsCostEstimatesID", est_id).execute()
-
-        if not items:
-            return
-
-        rows = []
-        for i in items:
-            cat = (i.cost_category or "").upper().strip()
-            item_num = CAT_TO_NUM.get(cat, None)  
-            amount = round((i.quantity or 0) * (i.unit_price or 0), 2)
-            rows.append({
-                "studentsCostEstimatesID": est_id,
-                "challenge_id": i.challenge_id, 
-                "cost_category": i.cost_category, 
+        """
+        Make the saved items of `est_id` match `items`, writing only what changed:
+        one bulk insert, one bulk upsert for edited rows and one delete.
+        """
+        existing = (
+            self.client.table("student_cost_estimate_items")
+            .select(", ".join(("id",) + ITEM_FIELDS))
+            .eq("studentsCostEstimatesID", est_id)
+            .execute()
+            .data
+        ) or []
+
+        rows = [_estimate_item_row(est_id, i) for i in items]
+
+        # Ids this estimate has not saved yet: make sure no other estimate owns them
+        saved = {str(r["id"]) for r in existing}
+        new_ids = [r["id"] for r in rows if r.get("id") and r["id"] not in saved]
+        taken = []
+        if new_ids:
+            taken = [
+                r["id"] for r in (
+                    self.client.table("student_cost_estimate_items")
+                    .select("id")
+                    .in_("id", new_ids)
+                    .execute()
+                    .data
+                ) or []
+            ]
+
+        inserts, updates, delete_ids = diff_estimate_items(existing, rows, taken)
+
+        if delete_ids:
+            self.client.table("student_cost_estimate_items") \
+                .delete().in_("id", delete_ids).execute()
+        if updates:
+            self.client.table("student_cost_estimate_items") \
+                .upsert(updates, on_conflict="id", returning="minimal").execute()
+        if inserts:
+            # default_to_null=False: rows without an id get the column default
+            # instead of id=NULL when the batch mixes both
+            self.client.table("student_cost_estimate_items") \
+                .insert(inserts, returning="minimal", default_to_null=False).execute()
+
+    def save_estimate_atomic(self, student_id: str, challenge_id: str, items: List[CostEstimateItemIn],
+                             pct: float, submit: bool, category_subtotals) -> dict:
+        """
+        Header, items and summary in one transaction via the save_student_estimate
+        function (save_student_estimate.sql); returns its computed totals.
+        """
+        res = self.client.rpc("save_student_estimate", {
+            "p_student_id": student_id,
+            "p_challenge_id": challenge_id,
+            "p_items": [{
+                "id": str(i.id) if i.id else None,
+                "cost_category": i.cost_category,
                 "material_name": i.material_name,
                 "quantity": i.quantity,
                 "unit": i.unit,
                 "unit_price": i.unit_price,
-                "amount": amount,
-                "item_number": item_num or 0,     
-            })
-
-        self.client.table("student_cost_estimate_items").insert(rows).execute()
+            } for i in items],
+            "p_contingency_percentage": pct,
+            "p_submit": submit,
+            "p_category_subtotals": category_subtotals or [],
+        }).execute()
+        return res.data
 
     def upsert_estimate_summary(self, est_id: str, subtotal: float, pct: float,
                             contingency: float, total: float, category_subtotals, challenge_id:str):
@@ -105,6 +242,58 @@ class SupabaseClient:
 
 
     def get_estimate_with_items(self, student_id: str, challenge_id: str):
+        """
+        Header with its ordered items and summary, in one embedded-resource
+        query. Results are cached for ESTIMATE_CACHE_TTL_SECONDS per
+        (student, challenge); save_estimation invalidates the entry.
+        """
+        key = (str(student_id), str(challenge_id))
+        hit = self._estimate_cache.get(key)
+        if hit and time.time() - hit[0] < ESTIMATE_CACHE_TTL_SECONDS:
+            return copy.deepcopy(hit[1])
+
+        est = None
+        if self.use_embedded_fetch:
+            try:
+                est = self._fetch_estimate_embedded(*key)
+            except Exception as e:
+                # PGRST200: the foreign keys behind the embedding are not declared
+                if getattr(e, "code", None) != "PGRST200":
+                    raise
+                print("⚠️ Estimate embedding unavailable, fetching header, items and summary separately:", e)
+                self.use_embedded_fetch = False
+        if not self.use_embedded_fetch:
+            est = self._fetch_estimate_sequential(*key)
+
+        self._estimate_cache[key] = (time.time(), copy.deepcopy(est))
+        return est
+
+    def invalidate_estimate(self, student_id: str, challenge_id: str):
+        self._estimate_cache.pop((str(student_id), str(challenge_id)), None)
+
+    def _fetch_estimate_embedded(self, student_id: str, challenge_id: str):
+        res = (
+            self.client.table("student_cost_estimates")
+            .select("studentsCostEstimatesID, status, total_amount, submitted_at, "
+                    "items:student_cost_estimate_items(*), summary:students_estimates_summary(*)")
+            .eq("student_id", student_id)
+            .eq("challenge_id", challenge_id)
+            .limit(1)
+            .execute()
+        )
+        if not res.data:
+            return None
+
+        est = res.data[0]
+        est["items"] = sorted(est.get("items") or [], key=item_sort_key)
+        summary = est.get("summary")
+        # A one-to-many embed comes back as a list
+        if isinstance(summary, list):
+            summary = summary[0] if summary else None
+        est["summary"] = summary or None
+        return est
+
+    def _fetch_estimate_sequential(self, student_id: str, challenge_id: str):
         hdr = (
             self.client.table("student_cost_estimates")
             .select("studentsCostEstimatesID, status, total_amount, submitted_at")
@@ -151,17 +340,89 @@ class SupabaseClient:
 
 
     def save_material_price(self, item: dict):
+        return self.client.table("materials_prices").insert(self._material_price_row(item)).execute()
+
+    def save_material_prices(self, items: List[dict]):
+        """Insert many listings in one request."""
+        if not items:
+            return None
+        rows = [self._material_price_row(item) for item in items]
+        return self.client.table("materials_prices").insert(rows, returning="minimal").execute()
+
+    def _material_price_row(self, item: dict) -> dict:
         clean_price = re.sub(r"[^\d.]", "", str(item.get("price", "0")))
-        payload = {
+        return {
             "material": item.get("material"),
             "brand": item.get("brand"),
             "unit": item.get("unit"),
             "price": clean_price,                
+            "size": item.get("size"),
             "vendor": item.get("vendor"),
             "location": item.get("location"),
             "gmaps_link": item.get("gmaps_link"),
         }
-        return self.client.table("materials_prices").insert(payload).execute()
+
+    def get_recent_material_prices(self, material: str, unit: str, size: str, since: str, limit: int = 50):
+        """
+        Gemini-sourced listings (teacher_id is null) for a material stored at or
+        after `since` (ISO timestamp). Material names match case-insensitively.
+        """
+        pattern = re.sub(r"([%_\\])", r"\\\1", material.strip())
+        query = (
+            self.client.table("materials_prices")
+            .select("material, brand, size, unit, price, vendor, location, created_at")
+            .ilike("material", pattern)
+            .eq("unit", unit)
+            .is_("teacher_id", "null")
+            .gte("created_at", since)
+        )
+        if size and size != "N/A":
+            query = query.eq("size", size)
+        res = query.order("created_at", desc=True).limit(limit).execute()
+        return res.data or []
+
+    def get_recent_material_prices_many(self, items: List[Tuple[str, str, str]], since: str, limit_per_item: int = 50):
+        """
+        get_recent_material_prices for several (material, unit, size) items in
+        one request: the rows of all of them, newest first. The caller splits
+        them per item.
+        """
+        def quoted(value) -> str:
+            return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+        conditions = []
+        for material, unit, size in items:
+            pattern = re.sub(r"([%_\\])", r"\\\1", material.strip())
+            parts = [f"material.ilike.{quoted(pattern)}", f"unit.eq.{quoted(unit)}"]
+            if size and size != "N/A":
+                parts.append(f"size.eq.{quoted(size)}")
+            conditions.append(f"and({','.join(parts)})")
+        if not conditions:
+            return []
+        res = (
+            self.client.table("materials_prices")
+            .select("material, brand, size, unit, price, vendor, location, created_at")
+            .or_(",".join(conditions))
+            .is_("teacher_id", "null")
+            .gte("created_at", since)
+            .order("created_at", desc=True)
+            .limit(limit_per_item * len(items))
+            .execute()
+        )
+        return res.data or []
+
+    def get_material_catalog(self, since: str, limit: int = 5000):
+        """Material/unit/size of Gemini-sourced listings stored at or after `since`."""
+        res = (
+            self.client.table("materials_prices")
+            .select("material, unit, size")
+            .is_("teacher_id", "null")
+            .gte("created_at", since)
+            .order("created_at", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return res.data or []
 
     def upload_file_to_bucket(self, file_path: str, file_bytes: bytes, content_type: str):
         """
@@ -194,14 +455,11 @@ class SupabaseClient:
             raise Exception(f"Failed to upload file: {str(e)}")
 
 class SupabaseService:
-    def __init__(self):
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_KEY")
-
-        if not url or not key:
+    def __init__(self, client: Optional["Client"] = None):
+        if client is None and (not os.getenv("SUPABASE_URL") or not os.getenv("SUPABASE_KEY")):
             raise ValueError("SUPABASE_URL or SUPABASE_KEY is missing from environment variables")
 
-        self.client: Client = create_client(url, key)
+        self.client: "Client" = client or container.supabase
 
     def get_challenge(self, challenge_id: str):
         """
@@ -212,6 +470,38 @@ class SupabaseService:
             return response.data[0]
         return None
 
+    def bulk_insert(self, table: str, rows: List[dict], key: Optional[str] = None,
+                    chunk_size: int = BULK_CHUNK_SIZE, retries: int = BULK_RETRIES) -> int:
+        """
+        Write `rows` to `table` in chunked bulk requests instead of one call per row.
+
+        When `key` (the table's primary key, set client-side) is given, chunks are
+        written as upserts on that column, so a chunk that is retried after a
+        partial failure never duplicates rows that already landed.
+        Returns the number of rows written; raises if a chunk keeps failing.
+        """
+        written = 0
+        for start in range(0, len(rows), max(1, chunk_size)):
+            chunk = rows[start:start + chunk_size]
+            for attempt in range(1, retries + 1):
+                try:
+                    query = self.client.table(table)
+                    if key:
+                        query = query.upsert(chunk, on_conflict=key, returning="minimal")
+                    else:
+                        query = query.insert(chunk, returning="minimal")
+                    query.execute()
+                    written += len(chunk)
+                    break
+                except Exception as e:
+                    if attempt == retries:
+                        raise Exception(
+                            f"Bulk insert into {table} failed after {written} rows: {e}"
+                        )
+                    print(f"⚠️ Bulk insert into {table} failed (attempt {attempt}), retrying:", e)
+                    time.sleep(0.5 * 2 ** (attempt - 1))
+        return written
+
     def save_estimation_results(self, challenge_id: str, analysis_id: str, items: List[EstimateItem], summary: EstimateSummary):
         """
         Save AI results into structural_elements, ai_cost_estimates, cost_estimates_summary.
@@ -0,0 +1,17 @@
+-- Columns and constraint used by the accuracy endpoint.
+-- input_hash is the content hash of the student and AI items the stored
+-- accuracy was computed from; an unchanged request returns the stored row.
+-- The unique constraint lets store_accuracy write with a single upsert.
+ALTER TABLE student_ai_accuracy
+ADD COLUMN IF NOT EXISTS input_hash TEXT,
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+-- Keep the newest row per (student, challenge) before adding the constraint
+DELETE FROM student_ai_accuracy a
+USING student_ai_accuracy b
+WHERE a.student_id = b.student_id
+  AND a.challenge_id = b.challenge_id
+  AND a.ctid < b.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_ai_accuracy_student_challenge
+    ON student_ai_accuracy (student_id, challenge_id);
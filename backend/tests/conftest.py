@@ -0,0 +1,85 @@
+import os, sys, json, tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+
+# routes.auth refuses to import without these; clients are only built on use
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+# Loaded in order into the test database
+SQL_FILES = ("local_postgres_schema.sql", "save_student_estimate.sql")
+
+
+@pytest.fixture(scope="session")
+def pg_uri():
+    """
+    Postgres to run the SQL functions against: TEST_DATABASE_URL when set,
+    otherwise a throwaway server from pgserver (requirements-dev.txt).
+    """
+    uri = os.getenv("TEST_DATABASE_URL")
+    if uri:
+        yield uri
+        return
+    pgserver = pytest.importorskip("pgserver", reason="set TEST_DATABASE_URL or install pgserver")
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="estimates-pg-"), cleanup_mode="stop")
+    yield server.get_uri()
+
+
+@pytest.fixture(scope="session")
+def pg_schema(pg_uri):
+    psycopg = pytest.importorskip("psycopg")
+    with psycopg.connect(pg_uri, autocommit=True) as conn:
+        for name in SQL_FILES:
+            conn.execute((BACKEND / name).read_text())
+    return pg_uri
+
+
+@pytest.fixture
+def db(pg_schema):
+    """Autocommit connection to an empty set of estimate tables."""
+    import psycopg
+    with psycopg.connect(pg_schema, autocommit=True) as conn:
+        conn.execute("TRUNCATE student_cost_estimates, student_cost_estimate_items, "
+                     "students_estimates_summary CASCADE")
+        yield conn
+
+
+def save_estimate(conn, student_id, challenge_id, items, pct=0.10, submit=False, category_subtotals=()):
+    """Call save_student_estimate the way SupabaseClient.save_estimate_atomic does."""
+    return conn.execute(
+        "SELECT save_student_estimate(%s::uuid, %s::uuid, %s::jsonb, %s::numeric, %s, %s::jsonb)",
+        (str(student_id), str(challenge_id), json.dumps(items, default=str), pct, submit,
+         json.dumps(list(category_subtotals))),
+    ).fetchone()[0]
+
+
+@pytest.fixture
+def estimation(monkeypatch):
+    """
+    services.estimate_service with its Supabase, Gemini, pricing and plan
+    cache dependencies replaced by mocks: an empty plan analysis, no cache
+    hit, and every item priced at 100.
+    """
+    import services.estimate_service as estimate_service
+
+    mocks = SimpleNamespace(gemini=MagicMock(), plan_cache=MagicMock(), price_service=MagicMock(),
+                            supabase=MagicMock(), supasvc=MagicMock())
+    mocks.gemini.analyze_plan_extract_elements.return_value = {"elements": [], "confidence": 0.9}
+    mocks.gemini.stream_cost_estimates.return_value = iter([])
+    mocks.plan_cache.key_for.return_value = "plan-key"
+    mocks.plan_cache.get.return_value = None
+    mocks.price_service.get_unit_prices.side_effect = \
+        lambda keys, on_priced, **kw: [on_priced(i, 100.0, []) for i in range(len(keys))]
+    mocks.supasvc.get_challenge.return_value = {"challenge_name": "House"}
+
+    monkeypatch.setattr(estimate_service, "STREAM_BOQ", True)
+    for name, mock in vars(mocks).items():
+        monkeypatch.setattr(estimate_service, name, mock)
+    mocks.run = estimate_service.run_ai_estimation
+    return mocks
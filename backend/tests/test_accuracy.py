@@ -0,0 +1,91 @@
+import random
+from itertools import permutations
+
+import pytest
+
+from services.accuracy_service import FIELDS, AccuracyScorer, _normalize, assign, closeness
+
+ITEMS = [
+    {"cost_category": "MASONRY WORK", "description": "Concrete Hollow Blocks 4in", "quantity": 350,
+     "unit": "pcs", "unit_price": 14, "amount": 4900},
+    {"cost_category": "CONCRETE WORK", "description": "Portland Cement 40kg", "quantity": 60,
+     "unit": "bags", "unit_price": 260, "amount": 15600},
+    {"cost_category": "REBAR WORK", "description": "Deformed Bar 10mm x 6m", "quantity": 45,
+     "unit": "pcs", "unit_price": 210, "amount": 9450},
+    {"cost_category": "EARTHWORK", "description": "Washed Sand", "quantity": 4,
+     "unit": "cu.m", "unit_price": 1500, "amount": 6000},
+]
+
+
+# --- assign ---
+
+def brute_force(cost):
+    n, m = len(cost), len(cost[0])
+    if n <= m:
+        return min(sum(cost[i][j] for i, j in enumerate(cols)) for cols in permutations(range(m), n))
+    return min(sum(cost[i][j] for j, i in enumerate(rows)) for rows in permutations(range(n), m))
+
+
+@pytest.mark.parametrize("n, m", [(1, 1), (3, 3), (5, 5), (2, 5), (5, 2), (4, 6)])
+def test_assignment_is_optimal(n, m):
+    rng = random.Random(n * 10 + m)
+    for _ in range(20):
+        cost = [[rng.random() for _ in range(m)] for _ in range(n)]
+        pairs = assign(cost)
+        assert len(pairs) == min(n, m)
+        assert len({i for i, _ in pairs}) == len({j for _, j in pairs}) == len(pairs)
+        assert sum(cost[i][j] for i, j in pairs) == pytest.approx(brute_force(cost))
+
+
+def test_empty_assignment():
+    assert assign([]) == []
+    assert assign([[]]) == []
+
+
+def test_closeness():
+    assert closeness([0, 10, 10, -5], [0, 10, 5, 5]) == [1.0, 1.0, 0.5, 0.0]
+
+
+# --- AccuracyScorer ---
+
+def test_identical_lists_score_100():
+    assert AccuracyScorer().score(ITEMS, ITEMS) == {f: 100.0 for f in FIELDS}
+
+
+def test_row_order_does_not_matter():
+    scorer = AccuracyScorer()
+    assert scorer.score(ITEMS[::-1], ITEMS) == {f: 100.0 for f in FIELDS}
+    assert scorer.score(ITEMS[:3], ITEMS) == scorer.score(ITEMS[2::-1], ITEMS)
+
+
+def test_student_phrasing_is_matched_to_the_ai_row():
+    student = [
+        {"cost_category": "EARTHWORK", "material_name": "sand, washed", "quantity": 4,
+         "unit": "m3", "unit_price": 1500},
+        {"cost_category": "MASONRY WORK", "material_name": "CHB 4\"", "quantity": 350,
+         "unit": "pieces", "unit_price": 14},
+    ]
+    matched = AccuracyScorer().match([_normalize(x) for x in student], [_normalize(x) for x in ITEMS])
+    assert sorted((i, j) for i, j, _ in matched) == [(0, 3), (1, 0)]
+
+
+def test_missing_and_wrong_rows_lower_the_score():
+    scorer = AccuracyScorer()
+    full = scorer.score(ITEMS, ITEMS)
+    missing = scorer.score(ITEMS[:2], ITEMS)
+    wrong_qty = scorer.score([dict(x, quantity=x["quantity"] * 2) for x in ITEMS], ITEMS)
+
+    assert missing["description_accuracy"] == 50.0 and missing["final_accuracy"] < full["final_accuracy"]
+    assert wrong_qty["quantity_accuracy"] == 50.0 and wrong_qty["description_accuracy"] == 100.0
+    assert wrong_qty["unit_accuracy"] == 100.0
+
+
+def test_unrelated_rows_are_not_paired():
+    other = [{"cost_category": "ELECTRICAL", "description": "THHN wire 3.5mm", "quantity": 1,
+              "unit": "roll", "unit_price": 3000}]
+    result = AccuracyScorer().score(other, ITEMS)
+    assert result["description_accuracy"] == result["quantity_accuracy"] == result["unit_accuracy"] == 0.0
+
+
+def test_an_empty_side_scores_zero():
+    assert AccuracyScorer().score([], ITEMS) == {f: 0.0 for f in FIELDS}
@@ -0,0 +1,165 @@
+import time, uuid
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+import services.draft_buffer as draft_buffer_module
+from models.cost_estimation_model import CostEstimateCreate, CostEstimateOut
+from services.cost_estimation_service import CostEstimationService
+from services.draft_buffer import DraftBuffer, DraftFlushInProgress
+
+STUDENT, CHALLENGE = uuid.uuid4(), uuid.uuid4()
+
+
+class RecordingService(CostEstimationService):
+    """CostEstimationService whose saves are recorded instead of written."""
+
+    def __init__(self):
+        super().__init__(MagicMock())
+        self.saved = []
+        self.est_id = uuid.uuid4()
+
+    def _save(self, payload):
+        self.saved.append(payload)
+        subtotal, contingency, total = self._totals(payload.items, payload.contingency_percentage)
+        return CostEstimateOut(
+            studentsCostEstimatesID=self.est_id, subtotal_amount=subtotal,
+            contingency_percentage=payload.contingency_percentage, contingency_amount=contingency,
+            total_amount=total, total_material_cost_tc=subtotal,
+            contingencies_percent_int=round(payload.contingency_percentage * 100),
+            contingencies_amount=contingency, grand_total_cost=total,
+            status="submitted" if payload.submit else "draft",
+        )
+
+
+def draft(qty, submit=False):
+    return CostEstimateCreate(student_id=STUDENT, challenge_id=CHALLENGE, submit=submit, items=[{
+        "cost_category": "MASONRY WORK", "material_name": "CHB", "quantity": qty,
+        "unit": "pcs", "unit_price": 10, "challenge_id": CHALLENGE,
+    }])
+
+
+def quantities(payloads):
+    return [p.items[0].quantity for p in payloads]
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    """Short timings; tests override what they exercise."""
+    for name, value in (("DRAFT_DEBOUNCE_SECONDS", 60), ("DRAFT_MAX_DELAY_SECONDS", 60),
+                        ("DRAFT_FLUSH_LEASE_SECONDS", 30), ("DRAFT_DISCARD_WAIT_SECONDS", 0.3)):
+        monkeypatch.setattr(draft_buffer_module, name, value)
+    return lambda name, value: monkeypatch.setattr(draft_buffer_module, name, value)
+
+
+@pytest.fixture
+def service():
+    return RecordingService()
+
+
+@pytest.fixture
+def buffer(tmp_path, service, settings):
+    return DraftBuffer(db_path=str(tmp_path / "jobs.db"), service=service)
+
+
+def test_first_draft_is_written_through_and_later_ones_buffered(buffer, service):
+    first = buffer.put(draft(1))
+    second = buffer.put(draft(2))
+
+    assert quantities(service.saved) == [1]
+    assert second.studentsCostEstimatesID == first.studentsCostEstimatesID
+    assert (second.subtotal_amount, second.total_amount, second.status) == (20, 22, "draft")
+    assert quantities([buffer.pending(STUDENT, CHALLENGE)]) == [2]
+
+
+def test_drafts_are_written_once_edits_pause(buffer, service, settings):
+    settings("DRAFT_DEBOUNCE_SECONDS", 0.2)
+    buffer.put(draft(1))
+    buffer.put(draft(2))
+    buffer.put(draft(3))
+    assert buffer.flush() == 0
+
+    time.sleep(0.25)
+    assert buffer.flush() == 1
+    assert quantities(service.saved) == [1, 3]
+    assert buffer.pending(STUDENT, CHALLENGE) is None
+    assert buffer.flush() == 0
+
+
+def test_busy_drafts_are_written_after_the_max_delay(buffer, service, settings):
+    settings("DRAFT_MAX_DELAY_SECONDS", 0.3)
+    buffer.put(draft(1))
+    deadline = time.time() + 2
+    n = 1
+    while buffer.flush() == 0 and time.time() < deadline:
+        n += 1
+        buffer.put(draft(n))  # never quiet for DRAFT_DEBOUNCE_SECONDS
+        time.sleep(0.05)
+
+    assert len(service.saved) == 2 and 3 <= service.saved[1].items[0].quantity <= n
+    assert time.time() < deadline
+
+
+def test_a_draft_leased_by_another_process_is_left_to_it(tmp_path, settings):
+    mine, theirs = RecordingService(), RecordingService()
+    path = str(tmp_path / "jobs.db")
+    a, b = DraftBuffer(db_path=path, service=mine), DraftBuffer(db_path=path, service=theirs)
+    a.put(draft(1))
+    a.put(draft(2))
+
+    assert a._claim_due(force=True) == [(str(STUDENT), str(CHALLENGE))]  # a is mid-flush
+    assert b.flush(force=True) == 0
+
+    # A submit through b cannot drop the draft a is writing
+    with pytest.raises(DraftFlushInProgress):
+        b.discard(STUDENT, CHALLENGE)
+    assert a.pending(STUDENT, CHALLENGE) is not None
+
+
+def test_an_expired_lease_is_taken_over(tmp_path, settings):
+    settings("DRAFT_FLUSH_LEASE_SECONDS", 0.1)
+    mine, theirs = RecordingService(), RecordingService()
+    path = str(tmp_path / "jobs.db")
+    a, b = DraftBuffer(db_path=path, service=mine), DraftBuffer(db_path=path, service=theirs)
+    a.put(draft(1))
+    a.put(draft(2))
+    a._claim_due(force=True)  # and then a dies
+
+    time.sleep(0.15)
+    assert b.flush(force=True) == 1
+    assert quantities(theirs.saved) == [2]
+
+
+def test_submit_drops_the_buffered_draft_before_a_claimed_flush_writes_it(buffer, service):
+    buffer.put(draft(1))
+    buffer.put(draft(2))
+    claimed = buffer._claim_due(force=True)
+
+    buffer.discard(STUDENT, CHALLENGE)  # our own lease: no wait
+    buffer._claim_due = lambda force: claimed  # flush resumes with its earlier claim
+    assert buffer.flush() == 0
+    assert quantities(service.saved) == [1]
+
+
+def test_route_answers_409_while_another_process_flushes(tmp_path, settings, monkeypatch):
+    import routes.cost_estimation_route as route
+
+    path = str(tmp_path / "jobs.db")
+    a, b = DraftBuffer(db_path=path, service=RecordingService()), DraftBuffer(db_path=path, service=RecordingService())
+    a.put(draft(1))
+    a.put(draft(2))
+    a._claim_due(force=True)
+
+    monkeypatch.setattr(route, "DRAFT_BUFFER_ENABLED", True)
+    monkeypatch.setattr(route, "draft_buffer", b)
+    with pytest.raises(HTTPException) as e:
+        route.save_cost_estimate(draft(3, submit=True))
+    assert e.value.status_code == 409
+
+
+def test_locks_are_a_fixed_set(buffer):
+    for n in range(1000):
+        buffer._lock((str(uuid.uuid4()), str(n)))
+    assert len(buffer._locks) == draft_buffer_module.DRAFT_LOCK_STRIPES
+    assert buffer._lock(("s", "c")) is buffer._lock(("s", "c"))
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(estimation):
+    import main
+    return TestClient(main.app)
+
+
+def events(response):
+    """(event, data) pairs of a text/event-stream body."""
+    out = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        out.append((fields["event"], json.loads(fields["data"])))
+    return out
+
+
+def post(client):
+    return client.post("/api/cost-estimates/challenges/c1/estimate/stream",
+                       json={"plan_file_url": "https://example.com/plan.pdf"})
+
+
+def test_rows_stream_before_the_summary(client, estimation):
+    estimation.gemini.stream_cost_estimates.return_value = iter([
+        {"cost_category": "EARTHWORK", "description": "Sand", "quantity": 2, "unit": "m3"},
+        {"cost_category": "MASONRY WORK", "description": "CHB 4in", "quantity": 10, "unit": "pcs"},
+    ])
+    response = post(client)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    got = events(response)
+    names = [name for name, _ in got]
+    assert names[-1] == "summary" and "progress" in names and "elements" in names
+    assert names.index("elements") < names.index("boq") and names.count("row") == 2
+
+    rows = sorted((d["description"], d["amount"]) for name, d in got if name == "row")
+    assert rows == [("CHB 4in", 1000.0), ("Sand", 200.0)]
+    assert sorted(r["description"] for r in got[-1][1]["estimates"]) == ["CHB 4in", "Sand"]
+
+
+def test_failures_end_the_stream_with_an_error_event(client, estimation):
+    estimation.gemini.analyze_plan_extract_elements.side_effect = RuntimeError("Gemini is down")
+    got = events(post(client))
+    assert got[-1] == ("error", {"detail": "Gemini is down"})
+    assert "summary" not in [name for name, _ in got]
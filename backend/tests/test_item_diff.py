@@ -0,0 +1,140 @@
+import uuid
+
+from conftest import save_estimate
+from models.cost_estimation_model import CostEstimateItemIn
+from services.supabase_service import _estimate_item_row, diff_estimate_items
+
+EST = "est-1"
+CHALLENGE = uuid.uuid4()
+
+
+def item(name, qty=1, price=10, id=None, category="MASONRY WORK"):
+    return CostEstimateItemIn(id=id, cost_category=category, material_name=name, quantity=qty,
+                              unit="pcs", unit_price=price, challenge_id=CHALLENGE)
+
+
+def saved(*items):
+    """Rows as replace_estimate_items selects them, each with a saved id."""
+    rows = []
+    for i in items:
+        row = _estimate_item_row(EST, i)
+        row["id"] = str(i.id or uuid.uuid4())
+        rows.append(row)
+    return rows
+
+
+def rows(*items):
+    return [_estimate_item_row(EST, i) for i in items]
+
+
+def ids(rs):
+    return [r.get("id") for r in rs]
+
+
+# --- diff_estimate_items (replace_estimate_items path) ---
+
+def test_unchanged_resave_writes_nothing():
+    a, b = item("CHB", id=uuid.uuid4()), item("Sand", id=uuid.uuid4())
+    assert diff_estimate_items(saved(a, b), rows(a, b)) == ([], [], [])
+
+
+def test_one_cell_edit_is_one_update():
+    a, b = item("CHB", id=uuid.uuid4()), item("Sand", id=uuid.uuid4())
+    edited = item("Sand", qty=3, id=b.id)
+    inserts, updates, deletes = diff_estimate_items(saved(a, b), rows(a, edited))
+    assert (inserts, deletes) == ([], [])
+    assert ids(updates) == [str(b.id)] and updates[0]["quantity"] == 3
+
+
+def test_removed_rows_are_deleted():
+    a, b, c = (item(n, id=uuid.uuid4()) for n in ("CHB", "Sand", "Gravel"))
+    assert diff_estimate_items(saved(a, b, c), rows(b)) == ([], [], [str(a.id), str(c.id)])
+
+
+def test_idless_rows_reuse_spare_saved_rows():
+    a, b = item("CHB", id=uuid.uuid4()), item("Sand", id=uuid.uuid4())
+    # Older client: same content, no ids, plus one extra copy of CHB
+    inserts, updates, deletes = diff_estimate_items(saved(a, b), rows(item("CHB"), item("Sand"), item("CHB")))
+    assert (updates, deletes) == ([], [])
+    assert len(inserts) == 1 and inserts[0]["material_name"] == "CHB" and "id" not in inserts[0]
+
+
+def test_mixed_batch():
+    a, b, c = (item(n, id=uuid.uuid4()) for n in ("CHB", "Sand", "Gravel"))
+    new = item("Cement", id=uuid.uuid4())
+    batch = rows(item("CHB"), item("Sand", qty=5, id=b.id), new, item("Tie wire"))
+    inserts, updates, deletes = diff_estimate_items(saved(a, b, c), batch)
+    assert ids(updates) == [str(b.id)]
+    assert [(r.get("id"), r["material_name"]) for r in inserts] == [(str(new.id), "Cement"), (None, "Tie wire")]
+    assert deletes == [str(c.id)]
+
+
+def test_foreign_and_repeated_ids_are_dropped():
+    foreign, repeated = uuid.uuid4(), uuid.uuid4()
+    batch = rows(item("CHB", id=foreign), item("Sand", id=repeated), item("Gravel", id=repeated))
+    inserts, updates, deletes = diff_estimate_items([], batch, taken_ids=[str(foreign)])
+    assert ids(inserts) == [None, str(repeated), None]
+
+
+# --- id resolution in save_student_estimate.sql ---
+
+def db_items(db, est_id):
+    return {
+        r[1]: (str(r[0]), r[2], float(r[3]))
+        for r in db.execute(
+            'SELECT id, material_name, xmin::text, quantity FROM student_cost_estimate_items '
+            'WHERE "studentsCostEstimatesID" = %s', (est_id,)
+        ).fetchall()
+    }
+
+
+def payload(*items):
+    return [{"id": str(i.id) if i.id else None, "cost_category": i.cost_category, "material_name": i.material_name,
+             "quantity": i.quantity, "unit": i.unit, "unit_price": i.unit_price} for i in items]
+
+
+def test_rpc_unchanged_edit_remove_and_idless_reuse(db):
+    student, challenge = uuid.uuid4(), uuid.uuid4()
+    a, b, c = (item(n, id=uuid.uuid4()) for n in ("CHB", "Sand", "Gravel"))
+    est_id = save_estimate(db, student, challenge, payload(a, b, c))["studentsCostEstimatesID"]
+    before = db_items(db, est_id)
+    assert {k: v[0] for k, v in before.items()} == {"CHB": str(a.id), "Sand": str(b.id), "Gravel": str(c.id)}
+
+    # Unchanged resave rewrites no row
+    save_estimate(db, student, challenge, payload(a, b, c))
+    assert db_items(db, est_id) == before
+
+    # One-cell edit touches only that row; a dropped row is deleted
+    save_estimate(db, student, challenge, payload(a, item("Sand", qty=4, id=b.id)))
+    after = db_items(db, est_id)
+    assert set(after) == {"CHB", "Sand"}
+    assert after["CHB"] == before["CHB"]
+    assert after["Sand"][0] == str(b.id) and after["Sand"][1] != before["Sand"][1] and after["Sand"][2] == 4
+
+    # Id-less rows with saved content keep their saved rows
+    save_estimate(db, student, challenge, payload(item("CHB"), item("Sand", qty=4)))
+    assert db_items(db, est_id) == after
+
+
+def test_rpc_mixed_batch_and_foreign_id(db):
+    challenge = uuid.uuid4()
+    other = item("Plywood", id=uuid.uuid4())
+    save_estimate(db, uuid.uuid4(), challenge, payload(other))
+
+    student = uuid.uuid4()
+    a, b = item("CHB", id=uuid.uuid4()), item("Sand", id=uuid.uuid4())
+    est_id = save_estimate(db, student, challenge, payload(a, b))["studentsCostEstimatesID"]
+    before = db_items(db, est_id)
+
+    new = item("Cement", id=uuid.uuid4())
+    stolen = item("Plywood", id=other.id)  # id saved under the other student's estimate
+    save_estimate(db, student, challenge, payload(item("CHB"), new, stolen))
+    after = db_items(db, est_id)
+
+    assert set(after) == {"CHB", "Cement", "Plywood"}
+    assert after["CHB"] == before["CHB"]
+    assert after["Cement"][0] == str(new.id)
+    assert after["Plywood"][0] != str(other.id)
+    # The other estimate's row is untouched
+    assert db.execute("SELECT COUNT(*) FROM student_cost_estimate_items WHERE id = %s",
+                      (str(other.id),)).fetchone()[0] == 1
@@ -0,0 +1,126 @@
+import os, time
+
+import pytest
+from fastapi import HTTPException
+
+import services.job_service as job_service
+from services.container import container
+from services.job_service import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = JobQueue(db_path=str(tmp_path / "jobs.db"), workers=1, handlers={})
+    q.register("echo", lambda payload, progress: (progress(50, "halfway"), payload)[1])
+    q.register("boom", lambda payload, progress: 1 / 0)
+    return q
+
+
+def run_next(q):
+    row = q._claim()
+    assert row is not None
+    q._run(row)
+    return row["job_id"]
+
+
+def test_the_database_is_created_on_first_use(tmp_path):
+    path = tmp_path / "jobs.db"
+    q = JobQueue(db_path=str(path), handlers={"echo": lambda payload, progress: payload})
+    assert not path.exists()
+    q.enqueue("echo", {})
+    assert path.exists()
+
+
+def test_the_default_path_does_not_depend_on_the_working_directory():
+    assert os.path.isabs(job_service.JOBS_DB_PATH)
+
+
+def test_the_container_builds_one_queue_with_every_registered_kind():
+    import routes.estimate_route, routes.cost_estimation_route  # noqa: F401 (register kinds)
+
+    assert container.job_queue is container.job_queue
+    assert {"ai_estimation", "ai_accuracy"} <= set(job_service.job_queue.handlers)
+
+
+def test_jobs_run_to_a_result(queue):
+    job_id = queue.enqueue("echo", {"x": 1}, owner_id="student-1")
+    assert queue.get(job_id)["status"] == "queued"
+
+    assert run_next(queue) == job_id
+    job = queue.get(job_id)
+    assert (job["status"], job["progress"], job["result"], job["owner_id"]) == \
+        ("succeeded", 100, {"x": 1}, "student-1")
+    assert queue._claim() is None
+
+
+def test_failures_are_recorded(queue):
+    job_id = queue.enqueue("boom", {})
+    run_next(queue)
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and "division by zero" in job["error"]
+
+
+def test_unknown_kinds_are_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.enqueue("nope", {})
+    assert queue.get("missing") is None
+
+
+def test_workers_pick_up_queued_jobs(queue):
+    queue.start()
+    try:
+        job_id = queue.enqueue("echo", {"x": 2})
+        deadline = time.time() + 5
+        while queue.get(job_id)["status"] != "succeeded" and time.time() < deadline:
+            time.sleep(0.02)
+        assert queue.get(job_id)["result"] == {"x": 2}
+    finally:
+        queue.stop()
+
+
+def test_abandoned_jobs_are_retried_then_given_up(queue, monkeypatch):
+    monkeypatch.setattr(job_service, "JOB_MAX_ATTEMPTS", 2)
+    job_id = queue.enqueue("echo", {})
+    assert queue._claim()["job_id"] == job_id  # and the worker dies
+    assert queue._claim() is None  # the lease is still live
+
+    queue._update(job_id, lease_until=time.time() - 1)
+    assert queue._claim()["job_id"] == job_id  # second attempt, dies again
+
+    queue._update(job_id, lease_until=time.time() - 1)
+    assert queue._claim() is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["error"] == "Abandoned after 2 attempts"
+
+
+# --- GET /api/jobs/{job_id} ---
+
+@pytest.fixture
+def route(queue, monkeypatch):
+    import routes.job_routes as job_routes
+    monkeypatch.setattr(job_routes, "job_queue", queue)
+    return job_routes
+
+
+def test_jobs_are_visible_to_their_owner_and_teachers(route, queue):
+    job_id = queue.enqueue("echo", {}, owner_id="student-1")
+    assert route.get_job(job_id, ("student-1", "student"))["job_id"] == job_id
+    assert "owner_id" not in route.get_job(job_id, ("teacher-1", "teacher"))
+
+    with pytest.raises(HTTPException) as e:
+        route.get_job(job_id, ("student-2", "student"))
+    assert e.value.status_code == 404
+
+
+def test_unowned_jobs_are_for_teachers_only(route, queue):
+    job_id = queue.enqueue("echo", {})
+    assert route.get_job(job_id, ("admin-1", "admin"))["status"] == "queued"
+    with pytest.raises(HTTPException):
+        route.get_job(job_id, ("student-1", "student"))
+
+
+def test_job_status_needs_a_token():
+    from fastapi.testclient import TestClient
+    import main
+
+    assert TestClient(main.app).get("/api/jobs/anything").status_code == 401
@@ -0,0 +1,80 @@
+import pytest
+
+from services.gemini_cache import GeminiResponseCache
+from services.gemini_service import GeminiPriceSearch
+from services.json_stream import IncompleteJsonArray, JsonArrayStream
+
+ROWS = '```json\n[{"cost_category": "EARTHWORK", "description": "Sand [fine]", "quantity": 2},\n' \
+       ' {"cost_category": "MASONRY WORK", "description": "CHB \\"4in\\"", "quantity": 100}]\n```'
+
+
+# --- JsonArrayStream ---
+
+def test_elements_arrive_as_they_complete():
+    parser = JsonArrayStream()
+    cut = ROWS.index("},") + 1
+    assert [r["description"] for r in parser.feed(ROWS[:cut])] == ["Sand [fine]"]
+    assert not parser.done
+    assert [r["description"] for r in parser.feed(ROWS[cut:])] == ['CHB "4in"']
+    assert parser.done
+
+
+def test_one_character_at_a_time():
+    parser = JsonArrayStream()
+    out = [row for ch in ROWS for row in parser.feed(ch)]
+    assert [r["quantity"] for r in out] == [2, 100] and parser.done
+
+
+def test_malformed_elements_are_skipped():
+    parser = JsonArrayStream()
+    assert parser.feed('[{"a": 1}, {"a": oops}, {"a": 3}]') == [{"a": 1}, {"a": 3}]
+    assert parser.errors == 1 and parser.done
+
+
+def test_truncated_array_is_not_done():
+    parser = JsonArrayStream()
+    assert parser.feed('[{"a": 1}, {"a": 2') == [{"a": 1}]
+    assert not parser.done
+
+
+# --- GeminiPriceSearch._stream_array ---
+
+@pytest.fixture
+def gemini(monkeypatch):
+    cache = GeminiResponseCache(db_path=None)
+    monkeypatch.setattr("services.gemini_service.gemini_cache", cache)
+    g = GeminiPriceSearch()
+    g.cache = cache
+    return g
+
+
+def test_complete_stream_is_cached_and_replayed(gemini, monkeypatch):
+    monkeypatch.setattr(gemini, "_stream_text", lambda prompt: iter([ROWS[:40], ROWS[40:]]))
+    assert len(list(gemini._stream_array("p", cache=True))) == 2
+
+    monkeypatch.setattr(gemini, "_stream_text", lambda prompt: pytest.fail("should replay the cache"))
+    assert len(list(gemini._stream_array("p", cache=True))) == 2
+
+
+def test_truncated_stream_raises_after_its_rows_and_is_not_cached(gemini, monkeypatch):
+    monkeypatch.setattr(gemini, "_stream_text", lambda prompt: iter([ROWS[:ROWS.index("},") + 5]]))
+    out = []
+    with pytest.raises(IncompleteJsonArray):
+        for row in gemini._stream_array("p", cache=True):
+            out.append(row)
+    assert len(out) == 1
+    assert gemini.cache.get(gemini.cache.key(gemini.url, "p")) is None
+
+
+# --- run_ai_estimation ---
+
+def test_cut_off_boq_is_priced_but_not_plan_cached(estimation):
+    def cut_off(**kwargs):
+        yield {"cost_category": "EARTHWORK", "description": "Sand", "quantity": 2, "unit": "m3"}
+        raise IncompleteJsonArray("cut off")
+
+    estimation.gemini.stream_cost_estimates.side_effect = cut_off
+    result = estimation.run("c1", "https://example.com/plan.pdf")
+
+    assert [(r["description"], r["amount"]) for r in result["estimates"]] == [("Sand", 200.0)]
+    estimation.plan_cache.put.assert_not_called()
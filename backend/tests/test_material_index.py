@@ -0,0 +1,95 @@
+import time, threading
+
+import pytest
+
+from services.material_index import MaterialIndex, canonicalize
+
+CATALOG = [
+    {"material": "Concrete Hollow Blocks 4in", "unit": "pcs", "size": "4\""},
+    {"material": "Concrete Hollow Blocks 6in", "unit": "pcs", "size": "6\""},
+    {"material": "Portland Cement", "unit": "bag", "size": "40kg"},
+    {"material": "Deformed Bar", "unit": "pcs", "size": "10mm x 6m"},
+    {"material": "Deformed Bar", "unit": "pcs", "size": "12mm x 6m"},
+    {"material": "Marine Plywood", "unit": "sheet", "size": "1/2\""},
+]
+
+
+@pytest.fixture
+def index():
+    idx = MaterialIndex()
+    idx.rebuild(CATALOG)
+    return idx
+
+
+def test_sizes_are_canonicalized():
+    assert canonicalize('Concrete Hollow Blocks 6" (150mm)') == (["chb"], {"6in", "150mm"})
+    assert canonicalize("CHB 6in") == (["chb"], {"6in"})
+    assert canonicalize("Plywood 1/2") == (["plywood"], {"1/2in"})
+
+
+@pytest.mark.parametrize("description, unit, size, expected", [
+    ('CHB 6" (150mm)', "pcs", None, ("Concrete Hollow Blocks 6in", '6"')),
+    ("Concrete Hollow Blocks 6in", "pcs", None, ("Concrete Hollow Blocks 6in", '6"')),
+    ("4 inch hollow blocks", "pieces", None, ("Concrete Hollow Blocks 4in", '4"')),
+    ("CHB", "pcs", "100mm", ("Concrete Hollow Blocks 4in", '4"')),
+    ("Reinforcing steel bar", "pcs", "12mm x 6m", ("Deformed Bar", "12mm x 6m")),
+    ("Reinforcing steel bar 10mm x 6m", "pcs", None, ("Deformed Bar", "10mm x 6m")),
+    ("Portland cement 40 kg", "bags", None, ("Portland Cement", "40kg")),
+])
+def test_descriptions_resolve_to_the_stored_material_and_size(index, description, unit, size, expected):
+    match = index.match(description, unit, size)
+    assert match and (match["material"], match["size"]) == expected
+
+
+def test_unrelated_descriptions_fall_back(index):
+    assert index.match("Electrical wire THHN 3.5mm", "m") is None
+    assert index.match("", "pcs") is None
+
+
+def test_added_listings_are_matched(index):
+    index.add("GI Tie Wire", "kg", "#16")
+    assert index.match("G.I. tie wire #16", "kg")["material"] == "GI Tie Wire"
+
+
+def test_reload_happens_in_the_background_and_swaps_in_whole():
+    release = threading.Event()
+    loads = []
+
+    def loader():
+        loads.append(time.time())
+        release.wait(5)
+        return CATALOG
+
+    idx = MaterialIndex(loader=loader, refresh_seconds=3600)
+    idx.add("Sand", "m³")
+
+    started = time.time()
+    assert idx.match("CHB 6in", "pcs") is None  # old catalog, not blocked on the load
+    assert idx.match("Sand", "m³")["material"] == "Sand"
+    assert time.time() - started < 1
+    assert len(loads) == 1
+
+    release.set()
+    deadline = time.time() + 5
+    while idx.match("CHB 6in", "pcs") is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert idx.match("CHB 6in", "pcs")["material"] == "Concrete Hollow Blocks 6in"
+    assert len(idx) == len(CATALOG) and len(loads) == 1
+
+
+def test_failed_reload_keeps_the_catalog(index):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        raise RuntimeError("supabase down")
+
+    index.loader = loader
+    index._loaded_at = 0
+    index.match("CHB 6in", "pcs")
+    deadline = time.time() + 5
+    while index._reloading and time.time() < deadline:
+        time.sleep(0.01)
+    assert calls == [1]
+    assert index.match("CHB 6in", "pcs")["material"] == "Concrete Hollow Blocks 6in"
+    assert len(calls) == 1  # retried next period, not on every lookup
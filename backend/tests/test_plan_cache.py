@@ -0,0 +1,81 @@
+import pytest
+
+import services.plan_cache as plan_cache_module
+from services.plan_cache import PlanAnalysisCache
+
+ROW = {"cost_category": "EARTHWORK", "description": "Sand", "quantity": 2, "unit": "m3"}
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.body is None:
+            raise Exception("404")
+
+    def iter_content(self, chunk_size):
+        return (self.body[i:i + chunk_size] for i in range(0, len(self.body), chunk_size))
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Plan URL -> bytes served through the pooled http_client (None = 404)."""
+    files = {}
+    client = type("Client", (), {"get": lambda self, url, **kw: FakeResponse(files.get(url))})()
+    monkeypatch.setattr(plan_cache_module, "http_client", client)
+    return files
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PlanAnalysisCache(db_path=str(tmp_path / "plan_cache.db"))
+
+
+def test_key_follows_plan_content_challenge_and_text(cache, downloads):
+    downloads.update({"a.pdf": b"plan" * 50000, "b.pdf": b"plan" * 50000, "c.pdf": b"other"})
+    key = cache.key_for("c1", "a.pdf", "House", "Estimate", "Use local prices")
+
+    assert cache.key_for("c1", "b.pdf", "House", "Estimate", "Use local prices ") == key
+    assert cache.key_for("c1", "c.pdf", "House", "Estimate", "Use local prices") != key
+    assert cache.key_for("c2", "a.pdf", "House", "Estimate", "Use local prices") != key
+    assert cache.key_for("c1", "a.pdf", "House", "Estimate", "Other rules") != key
+
+
+def test_unreachable_plan_is_keyed_by_url(cache, downloads):
+    assert cache.key_for("c1", "gone.pdf", "", "", "") == cache.key_for("c1", "gone.pdf", "", "", "")
+    assert cache.key_for("c1", "gone.pdf", "", "", "") != cache.key_for("c1", "gone2.pdf", "", "", "")
+
+
+def test_invalidate_drops_every_entry_of_a_challenge(cache, downloads):
+    downloads["shared.pdf"] = b"same plan"
+    for challenge in ("c1", "c2"):
+        cache.put(cache.key_for(challenge, "shared.pdf", "", "", ""), challenge, 0.9, [], [ROW])
+
+    assert cache.invalidate(challenge_id="c1") == 1
+    assert cache.get(cache.key_for("c1", "shared.pdf", "", "", "")) is None
+    assert cache.get(cache.key_for("c2", "shared.pdf", "", "", ""))["estimates"] == [ROW]
+
+
+def test_refresh_skips_the_lookup_but_stores_the_new_analysis(estimation):
+    estimation.gemini.stream_cost_estimates.return_value = iter([dict(ROW)])
+    estimation.run("c1", "https://example.com/plan.pdf", use_cache=False)
+
+    estimation.plan_cache.get.assert_not_called()
+    assert estimation.plan_cache.put.call_args.args[:2] == ("plan-key", "c1")
+
+
+def test_cached_analysis_skips_gemini(estimation):
+    estimation.plan_cache.get.return_value = {"confidence": 0.8, "elements": [], "estimates": [dict(ROW)]}
+    result = estimation.run("c1", "https://example.com/plan.pdf")
+
+    estimation.plan_cache.get.assert_called_once_with("plan-key")
+    estimation.gemini.stream_cost_estimates.assert_not_called()
+    estimation.plan_cache.put.assert_not_called()
+    assert [r["amount"] for r in result["estimates"]] == [200.0]
@@ -0,0 +1,122 @@
+import json, threading
+from datetime import datetime
+
+import pytest
+
+from services.price_service import PriceService, _flight_key, _inflight, _to_number
+
+
+class FakeStore:
+    """materials_prices in memory, behind the SupabaseClient methods PriceService uses."""
+
+    def __init__(self):
+        self.rows = []
+        self.reads = 0
+
+    def save_material_prices(self, items):
+        now = datetime.utcnow().isoformat()
+        self.rows += [dict(i, price=str(_to_number(i.get("price"))), created_at=now) for i in items]
+
+    def save_material_price(self, item):
+        self.save_material_prices([item])
+
+    def _recent(self, material, unit, size, since):
+        return [r for r in self.rows
+                if r["material"].lower() == material.strip().lower() and r["unit"] == unit
+                and (not size or size == "N/A" or r["size"] == size) and r["created_at"] >= since]
+
+    def get_recent_material_prices(self, material, unit, size, since, limit=50):
+        self.reads += 1
+        return self._recent(material, unit, size, since)[:limit]
+
+    def get_recent_material_prices_many(self, items, since, limit_per_item=50):
+        self.reads += 1
+        rows = {id(r): r for item in items for r in self._recent(*item, since)}
+        return sorted(rows.values(), key=lambda r: r["created_at"], reverse=True)
+
+    def get_material_catalog(self, since, limit=5000):
+        return [{k: r[k] for k in ("material", "unit", "size")} for r in self.rows][:limit]
+
+
+class FakeGemini:
+    """Answers each prompt with the next canned response, recording the prompts."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def _call_gemini(self, prompt, cache=False):
+        self.prompts.append(prompt)
+        if not self.responses:
+            pytest.fail("unexpected Gemini call")
+        return json.dumps(self.responses.pop(0))
+
+
+def service(gemini, store=None):
+    store = store or FakeStore()
+    return PriceService(gemini=gemini, agemini=gemini, sb=store)
+
+
+CEMENT, SAND = ("Portland Cement", "bag", "40kg"), ("Sand", "m³", "N/A")
+
+
+def test_stats_only_ranges_are_stored_and_reused():
+    svc = service(FakeGemini({
+        "1": {"low": "₱240", "median": "₱260", "high": "₱300", "vendors": ["Wilcon", "CitiHardware"]},
+        "2": {"low": "₱1,000", "median": "₱1,200", "high": "₱1,500", "vendors": []},
+    }))
+
+    first = svc.get_unit_prices([CEMENT, SAND], stats_only=True)
+    assert [price for price, _ in first] == [260, 1200]
+    assert sorted((r["material"], float(r["price"]), r["vendor"]) for r in svc.sb.rows if r["material"] == "Portland Cement") == \
+        [("Portland Cement", 240, "Wilcon"), ("Portland Cement", 260, "CitiHardware"), ("Portland Cement", 300, "Wilcon")]
+
+    # The stored ranges answer the next run without Gemini
+    assert [price for price, _ in svc.get_unit_prices([CEMENT, SAND], stats_only=True)] == [260, 1200]
+
+
+def test_single_stats_lookup_is_stored():
+    svc = service(FakeGemini({"low": "₱240", "median": "₱260", "high": "₱300", "vendors": ["Wilcon"]}))
+    price, listings = svc.get_unit_price(*CEMENT, stats_only=True)
+    assert price == 260 and len(listings) == 3 == len(svc.sb.rows)
+    assert svc.get_unit_price(*CEMENT, stats_only=True)[0] == 260
+
+
+def test_batch_listings_are_stored_under_the_requested_identity():
+    listings = [{"material": "Cement (Holcim)", "unit": "bags", "size": "", "price": f"₱{p}", "vendor": "Wilcon"}
+                for p in (250, 260, 270)]
+    svc = service(FakeGemini({"1": listings}))
+
+    assert svc.get_unit_prices([CEMENT])[0][0] == 260
+    assert {(r["material"], r["unit"], r["size"]) for r in svc.sb.rows} == {CEMENT}
+    assert svc.get_unit_prices([CEMENT])[0][0] == 260
+
+
+def test_cache_reads_are_one_query_per_batch():
+    store = FakeStore()
+    cheap = [{"price": f"₱{p}", "vendor": "Wilcon"} for p in (10, 11, 12)]
+    items = [(f"Material {n}", "pcs", "N/A") for n in range(6)]
+    store.save_material_prices([dict(l, material=m, unit=u, size=s) for m, u, s in items[:4] for l in cheap])
+    svc = service(FakeGemini({"1": cheap, "2": cheap}), store)
+
+    assert [price for price, _ in svc.get_unit_prices(items)] == [11] * 6
+    # One read for all six; nothing in the index resembles the two misses
+    assert store.reads == 1
+
+
+def test_items_in_flight_elsewhere_are_waited_for():
+    svc = service(FakeGemini({"1": [{"price": "₱500", "vendor": "Wilcon"}]}))
+    key = _flight_key(*CEMENT, "Cebu, Philippines", False)
+    call, leader = _inflight.begin(key)  # another request is pricing cement
+    assert leader
+
+    out = []
+    worker = threading.Thread(target=lambda: out.append(svc.get_unit_prices([CEMENT, SAND])))
+    worker.start()
+    worker.join(0.5)
+    assert worker.is_alive()  # sand is priced, cement waits for the other request
+
+    _inflight.end(key, call, (260.0, []))
+    worker.join(5)
+    assert [price for price, _ in out[0]] == [260.0, 500]
+    assert len(svc.gemini.prompts) == 1 and "Portland Cement" not in svc.gemini.prompts[0]
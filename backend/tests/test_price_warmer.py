@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.price_warmer as price_warmer
+from services.price_service import PRICE_CACHE_MIN_LISTINGS, cache_ttl_hours
+from services.price_warmer import PriceWarmer
+
+STAPLES = [{"material": f"Material {n}", "unit": "pcs", "size": "N/A"} for n in range(5)]
+
+
+@pytest.fixture
+def svc():
+    svc = MagicMock()
+    svc.sb.get_material_catalog.return_value = []
+    svc.sb.get_recent_material_prices.return_value = []
+    svc.fetch_listings_batch.side_effect = lambda chunk, cache: [[{"material": m, "price": 10.0}] for m, _u, _s in chunk]
+    svc.pick_unit_price.return_value = 10.0
+    return svc
+
+
+@pytest.fixture
+def warmer(tmp_path, svc, monkeypatch):
+    monkeypatch.setattr(price_warmer, "WARM_MATERIALS", STAPLES)
+    monkeypatch.setattr(price_warmer, "PRICE_BATCH_SIZE", 2)
+    monkeypatch.setattr(price_warmer, "PRICE_WARMER_MAX_CALLS", 2)
+    monkeypatch.setattr(price_warmer, "PRICE_WARMER_CALL_SPACING_SECONDS", 0)
+    return PriceWarmer(db_path=str(tmp_path / "jobs.db"), price_service=svc)
+
+
+def test_is_due_until_enough_listings_inside_the_lead_window(warmer, svc):
+    item = ("Portland Cement", "bag", "40kg")
+    svc.sb.get_recent_material_prices.return_value = [{}] * (PRICE_CACHE_MIN_LISTINGS - 1)
+    assert warmer.is_due(item)
+    svc.sb.get_recent_material_prices.return_value = [{}] * PRICE_CACHE_MIN_LISTINGS
+    assert not warmer.is_due(item)
+
+    # Listings count as fresh only if less than (1 - lead fraction) of the TTL old
+    since = datetime.fromisoformat(svc.sb.get_recent_material_prices.call_args.args[3])
+    window = timedelta(hours=cache_ttl_hours(item[0]) * (1 - price_warmer.PRICE_WARMER_LEAD_FRACTION))
+    assert abs((datetime.utcnow() - since) - window) < timedelta(minutes=1)
+
+
+def test_candidates_add_most_listed_materials_without_duplicates(warmer, svc):
+    svc.sb.get_material_catalog.return_value = [
+        {"material": "Rebar", "unit": "pcs", "size": "10mm"}, {"material": "Rebar", "unit": "pcs", "size": "10mm"},
+        {"material": "material 0", "unit": "PCS", "size": "n/a"},
+    ]
+    assert warmer.candidates() == [(m["material"], "pcs", "N/A") for m in STAPLES] + [("Rebar", "pcs", "10mm")]
+
+
+def test_run_spends_the_call_budget_and_defers_the_rest(warmer, svc):
+    report = warmer.run_once()
+
+    assert report["candidates"] == 5 and report["gemini_calls"] == 2
+    assert [r["item"][0] for r in report["refreshed"]] == ["Material 0", "Material 1", "Material 2", "Material 3"]
+    assert report["deferred"] == [("Material 4", "pcs", "N/A")]
+    # Warming always asks Gemini afresh and stores what it found
+    assert [c.kwargs["cache"] for c in svc.fetch_listings_batch.call_args_list] == [False, False]
+    assert svc.persist_listings.call_count == 2
+    assert warmer.last_report()["deferred"] == [["Material 4", "pcs", "N/A"]]
+
+
+def test_fresh_items_missed_items_and_failed_chunks(warmer, svc):
+    svc.sb.get_recent_material_prices.side_effect = \
+        lambda material, *a: [{}] * PRICE_CACHE_MIN_LISTINGS if material == "Material 0" else []
+    svc.fetch_listings_batch.side_effect = [[None, [{"price": 1.0}]], Exception("quota")]
+
+    report = warmer.run_once()
+
+    assert report["fresh"] == [("Material 0", "pcs", "N/A")]
+    assert report["missed"] == [("Material 1", "pcs", "N/A")]
+    assert [r["item"][0] for r in report["refreshed"]] == ["Material 2"]
+    assert report["errors"] == [{"items": [("Material 3", "pcs", "N/A"), ("Material 4", "pcs", "N/A")],
+                                 "error": "quota"}]
+
+
+def test_runs_are_spaced_even_when_forced(warmer, monkeypatch):
+    assert warmer.run_once() is not None
+    assert warmer.run_once() is None
+    assert warmer.run_once(force=True) is None
+    assert warmer.seconds_until_forceable() > 0
+
+    monkeypatch.setattr(price_warmer, "PRICE_WARMER_MIN_SPACING_SECONDS", 0)
+    assert warmer.seconds_until_forceable() == 0
+    assert warmer.run_once(force=True) is not None
+    assert warmer.run_once() is None
@@ -0,0 +1,118 @@
+import uuid, threading
+
+import pytest
+
+from conftest import save_estimate
+from models.cost_estimation_model import CostEstimateItemIn
+from services.supabase_service import ITEM_FIELDS, _estimate_item_row, _item_content, diff_estimate_items
+
+ITEMS = [
+    {"cost_category": "MASONRY WORK", "material_name": "CHB 4in", "quantity": 100, "unit": "pcs", "unit_price": 15},
+    {"cost_category": "EARTHWORK", "material_name": "Sand", "quantity": 2.5, "unit": "m³", "unit_price": 1200},
+]
+
+
+def counts(db):
+    return {
+        table: db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("student_cost_estimates", "student_cost_estimate_items", "students_estimates_summary")
+    }
+
+
+def test_returns_totals_and_upserts_header_and_summary(db):
+    student, challenge = uuid.uuid4(), uuid.uuid4()
+
+    first = save_estimate(db, student, challenge, ITEMS)
+    assert first["subtotal_amount"] == 4500
+    assert first["contingency_amount"] == 450
+    assert first["total_amount"] == 4950
+    assert first["status"] == "draft" and first["submitted_at"] is None
+
+    edited = [dict(ITEMS[0], quantity=120), ITEMS[1]]
+    second = save_estimate(db, student, challenge, edited, pct=0.05, submit=True,
+                           category_subtotals=[{"cost_category": "MASONRY WORK", "subtotal": 1800}])
+    assert second["studentsCostEstimatesID"] == first["studentsCostEstimatesID"]
+    assert second["subtotal_amount"] == 4800
+    assert second["contingency_amount"] == 240
+    assert second["total_amount"] == 5040
+    assert second["status"] == "submitted" and second["submitted_at"]
+
+    assert counts(db) == {"student_cost_estimates": 1, "student_cost_estimate_items": 2,
+                          "students_estimates_summary": 1}
+    header = db.execute("SELECT total_amount, status FROM student_cost_estimates").fetchone()
+    assert (float(header[0]), header[1]) == (5040, "submitted")
+    summary = db.execute("SELECT subtotal_amount, contingency_percentage, total_amount, category_subtotals "
+                         "FROM students_estimates_summary").fetchone()
+    assert [float(x) for x in summary[:3]] == [4800, 0.05, 5040]
+    assert summary[3] == [{"cost_category": "MASONRY WORK", "subtotal": 1800}]
+
+
+def test_item_amounts_and_numbers(db):
+    save_estimate(db, uuid.uuid4(), uuid.uuid4(), ITEMS)
+    rows = db.execute("SELECT material_name, amount, item_number FROM student_cost_estimate_items "
+                      "ORDER BY item_number").fetchall()
+    assert [(name, float(amount), n) for name, amount, n in rows] == [("Sand", 3000, 1), ("CHB 4in", 1500, 3)]
+
+
+def test_concurrent_first_saves_create_one_header(db, pg_schema):
+    psycopg = pytest.importorskip("psycopg")
+    student, challenge = uuid.uuid4(), uuid.uuid4()
+    start = threading.Barrier(4)
+    errors = []
+
+    def worker():
+        try:
+            with psycopg.connect(pg_schema, autocommit=True) as conn:
+                start.wait()
+                save_estimate(conn, student, challenge, ITEMS)
+        except Exception as e:  # surfaced below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert counts(db) == {"student_cost_estimates": 1, "student_cost_estimate_items": 2,
+                          "students_estimates_summary": 1}
+
+
+def test_repeated_ids_match_diff_estimate_items(db):
+    student, challenge = uuid.uuid4(), uuid.uuid4()
+
+    def item(name, id, qty=1):
+        return CostEstimateItemIn(id=id, cost_category="MASONRY WORK", material_name=name, quantity=qty,
+                                  unit="pcs", unit_price=10, challenge_id=challenge)
+
+    def payload(items):
+        return [i.model_dump(mode="json", include={"id", "cost_category", "material_name",
+                                                    "quantity", "unit", "unit_price"}) for i in items]
+
+    def saved_rows(est_id):
+        cur = db.execute(f'SELECT id, {", ".join(ITEM_FIELDS)} FROM student_cost_estimate_items '
+                         'WHERE "studentsCostEstimatesID" = %s', (est_id,))
+        names = [c.name for c in cur.description]
+        return [dict(zip(names, r), id=str(r[0])) for r in cur.fetchall()]
+
+    a, b = item("CHB", uuid.uuid4()), item("Sand", uuid.uuid4())
+    est_id = save_estimate(db, student, challenge, payload([a, b]))["studentsCostEstimatesID"]
+    existing = saved_rows(est_id)
+
+    # The second and third rows repeat a's id: one matches b's saved content, one is new
+    batch = [item("CHB", a.id, qty=2), item("Sand", a.id), item("Gravel", a.id)]
+    inserts, updates, deletes = diff_estimate_items(existing, [_estimate_item_row(est_id, i) for i in batch])
+
+    save_estimate(db, student, challenge, payload(batch))
+    after = saved_rows(est_id)
+
+    # Rows with a kept id have the content the diff predicts...
+    expected = {r["id"]: _item_content(r) for r in existing if r["id"] not in deletes}
+    expected.update({str(r["id"]): _item_content(r) for r in updates + inserts if r.get("id")})
+    assert {r["id"]: _item_content(r) for r in after if r["id"] in expected} == expected
+    # ...and the rest are the diff's id-less inserts
+    assert sorted(_item_content(r) for r in after if r["id"] not in expected) == \
+        sorted(_item_content(r) for r in inserts if not r.get("id"))
+    assert sorted(_item_content(r) for r in after) == \
+        sorted(_item_content(_estimate_item_row(est_id, i)) for i in batch)
@@ -75,6 +75,7 @@ export default function CostEstimationChallenge() {
   const [items, setItems] = useState(
     CAT_ORDER.map((cat) => ({
       rid: makeId(),
+      id: crypto.randomUUID(),
       cost_category: cat,
       description: "",
       quantity: "",
@@ -91,6 +92,7 @@ export default function CostEstimationChallenge() {
       ...prev,
       {
         rid: makeId(),
+        id: crypto.randomUUID(),
         cost_category: cat,
         description: "",
         quantity: "",
@@ -128,6 +130,7 @@ export default function CostEstimationChallenge() {
           Number(r.unit_price)
       )
       .map((r) => ({
+        id: r.id,
         challenge_id: challengeId, 
         cost_category: r.cost_category,
         material_name: r.description?.trim() || "Item",
@@ -236,6 +239,7 @@ export default function CostEstimationChallenge() {
           if (est.items && est.items.length > 0) {
             setItems(est.items.map((it) => ({
             rid: makeId(),
+            id: it.id,
             cost_category: it.cost_category,
             description: it.material_name,   
             quantity: it.quantity,